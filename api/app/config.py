@@ -9,6 +9,7 @@ load_dotenv()
 class DatabaseType(str, Enum):
     SQL_SERVER = "SQL_SERVER"
     FIRESTORE = "FIRESTORE"
+    SQLITE = "SQLITE"
 
 
 class Settings(BaseSettings):
@@ -26,10 +27,72 @@ class Settings(BaseSettings):
     sql_user: str = os.getenv("USER", "sa")
     sql_password: str = os.getenv("PASSWORD", "")  # importante para prod
     sql_driver: str = "ODBC Driver 17 for SQL Server"
+    # URL SQLAlchemy completa; si se define reemplaza la conexión ODBC (ej. sqlite:///diagnovet.db)
+    sql_url: str = os.getenv("SQL_URL", "")
+    # Driver asíncrono (aioodbc / aiosqlite); si no está instalado se usa un pool de hilos
+    sql_async: bool = os.getenv("SQL_ASYNC", "true").lower() == "true"
+    sql_executor_workers: int = int(os.getenv("SQL_EXECUTOR_WORKERS", 10))
+    # Réplica de solo lectura opcional: URL explícita o host ODBC de la réplica
+    sql_read_url: str = os.getenv("SQL_READ_URL", "")
+    sql_read_server: str = os.getenv("SQL_READ_ENGINE", "")
+    # Tras una escritura, las lecturas del mismo cliente van al primario durante esta ventana
+    read_your_writes_seconds: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+    # Clave del token de última escritura; debe ser la misma en todos los workers (si no, solo vale en el mismo proceso)
+    read_your_writes_secret: str = os.getenv("READ_YOUR_WRITES_SECRET", "")
+    # Aplicar migraciones pendientes al iniciar (si es False: python -m cli.migrate)
+    sql_auto_migrate: bool = os.getenv("SQL_AUTO_MIGRATE", "true").lower() == "true"
+
+    # SQLite embebido (DB_TYPE=SQLITE): un escritor y este número de lectores concurrentes (WAL)
+    sqlite_path: str = os.getenv("SQLITE_PATH", "diagnovet.db")
+    sqlite_readers: int = int(os.getenv("SQLITE_READERS", 4))
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    sqlite_cache_mb: int = int(os.getenv("SQLITE_CACHE_MB", 64))
+    sqlite_mmap_mb: int = int(os.getenv("SQLITE_MMAP_MB", 256))
+
+    # Cache de diagnósticos: LRU en proceso o, con CACHE_REDIS_URL, compartida entre workers
+    cache_enabled: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    cache_ttl_seconds: float = float(os.getenv("CACHE_TTL_SECONDS", 300))
+    cache_max_bytes: int = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    cache_max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+    cache_redis_url: str = os.getenv("CACHE_REDIS_URL", "")
+
+    # Logging: formato text/json, cola no bloqueante y recorte de mensajes largos
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_format: str = os.getenv("LOG_FORMAT", "text")
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    log_max_chars: int = int(os.getenv("LOG_MAX_CHARS", 2000))
+    # Access log: fracción de requests registrados (errores y lentos siempre) y bytes del cuerpo a incluir
+    access_log_sample_rate: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+    access_log_slow_ms: float = float(os.getenv("ACCESS_LOG_SLOW_MS", 1000))
+    access_log_body_bytes: int = int(os.getenv("ACCESS_LOG_BODY_BYTES", 0))
+    access_log_exclude: str = os.getenv("ACCESS_LOG_EXCLUDE", "/metrics,/health")
+
+    # Compresión de respuestas (gzip/brotli) y cache de cuerpos comprimidos por ETag
+    compression_min_bytes: int = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    compression_gzip_level: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    compression_brotli_quality: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+    compression_cache_bytes: int = int(os.getenv("COMPRESSION_CACHE_BYTES", 32 * 1024 * 1024))
+
+    # POST /diagnosis/batch: informes por escritura agrupada y tamaño máximo de línea NDJSON
+    batch_ingest_group_size: int = int(os.getenv("BATCH_INGEST_GROUP_SIZE", 100))
+    batch_ingest_max_line_bytes: int = int(os.getenv("BATCH_INGEST_MAX_LINE_BYTES", 1024 * 1024))
+
+    # GET /export: informes leídos por tanda (filas en memoria a la vez) y
+    # exportaciones SQL simultáneas (cada una ocupa 2 conexiones; las demás esperan)
+    export_chunk_size: int = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+    export_concurrency: int = int(os.getenv("EXPORT_CONCURRENCY", 2))
 
     # Firestore config
     firestore_project_id: str = os.getenv("FIRESTORE_PROJECT_ID", "")
     firestore_credentials_path: str = os.getenv("FIRESTORE_CREDENTIALS", "")
+    # Lecturas get_all y commits de batches de Firestore en paralelo por operación
+    firestore_concurrency: int = int(os.getenv("FIRESTORE_CONCURRENCY", 8))
+    # Cliente nativo asíncrono (AsyncFirestoreRepository), opcional: por defecto
+    # se usa el cliente síncrono en hilos
+    firestore_async: bool = os.getenv("FIRESTORE_ASYNC", "false").lower() == "true"
+    # Índice de búsqueda en memoria: pasado este tiempo se agregan los informes
+    # escritos por otras instancias (0 = solo la carga del primer uso)
+    search_index_refresh_seconds: float = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", 300))
 
     # API config
     base_url: str = ""
@@ -1,25 +1,36 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request
-import json
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 
 from services.diagnosis_service import DiagnosisService
+from services.patient_service import PatientService
 from services.image_service import ImageService
 from repositories.repository_factory import repository_factory
-from models.schemas import DiagnosisCreate, DiagnosisResponse, PatientResponse, SidebarDiagnosisItem
+from models.schemas import (
+    DiagnosisCreate, DiagnosisResponse, PatientResponse, SidebarDiagnosisItem,
+    DiagnosisListQuery, PatientListQuery, SearchQuery, SearchHit, DiagnosisExportQuery
+)
+from services.diagnosis_export import MEDIA_TYPES
+from services.diagnosis_cache import CacheEntry
 from monitoring.metrics import metrics_collector
+from app.middleware import ClientContextMiddleware, AccessLogMiddleware, CompressionMiddleware
+from app.responses import DuplexStreamingResponse, FastJSONResponse, json_dumps, json_loads
+from utils.utils import iter_ndjson_lines
+from monitoring.logging_setup import setup_logging
 from app.config import settings
 
 import logging
-from typing import List
+from typing import List, Literal, Optional
+from pydantic import TypeAdapter
+from datetime import date, datetime
 
 from urllib.parse import unquote
 import unicodedata
 
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging (cola no bloqueante, ver monitoring/logging_setup.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Crear aplicación FastAPI
@@ -36,16 +47,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "X-Last-Write"],
 )
+# Read-your-writes con réplica de lectura (X-Client-Id y token de última escritura)
+app.add_middleware(ClientContextMiddleware)
+# gzip/brotli negociado; las respuestas con ETag se comprimen una sola vez
+app.add_middleware(CompressionMiddleware)
+# Access log con muestreo; se agrega último para medir también al resto de los middlewares
+app.add_middleware(AccessLogMiddleware)
 
 # Servir archivos estáticos
 app.mount("/extracted_images", StaticFiles(directory=settings.images_directory), name="extracted_images")
 
+# Tamaño máximo de página para los listados
+MAX_PAGE_SIZE = 500
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_PATIENT_SUGGESTIONS = 50
+
+# Serializadores de listas de modelos ya validados (dump_json en Rust, sin revalidar)
+patients_json = TypeAdapter(List[PatientResponse])
+search_hits_json = TypeAdapter(List[SearchHit])
+
 # Dependency injection
 def get_diagnosis_service() -> DiagnosisService:
     repository = repository_factory.get_repository()
     return DiagnosisService(repository)
 
+def get_patient_service() -> PatientService:
+    repository = repository_factory.get_repository()
+    return PatientService(repository)
+
 def get_image_service() -> ImageService:
     return ImageService()
 
@@ -58,28 +89,6 @@ async def root():
         "status": "active"
     }
 
-@app.middleware("http")
-async def debug_middleware(request: Request, call_next):
-    if request.url.path == "/diagnosis" and request.method == "POST":
-        try:
-            # Leer el cuerpo de la solicitud
-            body = await request.body()
-            body_str = body.decode()
-            logger.info(f"📨 RAW REQUEST BODY: {body_str}")
-            
-            # Intentar parsear JSON
-            try:
-                json_data = json.loads(body_str)
-                logger.info(f"📋 PARSED JSON: {json.dumps(json_data, indent=2)}")
-            except json.JSONDecodeError as e:
-                logger.error(f"❌ INVALID JSON: {e}")
-                
-        except Exception as e:
-            logger.error(f"❌ ERROR reading body: {e}")
-    
-    response = await call_next(request)
-    return response
-
 @app.post("/diagnosis", response_model=dict)
 async def create_diagnosis(
     diagnosis_data: DiagnosisCreate,
@@ -87,7 +96,6 @@ async def create_diagnosis(
 ):
     """Crear un nuevo diagnóstico"""
     try:
-        logger.info(f"Datos recibidos: {diagnosis_data.dict()}")
         diagnosis_id = await service.create_diagnosis(diagnosis_data)
         return {
             "status": "success",
@@ -100,25 +108,96 @@ async def create_diagnosis(
         logger.error(f"Error creando diagnóstico: {str(e)}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.post("/diagnosis/batch")
+async def create_diagnoses_batch(
+    request: Request,
+    service: DiagnosisService = Depends(get_diagnosis_service)
+):
+    """
+    Ingesta masiva: cuerpo NDJSON (un DiagnosisCreate por línea), leído a medida
+    que llega. Responde en streaming NDJSON con un resultado por línea:
+    {"line", "status": "created", "diagnosis_id"} o {"line", "status": "error", "error"}.
+    """
+    lines = iter_ndjson_lines(request.stream(), settings.batch_ingest_max_line_bytes)
+
+    async def results():
+        async for group in service.create_diagnoses_stream(lines, settings.batch_ingest_group_size):
+            yield b"".join(json_dumps(result) + b"\n" for result in group)
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.get("/diagnosis/{diagnosis_id}", response_model=DiagnosisResponse)
 async def get_diagnosis(
     diagnosis_id: str,
+    request: Request,
     service: DiagnosisService = Depends(get_diagnosis_service)
 ):
-    """Obtener un diagnóstico por ID"""
-    diagnosis = await service.get_diagnosis(diagnosis_id)
+    """Obtener un diagnóstico por ID (admite If-None-Match)"""
+    entry = await service.get_diagnosis_entry(diagnosis_id, _if_none_match(request))
     
-    if not diagnosis:
+    if not entry:
         raise HTTPException(status_code=404, detail="Diagnóstico no encontrado")
     
-    return diagnosis
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=_validator_headers(entry))
+    return FastJSONResponse(entry.payload, headers=_validator_headers(entry))
+
+def _validator_headers(entry: CacheEntry) -> dict:
+    """ETag débil (el cuerpo puede viajar comprimido) y no-cache para que el navegador revalide siempre"""
+    return {
+        "ETag": f'W/"{entry.etag}"',
+        "Cache-Control": "no-cache",
+    }
+
+def _if_none_match(request: Request) -> List[str]:
+    """Tags de If-None-Match sin el prefijo débil ni comillas (comparación débil)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return []
+    return [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+
+def _not_modified(request: Request, entry: CacheEntry) -> bool:
+    tags = _if_none_match(request)
+    return "*" in tags or entry.etag in tags
+
+def _page_headers(next_cursor: Optional[str], total: Optional[int]) -> dict:
+    """El cursor de la página siguiente y el total viajan en headers para mantener el cuerpo como lista"""
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    return headers
 
 @app.get("/patients", response_model=List[PatientResponse])
 async def get_patients(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    tutor: Optional[str] = None,
+    raza: Optional[str] = None,
+    include_total: bool = False,
     service: DiagnosisService = Depends(get_diagnosis_service)
 ):
-    """Obtener todos los pacientes"""
-    return await service.get_patients()
+    """Obtener pacientes (paginado por cursor con `limit`/`cursor`)"""
+    query = PatientListQuery(
+        limit=limit, cursor=cursor, tutor=tutor, raza=raza, include_total=include_total
+    )
+    try:
+        page = await service.get_patients(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return FastJSONResponse(patients_json.dump_json(page.items), headers=_page_headers(page.next_cursor, page.total))
+
+@app.get("/patients/search", response_model=List[PatientResponse])
+async def search_patients(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_PATIENT_SUGGESTIONS),
+    field: Optional[Literal["nombre", "tutor"]] = None,
+    service: PatientService = Depends(get_patient_service)
+):
+    """Type-ahead de pacientes: prefijo de nombre y/o tutor, sin distinguir mayúsculas ni acentos"""
+    return await service.search_patients(q, limit=limit, field=field)
 
 @app.post("/images/extract")
 async def extract_images(
@@ -148,8 +227,82 @@ async def get_metrics():
 
 
 @app.get("/all_diagnoses", response_model=None)
-async def get_sidebar_diagnoses(service: DiagnosisService = Depends(get_diagnosis_service)):
-    return await service.get_all_diagnoses()
+async def get_sidebar_diagnoses(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    tutor: Optional[str] = None,
+    raza: Optional[str] = None,
+    include_total: bool = False,
+    service: DiagnosisService = Depends(get_diagnosis_service)
+):
+    """Listado del sidebar, más recientes primero (paginado por cursor con `limit`/`cursor`; admite If-None-Match)"""
+    query = DiagnosisListQuery(
+        limit=limit, cursor=cursor, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+        tutor=tutor, raza=raza, include_total=include_total
+    )
+    try:
+        entry = await service.get_all_diagnoses_entry(query, _if_none_match(request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=_validator_headers(entry))
+    # La entrada guarda la página completa: se extraen los items sin reconstruir los modelos
+    page = json_loads(entry.payload)
+    headers = {**_page_headers(page["next_cursor"], page["total"]), **_validator_headers(entry)}
+    return FastJSONResponse(page["items"], headers=headers)
+
+
+@app.get("/search", response_model=List[SearchHit])
+async def search_diagnoses(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    service: DiagnosisService = Depends(get_diagnosis_service)
+):
+    """Búsqueda de texto completo en antecedentes, diagnóstico y observaciones (más relevantes primero)"""
+    query = SearchQuery(q=q, limit=limit, cursor=cursor, include_total=include_total)
+    try:
+        page = await service.search_diagnoses(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        # Dialecto SQL sin índice de texto completo (solo SQLite FTS5 y SQL Server)
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    return FastJSONResponse(search_hits_json.dump_json(page.items), headers=_page_headers(page.next_cursor, page.total))
+
+
+@app.get("/export", response_model=None)
+async def export_diagnoses(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    since: Optional[datetime] = None,
+    service: DiagnosisService = Depends(get_diagnosis_service)
+):
+    """
+    Exportación completa para análisis: informes con estudios, mediciones y
+    observaciones, en NDJSON (un informe por línea) o CSV (una fila por
+    medición/observación). Se escribe a medida que se lee; `since` filtra por
+    fecha de alta para exportaciones incrementales (los informes anteriores a
+    esa columna toman como alta la fecha del informe, ver migración 7).
+    """
+    query = DiagnosisExportQuery(format=format, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, since=since)
+    try:
+        body = service.export_diagnoses(query, settings.export_chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"diagnosticos.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        body, media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 # Health check
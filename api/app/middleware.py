@@ -0,0 +1,306 @@
+from collections import OrderedDict
+from database.read_routing import current_client, request_writes, read_your_writes, RequestWrites
+from http.cookies import SimpleCookie
+import math
+from app.config import settings
+from monitoring.metrics import cache_requests_counter
+import asyncio
+import gzip
+import logging
+import random
+import time
+
+try:
+    import brotli
+except ImportError:  # sin brotli solo se negocia gzip
+    brotli = None
+
+access_logger = logging.getLogger("diagnovet.access")
+
+
+# Token firmado de la última escritura del cliente (ver ReadYourWritesTracker)
+LAST_WRITE_COOKIE = "diagnovet_last_write"
+
+
+def client_header(scope):
+    """Header X-Client-Id del request (None si no viene)"""
+    for name, value in scope.get("headers", []):
+        if name == b"x-client-id":
+            return value.decode("latin-1")
+    return None
+
+
+def client_id_from_scope(scope):
+    """Header X-Client-Id o, si no viene, la IP de origen (para el access log)"""
+    client_id = client_header(scope)
+    if client_id is None and scope.get("client"):
+        client_id = scope["client"][0]
+    return client_id
+
+
+class ClientContextMiddleware:
+    """
+    Contexto read-your-writes de cada request para el ruteo de lecturas SQL:
+    el X-Client-Id (si viene) y la última escritura informada por el cliente
+    (cookie o header X-Last-Write firmados). Si el request escribe, la
+    respuesta lleva el token nuevo en ambos.
+
+    Los métodos que pueden escribir (POST, PUT, PATCH, DELETE) llevan el token
+    aunque todavía no hayan escrito: una respuesta en streaming (POST
+    /diagnosis/batch) envía los headers antes de escribir el primer grupo. En
+    ese caso el token marca el comienzo de la ingesta: una ingesta más larga
+    que READ_YOUR_WRITES_SECONDS solo queda cubierta al terminar por el
+    respaldo en proceso (X-Client-Id, mismo worker).
+    """
+
+    WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, app):
+        self.app = app
+        self.max_age = max(1, math.ceil(settings.read_your_writes_seconds))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = RequestWrites(read_your_writes.verify(self._last_write_token(scope)))
+        may_write = scope.get("method") in self.WRITE_METHODS and read_your_writes.window_seconds > 0
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start" and (writes.written_at is not None or may_write):
+                token = read_your_writes.sign(writes.written_at or time.time())
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-last-write", token.encode("latin-1")),
+                    (b"set-cookie", (
+                        f"{LAST_WRITE_COOKIE}={token}; Max-Age={self.max_age}; Path=/; HttpOnly; SameSite=Lax"
+                    ).encode("latin-1")),
+                ]
+            await send(message)
+
+        client_token = current_client.set(client_header(scope))
+        writes_token = request_writes.set(writes)
+        try:
+            await self.app(scope, receive, send_with_token)
+        finally:
+            request_writes.reset(writes_token)
+            current_client.reset(client_token)
+
+    @staticmethod
+    def _last_write_token(scope):
+        cookie = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-last-write":
+                return value.decode("latin-1")
+            if name == b"cookie":
+                cookie = value.decode("latin-1")
+        if cookie:
+            morsel = SimpleCookie(cookie).get(LAST_WRITE_COOKIE)
+            return morsel.value if morsel else None
+        return None
+
+
+class AccessLogMiddleware:
+    """
+    Access log estructurado: método, ruta, estado, duración y bytes de cada
+    request. Se registra una fracción ACCESS_LOG_SAMPLE_RATE de los requests
+    normales y siempre los errores y los que superan ACCESS_LOG_SLOW_MS. Con
+    ACCESS_LOG_BODY_BYTES > 0 incluye el comienzo del cuerpo, capturado al
+    pasar (sin leer ni parsear el cuerpo completo).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.sample_rate = settings.access_log_sample_rate
+        self.slow_ms = settings.access_log_slow_ms
+        self.body_bytes = settings.access_log_body_bytes
+        self.exclude = {path.strip() for path in settings.access_log_exclude.split(",") if path.strip()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        response = {"status": 500, "bytes": 0}
+        body = bytearray()
+        body_size = 0
+
+        async def receive_with_capture():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if len(body) < self.body_bytes:
+                    body.extend(chunk[:self.body_bytes - len(body)])
+            return message
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_with_capture if self.body_bytes else receive, send_with_status)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            status = response["status"]
+            if status >= 400 or duration_ms >= self.slow_ms or random.random() < self.sample_rate:
+                fields = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(duration_ms, 1),
+                    "bytes": response["bytes"],
+                    "client": client_id_from_scope(scope),
+                }
+                if body:
+                    fields["body"] = body.decode("utf-8", errors="replace")
+                    fields["body_truncated"] = body_size > len(body)
+                level = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+                access_logger.log(level, f"{scope['method']} {scope['path']} {status}", extra={"fields": fields})
+
+
+class CompressionMiddleware:
+    """
+    Compresión gzip/brotli negociada por Accept-Encoding (br preferido) para
+    respuestas JSON/texto de al menos COMPRESSION_MIN_BYTES. Las respuestas
+    con ETag se comprimen una sola vez: los bytes comprimidos quedan en una
+    LRU por (ETag, codificación) acotada a COMPRESSION_CACHE_BYTES.
+
+    Las respuestas en streaming (más de un mensaje de cuerpo) y las que ya
+    traen Content-Encoding pasan sin tocar.
+    """
+    COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/")
+    # Cuerpos más grandes se comprimen en un hilo para no frenar el event loop
+    THREAD_THRESHOLD = 256 * 1024
+
+    def __init__(self, app):
+        self.app = app
+        self.min_bytes = settings.compression_min_bytes
+        self.gzip_level = settings.compression_gzip_level
+        self.brotli_quality = settings.compression_brotli_quality
+        self.cache_bytes = settings.compression_cache_bytes
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = start.get("headers", [])
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._should_compress(headers, body):
+                if start["status"] == 304 or self._is_compressible(headers):
+                    start = {**start, "headers": self._with_vary(headers)}
+                await send(start)
+                await send(message)
+                return
+
+            compressed = await self._compress(self._etag(headers), encoding, body)
+            headers = [(k, v) for k, v in self._with_vary(headers) if k != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(compressed)).encode())]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+        if start_message is not None:
+            await send(start_message)
+
+    def _negotiate(self, scope):
+        """Codificación preferida que el cliente acepta (q > 0), o None"""
+        accepted = set()
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                for part in value.decode("latin-1").split(","):
+                    coding, _, params = part.strip().partition(";")
+                    q = params.strip()
+                    try:
+                        if q.startswith("q=") and float(q[2:] or 0) == 0:
+                            continue
+                    except ValueError:
+                        continue
+                    accepted.add(coding.strip().lower())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _is_compressible(self, headers) -> bool:
+        for name, value in headers:
+            if name == b"content-type":
+                return value.startswith(self.COMPRESSIBLE_TYPES)
+        return False
+
+    def _should_compress(self, headers, body: bytes) -> bool:
+        if len(body) < self.min_bytes:
+            return False
+        if any(name == b"content-encoding" for name, _ in headers):
+            return False
+        return self._is_compressible(headers)
+
+    @staticmethod
+    def _etag(headers):
+        for name, value in headers:
+            if name == b"etag":
+                return value
+        return None
+
+    @staticmethod
+    def _with_vary(headers):
+        for i, (name, value) in enumerate(headers):
+            if name == b"vary":
+                if b"accept-encoding" in value.lower():
+                    return headers
+                return headers[:i] + [(b"vary", value + b", Accept-Encoding")] + headers[i + 1:]
+        return headers + [(b"vary", b"Accept-Encoding")]
+
+    async def _compress(self, etag, encoding: str, body: bytes) -> bytes:
+        key = (etag, encoding)
+        if etag is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                cache_requests_counter.labels(namespace="compression", result="hit").inc()
+                return cached
+            cache_requests_counter.labels(namespace="compression", result="miss").inc()
+
+        if len(body) >= self.THREAD_THRESHOLD:
+            compressed = await asyncio.to_thread(self._compress_sync, encoding, body)
+        else:
+            compressed = self._compress_sync(encoding, body)
+
+        if etag is not None and len(compressed) <= self.cache_bytes:
+            if key not in self._cache:
+                self._cache[key] = compressed
+                self._cached_bytes += len(compressed)
+            while self._cached_bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+        return compressed
+
+    def _compress_sync(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
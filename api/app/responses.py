@@ -0,0 +1,54 @@
+from typing import Any
+from fastapi.responses import Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+import pydantic_core
+
+try:
+    import orjson
+except ImportError:  # pydantic_core (siempre instalado) también serializa en Rust
+    orjson = None
+
+
+def json_dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return pydantic_core.to_json(content)
+
+
+def json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return pydantic_core.from_json(data)
+
+
+class FastJSONResponse(Response):
+    """
+    Respuesta JSON para datos ya validados: bytes ya serializados (entradas de
+    cache, TypeAdapter.dump_json) se envían tal cual y dicts/listas se
+    serializan con orjson. Al devolver un Response, FastAPI no vuelve a validar
+    contra response_model ni pasa por jsonable_encoder + json.dumps.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return json_dumps(content)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse cuyo generador sigue leyendo el cuerpo del request
+    mientras responde. No lanza la tarea que escucha la desconexión en
+    paralelo (con ASGI < 2.4 esa tarea consume receive() y se quedaría con el
+    cuerpo); una desconexión igual se detecta al leer (ClientDisconnect) o al
+    escribir.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,143 @@
+"""
+Benchmark de la ruta de escritura de SQLRepository.create_diagnosis.
+
+Compara la implementación anterior (un commit por cada entidad creada) con la
+actual (una transacción, flush() para obtener ids e inserciones masivas de
+mediciones y observaciones). Reporta round-trips, commits y latencia por informe.
+
+Uso (desde api/):
+    python -m benchmarks.bench_create_diagnosis --reports 200 --measurements 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import QueryCounter, configure_sqlite, make_diagnosis_payload, percentile
+
+configure_sqlite()
+
+from datetime import datetime  # noqa: E402
+
+from database.sql_connection import get_sql_engine, get_sql_session, sql_connection  # noqa: E402
+from models.entities import (  # noqa: E402
+    Estudios, Informes, Medidas, Mediciones, Observaciones, Organos, Pacientes,
+    Tipos_Estudios, Unidades, Veterinarios,
+)
+from models.schemas import DiagnosisCreate  # noqa: E402
+from repositories.sql_repository import SQLRepository  # noqa: E402
+
+
+def _legacy_get_or_create(session, model, column, value):
+    instance = session.query(model).filter_by(**{column: value}).first()
+    if not instance:
+        instance = model(**{column: value})
+        session.add(instance)
+        session.commit()
+    return instance
+
+
+def legacy_create_diagnosis(session, data: DiagnosisCreate) -> int:
+    """Réplica de la ruta anterior: commit tras cada entidad"""
+    p = data.paciente
+    paciente = session.query(Pacientes).filter_by(nombre=p.nombre, tutor=p.tutor, edad=p.edad, raza=p.raza).first()
+    if not paciente:
+        paciente = Pacientes(nombre=p.nombre, tutor=p.tutor, edad=p.edad, raza=p.raza)
+        session.add(paciente)
+        session.commit()
+    v = data.veterinario
+    veterinario = session.query(Veterinarios).filter_by(nombre=v.nombre, apellido=v.apellido).first()
+    if not veterinario:
+        veterinario = Veterinarios(nombre=v.nombre, apellido=v.apellido, matricula=v.matricula)
+        session.add(veterinario)
+        session.commit()
+    informe = Informes(
+        antecedentes=data.informe.antecedentes,
+        diagnostico=data.informe.diagnostico,
+        img_folder=data.informe.img_folder,
+        fecha=datetime.strptime(data.informe.fecha, "%d/%m/%Y").date(),
+        fk_paciente=paciente.id,
+        fk_referido=veterinario.id,
+    )
+    session.add(informe)
+    session.commit()
+    for estudio_data in data.informe.estudios:
+        tipo = _legacy_get_or_create(session, Tipos_Estudios, "tipo_estudio", estudio_data.tipo_estudio)
+        estudio = Estudios(fk_informe=informe.id, fk_tipos_estudios=tipo.id)
+        session.add(estudio)
+        session.commit()
+        for m in estudio_data.mediciones:
+            organo = _legacy_get_or_create(session, Organos, "nombre", m.organo)
+            unidad = _legacy_get_or_create(session, Unidades, "unidad", m.unidad) if m.unidad else None
+            medida = _legacy_get_or_create(session, Medidas, "medida", m.tipo_medicion)
+            session.add(Mediciones(
+                tipo_medicion=m.tipo_medicion, valor=str(m.valor), fk_organo=organo.id,
+                fk_medida=medida.id, fk_unidad=unidad.id if unidad else None, fk_estudio=estudio.id,
+            ))
+        for o in estudio_data.observaciones:
+            organo = _legacy_get_or_create(session, Organos, "nombre", o.organo)
+            session.add(Observaciones(observacion=o.observacion, fk_organo=organo.id, fk_estudio=estudio.id))
+        session.commit()
+    session.commit()
+    return informe.id
+
+
+def run_legacy(payloads, counter):
+    session_factory = get_sql_session()
+    latencies = []
+    counter.reset()
+    for data in payloads:
+        session = session_factory()
+        start = time.perf_counter()
+        try:
+            legacy_create_diagnosis(session, data)
+        finally:
+            session.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies, counter.statements, counter.commits
+
+
+def run_current(payloads, counter):
+    repository = SQLRepository()
+    latencies = []
+    counter.reset()
+
+    async def _run():
+        for data in payloads:
+            start = time.perf_counter()
+            await repository.create_diagnosis(data)
+            latencies.append(time.perf_counter() - start)
+
+    asyncio.run(_run())
+    return latencies, counter.statements, counter.commits
+
+
+def report(name, latencies, statements, commits, reports):
+    print(
+        f"{name:<10} round-trips/informe={statements / reports:7.1f}  commits/informe={commits / reports:5.1f}  "
+        f"p50={statistics.median(latencies) * 1000:7.2f}ms  p95={percentile(latencies, 95) * 1000:7.2f}ms  "
+        f"total={sum(latencies):6.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--studies", type=int, default=3)
+    parser.add_argument("--measurements", type=int, default=10, help="mediciones por estudio")
+    parser.add_argument("--observations", type=int, default=4, help="observaciones por estudio")
+    args = parser.parse_args()
+
+    payloads = [
+        DiagnosisCreate(**make_diagnosis_payload(i, args.studies, args.measurements, args.observations))
+        for i in range(args.reports)
+    ]
+    engines = [e for e in (get_sql_engine(), sql_connection.get_async_engine()) if e is not None]
+    counter = QueryCounter(*engines)
+
+    report("anterior", *run_legacy(payloads, counter), args.reports)
+    report("actual", *run_current(payloads, counter), args.reports)
+
+
+if __name__ == "__main__":
+    main()
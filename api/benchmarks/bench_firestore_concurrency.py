@@ -0,0 +1,130 @@
+"""
+Benchmark de concurrencia del repositorio Firestore contra el emulador.
+
+Simula la carga del dashboard (listado del sidebar, detalle de informe y
+sugerencias de pacientes, en ese orden rotativo) con N clientes concurrentes y
+mide throughput, latencia y retraso del event loop (un latido cada 5 ms) en
+dos modos:
+
+    hilos   FirestoreRepository: cliente síncrono en el pool de hilos por defecto
+    async   AsyncFirestoreRepository: firestore.AsyncClient en el event loop
+
+Verifica que ambos modos devuelvan las mismas respuestas para el listado y el
+detalle. Termina con código 1 si difieren y 2 si no hay emulador.
+
+Uso (desde api/, con el emulador levantado):
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.bench_firestore_concurrency --clients 8 32 128
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.common import make_diagnosis_payload, percentile
+
+if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+    print("FIRESTORE_EMULATOR_HOST no está definido: este benchmark corre contra el emulador")
+    sys.exit(2)
+os.environ.setdefault("DB_TYPE", "FIRESTORE")
+
+from models.schemas import DiagnosisCreate, DiagnosisListQuery  # noqa: E402
+from repositories.async_firestore_repository import AsyncFirestoreRepository  # noqa: E402
+from repositories.firestore_repository import FirestoreRepository  # noqa: E402
+
+MODES = {"hilos": FirestoreRepository, "async": AsyncFirestoreRepository}
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+def _dashboard_operations(repository, ids):
+    """Operaciones de una vista del dashboard, en el orden en que las pide el front"""
+    return [
+        lambda i: repository.get_all_diagnoses(DiagnosisListQuery(limit=50)),
+        lambda i: repository.get_diagnosis(ids[i % len(ids)]),
+        lambda i: repository.search_patients(f"paciente {i % 50}", limit=10),
+    ]
+
+
+async def _load(repository_class, project_id: str, ids, clients: int, requests: int):
+    # El cliente asíncrono queda ligado al loop: se crea dentro de la corrida
+    repository = repository_class(project_id=project_id)
+    operations = _dashboard_operations(repository, ids)
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+
+    async def client(n):
+        for i in range(requests):
+            start = time.perf_counter()
+            await operations[(n + i) % len(operations)](n * requests + i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    return elapsed, latencies, lags
+
+
+async def _responses(repository_class, project_id: str, ids):
+    repository = repository_class(project_id=project_id)
+    page = await repository.get_all_diagnoses(DiagnosisListQuery(limit=50))
+    details = await asyncio.gather(*(repository.get_diagnosis(diagnosis_id) for diagnosis_id in ids[:10]))
+    return page, details
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--clients", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--requests", type=int, default=15, help="operaciones por cliente")
+    args = parser.parse_args()
+
+    # Proyecto propio por corrida para no mezclar datos en el emulador
+    project_id = f"diagnovet-bench-{os.getpid()}"
+
+    async def seed():
+        repository = AsyncFirestoreRepository(project_id=project_id)
+        semaphore = asyncio.Semaphore(16)
+
+        async def create(i):
+            async with semaphore:
+                return await repository.create_diagnosis(DiagnosisCreate(**make_diagnosis_payload(i, 2, 5, 2)))
+
+        return await asyncio.gather(*(create(i) for i in range(args.reports)))
+
+    ids = asyncio.run(seed())
+    print(f"{args.reports} informes cargados en el emulador")
+
+    failures = []
+    responses = {name: asyncio.run(_responses(cls, project_id, ids)) for name, cls in MODES.items()}
+    if responses["hilos"] != responses["async"]:
+        failures.append("las respuestas del cliente asíncrono difieren del síncrono")
+
+    for clients in args.clients:
+        total = clients * args.requests
+        for name, repository_class in MODES.items():
+            elapsed, latencies, lags = asyncio.run(_load(repository_class, project_id, ids, clients, args.requests))
+            print(
+                f"clientes={clients:<4} {name:<6} {total / elapsed:8.1f} req/s  "
+                f"p50={statistics.median(latencies) * 1000:7.2f}ms  p95={percentile(latencies, 95) * 1000:7.2f}ms  "
+                f"lag loop p99={percentile(lags, 99) * 1000:7.2f}ms max={max(lags, default=0) * 1000:7.2f}ms"
+            )
+
+    for failure in failures:
+        print(f"FALLA: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Benchmark y chequeo de regresión de FirestoreRepository.get_diagnosis contra
+el emulador de Firestore.
+
+Para informes de distinta cantidad de estudios cuenta los RPC de lectura,
+los documentos leídos y las rondas secuenciales (lecturas que esperan a otras)
+y compara contra la lectura anterior (diagnóstico, paciente, veterinario,
+estudios y dos consultas por estudio, todo en serie). Verifica:
+
+    RPC     == 3 + 2 * ceil(estudios / 30)
+    rondas  == 2
+    respuesta idéntica a la lectura anterior
+
+Uso (desde api/, con el emulador levantado):
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.bench_firestore_get_diagnosis
+Termina con código 1 si alguna verificación falla y 2 si no hay emulador.
+"""
+import argparse
+import asyncio
+import math
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.common import make_diagnosis_payload
+
+if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+    print("FIRESTORE_EMULATOR_HOST no está definido: este benchmark corre contra el emulador")
+    sys.exit(2)
+os.environ.setdefault("DB_TYPE", "FIRESTORE")
+
+from models.schemas import (  # noqa: E402
+    DiagnosisCreate, DiagnosisResponse, MeasurementResponse, ObservationResponse,
+    PatientResponse, StudyResponse, VeterinarianResponse
+)
+from repositories.firestore_repository import IN_QUERY_LIMIT, FirestoreRepository  # noqa: E402
+
+# (estudios, mediciones por estudio, observaciones por estudio)
+SIZES = [(1, 5, 2), (5, 10, 4), (10, 10, 4), (40, 3, 1)]
+EXPECTED_ROUNDS = 2
+
+
+class ReadCounter:
+    """Envuelve las primitivas de lectura del repositorio contando RPC, documentos y rondas"""
+
+    def __init__(self, repository: FirestoreRepository):
+        self.reset()
+        for name in ("_get_doc", "_get_all", "_get_docs"):
+            setattr(repository, name, self._wrap(getattr(repository, name)))
+
+    def reset(self):
+        self.rpcs = 0
+        self.documents = 0
+        self.rounds = 0
+        self._in_flight = 0
+
+    def _wrap(self, fn):
+        async def wrapper(*args, **kwargs):
+            # Una ronda empieza cuando no había ninguna lectura en vuelo
+            if self._in_flight == 0:
+                self.rounds += 1
+            self._in_flight += 1
+            self.rpcs += 1
+            try:
+                result = await fn(*args, **kwargs)
+            finally:
+                self._in_flight -= 1
+            self.documents += len(result) if isinstance(result, list) else 1
+            return result
+        return wrapper
+
+
+def legacy_get_diagnosis(repository: FirestoreRepository, diagnosis_id: str):
+    """Lectura anterior: todo secuencial, dos consultas por estudio. Devuelve (respuesta, rpcs)"""
+    db, collections = repository.db, repository.collections
+    rpcs = 0
+    diagnosis = db.collection(collections['diagnoses']).document(diagnosis_id).get().to_dict()
+    patient = db.collection(collections['patients']).document(diagnosis['patient_id']).get().to_dict()
+    vet = db.collection(collections['veterinarians']).document(diagnosis['veterinarian_id']).get().to_dict()
+    rpcs += 3
+    studies = db.collection(collections['studies']).where('diagnosis_id', '==', diagnosis_id).get()
+    rpcs += 1
+    estudios = []
+    for study in studies:
+        measurements = db.collection(collections['measurements']).where('study_id', '==', study.id).get()
+        observations = db.collection(collections['observations']).where('study_id', '==', study.id).get()
+        rpcs += 2
+        estudios.append(StudyResponse(
+            id=study.id,
+            tipo_estudio=study.get('tipo_estudio'),
+            mediciones=[
+                MeasurementResponse(id=d.id, tipo_medicion=m['tipo_medicion'], valor=m['valor'],
+                                    organo=m['organo'], unidad=m.get('unidad'))
+                for d in measurements for m in [d.to_dict()]
+            ],
+            observaciones=[
+                ObservationResponse(id=d.id, observacion=o['observacion'], organo=o['organo'])
+                for d in observations for o in [d.to_dict()]
+            ],
+        ))
+    response = DiagnosisResponse(
+        id=diagnosis_id,
+        antecedentes=diagnosis.get('antecedentes'),
+        diagnostico=diagnosis.get('diagnostico'),
+        fecha=diagnosis['fecha'].date(),
+        img_folder=diagnosis.get('img_folder'),
+        paciente=PatientResponse(id=diagnosis['patient_id'], nombre=patient['nombre'], tutor=patient['tutor'],
+                                 edad=str(patient['edad']), raza=patient.get('raza')),
+        veterinario=VeterinarianResponse(id=diagnosis['veterinarian_id'], nombre=vet['nombre'],
+                                         apellido=vet['apellido'], matricula=vet.get('matricula')),
+        estudios=estudios,
+    )
+    return response, rpcs
+
+
+def median_ms(fn, repeat: int) -> float:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    # Proyecto propio por corrida para no mezclar datos en el emulador
+    repository = FirestoreRepository(project_id=f"diagnovet-bench-{os.getpid()}")
+    counter = ReadCounter(repository)
+    failures = []
+
+    print(f"{'estudios':>8}{'RPC antes':>11}{'RPC ahora':>11}{'docs':>7}{'rondas':>8}{'antes ms':>10}{'ahora ms':>10}")
+    for index, (studies, measurements, observations) in enumerate(SIZES):
+        payload = DiagnosisCreate(**make_diagnosis_payload(index, studies, measurements, observations))
+        diagnosis_id = asyncio.run(repository.create_diagnosis(payload))
+
+        legacy, legacy_rpcs = legacy_get_diagnosis(repository, diagnosis_id)
+        counter.reset()
+        current = asyncio.run(repository.get_diagnosis(diagnosis_id))
+        rpcs, documents, rounds = counter.rpcs, counter.documents, counter.rounds
+
+        expected_rpcs = 3 + 2 * math.ceil(studies / IN_QUERY_LIMIT)
+        if rpcs != expected_rpcs:
+            failures.append(f"{studies} estudios: {rpcs} RPC (esperados {expected_rpcs})")
+        if rounds != EXPECTED_ROUNDS:
+            failures.append(f"{studies} estudios: {rounds} rondas (esperadas {EXPECTED_ROUNDS})")
+        if current != legacy:
+            failures.append(f"{studies} estudios: la respuesta difiere de la lectura anterior")
+
+        legacy_ms = median_ms(lambda: legacy_get_diagnosis(repository, diagnosis_id), args.repeat)
+        current_ms = median_ms(lambda: asyncio.run(repository.get_diagnosis(diagnosis_id)), args.repeat)
+        print(f"{studies:>8}{legacy_rpcs:>11}{rpcs:>11}{documents:>7}{rounds:>8}{legacy_ms:>10.1f}{current_ms:>10.1f}")
+
+    for failure in failures:
+        print(f"FALLA: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark y chequeo de regresión de la ruta de lectura de SQLRepository.get_diagnosis.
+
+Crea informes de tamaño creciente y verifica que la cantidad de consultas
+emitidas por get_diagnosis sea fija (EXPECTED_QUERIES) sin importar la cantidad
+de estudios, mediciones y observaciones. Compara además la latencia contra la
+carga anterior (joinedload encadenado + lazy loads de órgano/unidad).
+
+Uso (desde api/):
+    python -m benchmarks.bench_get_diagnosis
+Termina con código 1 si el número de consultas cambia con el tamaño del informe.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from benchmarks.common import QueryCounter, configure_sqlite, make_diagnosis_payload
+
+configure_sqlite()
+
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from database.sql_connection import get_sql_engine, get_sql_session  # noqa: E402
+from models.entities import Estudios, Informes  # noqa: E402
+from models.schemas import DiagnosisCreate  # noqa: E402
+from repositories.sql_repository import SQLRepository  # noqa: E402
+
+EXPECTED_QUERIES = 4
+SIZES = [(1, 1, 0), (3, 10, 4), (5, 30, 10), (8, 60, 20)]
+
+
+def legacy_get_diagnosis(repository, session, diagnosis_id):
+    informe = session.query(Informes).options(
+        joinedload(Informes.paciente),
+        joinedload(Informes.veterinario),
+        joinedload(Informes.estudios).joinedload(Estudios.mediciones),
+        joinedload(Informes.estudios).joinedload(Estudios.observaciones),
+        joinedload(Informes.estudios).joinedload(Estudios.tipo_estudio),
+    ).filter(Informes.id == diagnosis_id).first()
+    return repository._map_to_diagnosis_response(informe)
+
+
+def measure(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Sesiones síncronas para contar las consultas sobre un único engine
+    repository = SQLRepository(session_factory=get_sql_session())
+    counter = QueryCounter(get_sql_engine())
+    failed = False
+
+    for index, (studies, measurements, observations) in enumerate(SIZES):
+        payload = make_diagnosis_payload(index, studies, measurements, observations)
+        diagnosis_id = int(asyncio.run(repository.create_diagnosis(DiagnosisCreate(**payload))))
+
+        counter.reset()
+        repository._run_blocking(repository._get_diagnosis, diagnosis_id)
+        queries = counter.statements
+
+        counter.reset()
+        repository._run_blocking(lambda s: legacy_get_diagnosis(repository, s, diagnosis_id))
+        legacy_queries = counter.statements
+
+        current_ms = measure(lambda: repository._run_blocking(repository._get_diagnosis, diagnosis_id), args.repeat)
+        legacy_ms = measure(
+            lambda: repository._run_blocking(lambda s: legacy_get_diagnosis(repository, s, diagnosis_id)), args.repeat
+        )
+        print(
+            f"estudios={studies:2d} mediciones/estudio={measurements:3d} observaciones/estudio={observations:3d}  "
+            f"consultas: anterior={legacy_queries:4d} actual={queries:2d}  "
+            f"p50: anterior={legacy_ms:7.2f}ms actual={current_ms:7.2f}ms"
+        )
+        if queries != EXPECTED_QUERIES:
+            failed = True
+            print(f"  ERROR: se esperaban {EXPECTED_QUERIES} consultas y se emitieron {queries}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
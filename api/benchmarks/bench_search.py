@@ -0,0 +1,146 @@
+"""
+Benchmark de la búsqueda de texto completo sobre un corpus sintético.
+
+Genera N informes (por defecto 100.000) con textos en español con acentos,
+los carga con SQLBulkImporter (que escribe los documentos de búsqueda e
+indexa FTS5 por trigger) y mide la latencia de /search en:
+
+    fts5      SQLRepository.search_diagnoses (índice FTS5, SQLite)
+    memoria   InvertedIndex (el índice que usa el backend Firestore)
+    like      conteo con LIKE '%término%' sin índice (recorrido completo), como referencia
+
+Verifica además que el plegado de acentos funcione ("rinon" encuentra
+"riñón") y que FTS5 e InvertedIndex devuelvan la misma cantidad de
+coincidencias. Termina con código 1 si alguna verificación falla.
+
+Uso (desde api/):
+    python -m benchmarks.bench_search --reports 100000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from benchmarks.common import configure_sqlite, make_diagnosis_payload, percentile
+
+configure_sqlite()
+
+from sqlalchemy import text  # noqa: E402
+
+from database.sql_connection import get_sql_session  # noqa: E402
+from models.schemas import DiagnosisCreate, SearchQuery  # noqa: E402
+from repositories.inverted_index import InvertedIndex  # noqa: E402
+from repositories.sql_bulk_importer import SQLBulkImporter  # noqa: E402
+from repositories.sql_repository import SQLRepository  # noqa: E402
+
+HALLAZGOS = [
+    "cardiomegalia moderada", "hepatomegalia leve", "esplenomegalia difusa",
+    "nefrolitiasis en riñón izquierdo", "cálculo vesical único", "efusión pleural",
+    "gastritis crónica", "colecistitis", "ecogenicidad aumentada del parénquima",
+    "dilatación gástrica", "masa esplénica hipoecoica", "pielectasia bilateral",
+    "engrosamiento de la pared vesical", "neumonía intersticial", "sin hallazgos patológicos",
+]
+ANTECEDENTES = [
+    "Vómitos intermitentes", "Pérdida de peso", "Control postquirúrgico", "Disnea de esfuerzo",
+    "Hematuria", "Poliuria y polidipsia", "Control de rutina", "Dolor abdominal",
+]
+OBSERVACIONES = [
+    "Ecogenicidad conservada", "Bordes irregulares", "Contenido anecoico", "Parénquima heterogéneo",
+    "Imagen hiperecoica con sombra acústica", "Vesícula biliar con barro", "Riñón de tamaño aumentado",
+]
+
+# Hallazgo poco frecuente (1 de cada 1000 informes) para consultas selectivas
+HALLAZGO_RARO = "torsión esplénica"
+
+QUERIES = ["torsion", "cardiomegalia", "rinon", "calculo vesical", "ecogenicidad aumentada", "nefro", "perdida peso"]
+
+
+def make_corpus_payload(index: int) -> dict:
+    rnd = random.Random(index)
+    payload = make_diagnosis_payload(index, studies=1, measurements=0, observations=2)
+    payload["informe"]["antecedentes"] = rnd.choice(ANTECEDENTES)
+    payload["informe"]["diagnostico"] = "; ".join(rnd.sample(HALLAZGOS, 2))
+    if index % 1000 == 0:
+        payload["informe"]["diagnostico"] += f"; {HALLAZGO_RARO}"
+    for obs in payload["informe"]["estudios"][0]["observaciones"]:
+        obs["observacion"] = rnd.choice(OBSERVACIONES)
+    return payload
+
+
+def load_corpus(reports: int, chunk_size: int = 2000) -> InvertedIndex:
+    importer = SQLBulkImporter(chunk_size=chunk_size)
+    index = InvertedIndex()
+    started = time.perf_counter()
+    for start in range(0, reports, chunk_size):
+        batch = [DiagnosisCreate(**make_corpus_payload(i)) for i in range(start, min(start + chunk_size, reports))]
+        importer.import_records(batch)
+        for i, record in enumerate(batch, start=start):
+            index.add(str(i), {
+                "antecedentes": record.informe.antecedentes,
+                "diagnostico": record.informe.diagnostico,
+                "observaciones": "\n".join(o.observacion for o in record.informe.estudios[0].observaciones),
+            }, {})
+    print(f"Corpus de {reports} informes cargado en {time.perf_counter() - started:.1f}s")
+    return index
+
+
+def measure(fn, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentile(latencies, 50), percentile(latencies, 95)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    index = load_corpus(args.reports)
+    repository = SQLRepository(session_factory=get_sql_session())
+    session = get_sql_session()()
+    failures = []
+
+    print(f"{'consulta':<24}{'fts5 p50/p95 ms':>18}{'memoria p50/p95 ms':>22}{'like p50 ms':>14}{'coincidencias':>15}")
+    for q in QUERIES:
+        query = SearchQuery(q=q, limit=args.limit, include_total=True)
+        page = repository._search_diagnoses(session, query)
+        _, index_total = index.search(q, args.limit)
+        if page.total != index_total:
+            failures.append(f"'{q}': fts5={page.total} memoria={index_total}")
+
+        fts = measure(lambda: repository._search_diagnoses(session, SearchQuery(q=q, limit=args.limit)), args.repeat)
+        mem = measure(lambda: index.search(q, args.limit), args.repeat)
+        like_term = q.split()[0]
+        like = measure(lambda: session.execute(text(
+            "SELECT count(*) FROM informes_busqueda WHERE diagnostico LIKE :t OR antecedentes LIKE :t "
+            "OR observaciones LIKE :t"
+        ), {"t": f"%{like_term}%"}).scalar(), max(3, args.repeat // 10))
+        print(f"{q:<24}{fts[0]:>8.2f} / {fts[1]:<7.2f}{mem[0]:>11.2f} / {mem[1]:<8.2f}{like[0]:>12.2f}{page.total:>15}")
+
+    # El plegado de acentos: "rinon" y "calculo" deben encontrar "riñón" y "cálculo"
+    for q in ("rinon", "calculo"):
+        if not repository._search_diagnoses(session, SearchQuery(q=q, limit=1)).items:
+            failures.append(f"'{q}' no encontró resultados (plegado de acentos)")
+
+    # Paginación: la segunda página continúa la primera sin solaparse
+    first = asyncio.run(repository.search_diagnoses(SearchQuery(q="cardiomegalia", limit=10)))
+    second = asyncio.run(repository.search_diagnoses(
+        SearchQuery(q="cardiomegalia", limit=10, cursor=first.next_cursor)
+    ))
+    if {h.id for h in first.items} & {h.id for h in second.items}:
+        failures.append("las páginas 1 y 2 se solapan")
+    session.close()
+
+    for failure in failures:
+        print(f"FALLA: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark de serialización del listado /all_diagnoses (1k, 10k y 100k items).
+
+Compara, sobre la misma página de SidebarDiagnosisItem:
+
+    anterior   jsonable_encoder + json.dumps de starlette (lo que hacía FastAPI
+               al devolver page.items)
+    miss       model_dump_json de la página (al llenar la cache) + extracción
+               de los items con orjson y FastJSONResponse
+    hit        solo la extracción desde la entrada de cache ya serializada
+
+Verifica además que los tres cuerpos sean el mismo JSON.
+
+Uso (desde api/):
+    python -m benchmarks.bench_serialization --sizes 1000 10000 100000
+Termina con código 1 si algún cuerpo difiere o si la ruta rápida no es más
+rápida que la anterior.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import configure_sqlite
+
+configure_sqlite()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app.responses import FastJSONResponse, json_loads, orjson  # noqa: E402
+from models.schemas import SidebarDiagnosisItem, SidebarDiagnosisPage  # noqa: E402
+from services.diagnosis_cache import CacheEntry  # noqa: E402
+
+RAZAS = ["mestizo", "caniche", "labrador", "siamés", "ovejero alemán", None]
+
+
+def make_page(size: int) -> SidebarDiagnosisPage:
+    rng = random.Random(size)
+    items = [
+        SidebarDiagnosisItem(
+            id=str(size - i),
+            nombre=f"Paciente {i}",
+            tutor=f"Tutor {rng.randint(1, size // 3 + 1)}",
+            edad=f"{rng.randint(1, 16)} años",
+            raza=rng.choice(RAZAS),
+            fecha=date(2025, 1, 1) - timedelta(days=i // 20),
+        )
+        for i in range(size)
+    ]
+    return SidebarDiagnosisPage(items=items, next_cursor="eyJpZCI6IDF9", total=size)
+
+
+def legacy_body(page: SidebarDiagnosisPage) -> bytes:
+    return JSONResponse(jsonable_encoder(page.items)).body
+
+
+def fast_body(payload: bytes) -> bytes:
+    return FastJSONResponse(json_loads(payload)["items"]).body
+
+
+def measure(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Codificador: {'orjson' if orjson is not None else 'pydantic_core'}")
+    print(f"{'items':>8} {'anterior ms':>12} {'miss ms':>10} {'hit ms':>9} {'x hit':>7} {'bytes':>11}")
+    failures = 0
+    for size in args.sizes:
+        page = make_page(size)
+        payload = CacheEntry.from_model(page).payload
+
+        legacy = legacy_body(page)
+        fast = fast_body(payload)
+        if json.loads(legacy) != json.loads(fast):
+            print(f"ERROR: los cuerpos difieren con {size} items")
+            failures += 1
+            continue
+
+        legacy_ms = measure(lambda: legacy_body(page), args.repeat)
+        miss_ms = measure(lambda: fast_body(CacheEntry.from_model(page).payload), args.repeat)
+        hit_ms = measure(lambda: fast_body(payload), args.repeat)
+        print(f"{size:>8} {legacy_ms:>12.2f} {miss_ms:>10.2f} {hit_ms:>9.2f} {legacy_ms / hit_ms:>6.1f}x {len(fast):>11}")
+        if miss_ms >= legacy_ms:
+            print(f"ERROR: la ruta rápida no mejora a la anterior con {size} items")
+            failures += 1
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Benchmark de concurrencia del repositorio SQL bajo carga.
+
+Lanza N clientes concurrentes que leen informes con get_diagnosis y mide el
+throughput, la latencia y el retraso del event loop (un latido cada 5 ms) en
+tres modos:
+
+    bloqueante  sesión síncrona dentro de la corrutina (comportamiento anterior)
+    hilos       sesiones síncronas en el pool de hilos acotado (fallback)
+    async       AsyncSession sobre aiosqlite (si está instalado)
+    wal         SQLiteRepository: un escritor y un pool de lectores en modo WAL
+
+Uso (desde api/):
+    python -m benchmarks.bench_sql_concurrency --clients 50 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.common import configure_sqlite, make_diagnosis_payload, percentile
+
+os.environ["SQLITE_PATH"] = configure_sqlite()
+
+from database.sql_connection import SQLiteConnection, get_sql_async_session, get_sql_session  # noqa: E402
+from models.schemas import DiagnosisCreate  # noqa: E402
+from repositories.sql_repository import SQLRepository  # noqa: E402
+from repositories.sqlite_repository import SQLiteRepository  # noqa: E402
+
+
+class BlockingSQLRepository(SQLRepository):
+    """Ejecuta las sesiones síncronas directamente en el event loop"""
+
+    async def _run(self, fn, *args, read: bool = False):
+        return self._run_blocking(fn, *args)
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _load(repository, ids, clients: int, requests: int):
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+
+    async def client(n):
+        for i in range(requests):
+            diagnosis_id = ids[(n * requests + i) % len(ids)]
+            start = time.perf_counter()
+            await repository.get_diagnosis(diagnosis_id)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    return elapsed, latencies, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="lecturas por cliente")
+    args = parser.parse_args()
+
+    seed_repository = SQLRepository(session_factory=get_sql_session())
+    ids = [
+        asyncio.run(seed_repository.create_diagnosis(DiagnosisCreate(**make_diagnosis_payload(i))))
+        for i in range(args.reports)
+    ]
+
+    modes = {
+        "bloqueante": BlockingSQLRepository(session_factory=get_sql_session()),
+        "hilos": seed_repository,
+    }
+    if get_sql_async_session() is not None:
+        modes["async"] = SQLRepository()
+    else:
+        print("aiosqlite no instalado: se omite el modo async")
+    # Misma base: la conexión SQLite embebida la pasa a WAL y abre sus propios pools
+    sqlite_connection = SQLiteConnection()
+    modes["wal"] = SQLiteRepository(
+        session_factory=sqlite_connection.get_session_factory(),
+        async_session_factory=sqlite_connection.get_async_session_factory(),
+        read_session_factory=sqlite_connection.get_read_session_factory(),
+        async_read_session_factory=sqlite_connection.get_async_read_session_factory()
+    )
+
+    total = args.clients * args.requests
+    for name, repository in modes.items():
+        elapsed, latencies, lags = asyncio.run(_load(repository, ids, args.clients, args.requests))
+        print(
+            f"{name:<11} {total / elapsed:8.1f} req/s  p50={statistics.median(latencies) * 1000:7.2f}ms  "
+            f"p95={percentile(latencies, 95) * 1000:7.2f}ms  "
+            f"lag loop p99={percentile(lags, 99) * 1000:7.2f}ms max={max(lags, default=0) * 1000:7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Los benchmarks se ejecutan desde api/ (python -m benchmarks.<nombre>) contra
+una base SQLite local, por lo que `configure_sqlite` debe llamarse antes de
+importar cualquier módulo de la aplicación.
+"""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def configure_sqlite(path: str = None) -> str:
+    """Apuntar la aplicación a una base SQLite temporal"""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="diagnovet_bench_", suffix=".db")
+        os.close(fd)
+        os.remove(path)
+    os.environ["DB_TYPE"] = "SQL_SERVER"
+    os.environ["SQL_URL"] = f"sqlite:///{path}"
+    return path
+
+
+ORGANOS = ["hígado", "bazo", "riñón izquierdo", "riñón derecho", "vejiga", "corazón", "estómago"]
+UNIDADES = ["mm", "cm", "ml", None]
+MEDIDAS = ["longitud", "espesor", "diámetro", "volumen"]
+TIPOS_ESTUDIO = ["ecografía abdominal", "ecocardiograma", "radiografía de tórax"]
+
+
+def make_diagnosis_payload(index: int, studies: int = 3, measurements: int = 10, observations: int = 4) -> dict:
+    """Generar un DiagnosisCreate sintético (como dict) de tamaño configurable"""
+    rnd = random.Random(index)
+    return {
+        "paciente": {
+            "nombre": f"Paciente {index % 500}",
+            "tutor": f"Tutor {index % 400}",
+            "edad": f"{rnd.randint(1, 15)} años",
+            "raza": rnd.choice(["mestizo", "labrador", "caniche", "bulldog"]),
+        },
+        "veterinario": {
+            "nombre": f"Vet {index % 20}",
+            "apellido": "Referente",
+            "matricula": 1000 + index % 20,
+        },
+        "informe": {
+            "antecedentes": "Control de rutina",
+            "diagnostico": "Sin hallazgos patológicos relevantes",
+            "img_folder": f"{index}_images",
+            "fecha": f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/20{rnd.randint(18, 25)}",
+            "estudios": [
+                {
+                    "tipo_estudio": TIPOS_ESTUDIO[s % len(TIPOS_ESTUDIO)],
+                    "mediciones": [
+                        {
+                            "tipo_medicion": rnd.choice(MEDIDAS),
+                            "valor": round(rnd.uniform(1, 100), 2),
+                            "unidad": rnd.choice(UNIDADES),
+                            "organo": rnd.choice(ORGANOS),
+                        }
+                        for _ in range(measurements)
+                    ],
+                    "observaciones": [
+                        {"organo": rnd.choice(ORGANOS), "observacion": "Ecogenicidad conservada"}
+                        for _ in range(observations)
+                    ],
+                }
+                for s in range(studies)
+            ],
+        },
+    }
+
+
+class QueryCounter:
+    """Cuenta sentencias (round-trips) y commits ejecutados sobre uno o más engines"""
+
+    def __init__(self, *engines):
+        from sqlalchemy import event
+
+        self.statements = 0
+        self.commits = 0
+        for engine in engines:
+            engine = getattr(engine, "sync_engine", engine)
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+            event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args, **kwargs):
+        self.statements += 1
+
+    def _on_commit(self, *args, **kwargs):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+
+@contextmanager
+def timed(results: dict, key: str):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,45 @@
+"""
+Completar las claves de búsqueda normalizadas (nombre_norm / tutor_norm) de
+los pacientes existentes en Firestore.
+
+En SQL las agrega la migración 5 (python -m cli.migrate); los pacientes nuevos
+ya se crean con las claves en ambos backends.
+
+Uso (desde api/):
+    python -m cli.backfill_patient_search
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.config import settings, DatabaseType
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if settings.database_type != DatabaseType.FIRESTORE:
+        logger.info("El backend SQL carga las claves con la migración 5: python -m cli.migrate")
+        return 0
+
+    from repositories.repository_factory import repository_factory
+
+    repository = repository_factory.get_repository()
+    try:
+        updated = asyncio.run(repository.backfill_patient_search_keys())
+    except Exception as e:
+        logger.error(f"No se pudieron completar las claves de búsqueda: {str(e)}")
+        return 1
+
+    logger.info(f"Claves de búsqueda actualizadas en {updated} pacientes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Importación masiva de informes históricos al backend SQL.
+
+Lee un archivo NDJSON (un DiagnosisCreate por línea) y lo escribe por lotes.
+Con --checkpoint la importación puede interrumpirse y retomarse: se guarda la
+última línea confirmada después de cada lote.
+
+Uso (desde api/):
+    python -m cli.bulk_import informes.ndjson --chunk-size 500 --checkpoint informes.ckpt
+"""
+import argparse
+import logging
+import sys
+
+from repositories.sql_bulk_importer import SQLBulkImporter
+from services.diagnosis_service import DiagnosisService
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="archivo NDJSON con un DiagnosisCreate por línea")
+    parser.add_argument("--chunk-size", type=int, default=500, help="informes por transacción (default: 500)")
+    parser.add_argument("--checkpoint", help="archivo de checkpoint para retomar la importación")
+    parser.add_argument("--skip-validation", action="store_true",
+                        help="no aplicar las validaciones de negocio de DiagnosisService")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    validate = None
+    if not args.skip_validation:
+        validate = DiagnosisService(repository=None)._validate_diagnosis_data
+
+    importer = SQLBulkImporter(chunk_size=args.chunk_size, validate=validate)
+    try:
+        stats = importer.import_file(
+            args.path,
+            checkpoint_path=args.checkpoint,
+            on_progress=lambda s: logger.info(f"Progreso: {s.summary()}")
+        )
+    except Exception as e:
+        logger.error(f"Importación interrumpida: {str(e)}")
+        if args.checkpoint:
+            logger.error(f"Puede retomarse con --checkpoint {args.checkpoint}")
+        return 1
+
+    logger.info(f"Importación finalizada: {stats.summary()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Fusionar pacientes y veterinarios duplicados en Firestore.
+
+Antes cada create_diagnosis creaba un paciente y un veterinario nuevos (ids
+uuid4). Ahora sus ids se derivan de la clave normalizada (paciente: nombre +
+tutor + edad + raza, como en SQL; veterinario: matrícula o nombre + apellido);
+este comando lleva los documentos existentes, incluidos los de la clave
+anterior sin edad, a ese id, reescribe patient_id / veterinarian_id en
+diagnósticos y en el listado lateral y borra los duplicados. Es idempotente.
+
+Uso (desde api/):
+    python -m cli.compact_firestore
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.config import settings, DatabaseType
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if settings.database_type != DatabaseType.FIRESTORE:
+        logger.info("El backend SQL ya deduplica pacientes y veterinarios al escribir")
+        return 0
+
+    from repositories.repository_factory import repository_factory
+
+    repository = repository_factory.get_repository()
+    try:
+        result = asyncio.run(repository.compact_duplicates())
+    except Exception as e:
+        logger.error(f"No se pudo completar la compactación: {str(e)}")
+        return 1
+
+    logger.info(
+        f"Compactación finalizada: {result['patients']} pacientes y {result['veterinarians']} veterinarios "
+        f"fusionados, {result['references']} referencias actualizadas"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
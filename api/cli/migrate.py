@@ -0,0 +1,51 @@
+"""
+Migraciones versionadas del esquema SQL.
+
+Por defecto la API aplica las migraciones pendientes al iniciar; con
+SQL_AUTO_MIGRATE=false se aplican explícitamente con este comando.
+
+Uso (desde api/):
+    python -m cli.migrate             # aplicar todas las pendientes
+    python -m cli.migrate --status    # ver versión actual y pendientes
+    python -m cli.migrate --target 1  # aplicar hasta la versión indicada
+"""
+import argparse
+import logging
+import sys
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="mostrar el estado sin aplicar cambios")
+    parser.add_argument("--target", type=int, help="versión máxima a aplicar")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    # Este comando decide qué aplicar: desactivar la migración automática de la conexión
+    settings.sql_auto_migrate = False
+    from database.sql_connection import get_sql_engine
+    from database.migrations import current_version, pending_migrations, run_migrations
+
+    engine = get_sql_engine()
+    if args.status:
+        pending = pending_migrations(engine)
+        with engine.connect() as conn:
+            logger.info(f"Versión actual: {current_version(conn)}")
+        for migration in pending:
+            logger.info(f"Pendiente {migration.version}: {migration.description}")
+        if not pending:
+            logger.info("No hay migraciones pendientes")
+        return 0
+
+    version = run_migrations(engine, target=args.target)
+    logger.info(f"Esquema en versión {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Migración del historial completo entre backends (SQL <-> Firestore).
+
+    sql-to-firestore   lee cada tabla con un cursor del servidor y escribe con
+                       BulkWriter en paralelo (ids de documento = ids SQL)
+    firestore-to-sql   recorre los diagnósticos por páginas y los escribe con
+                       SQLBulkImporter
+
+Con --checkpoint la migración puede interrumpirse y retomarse desde el último
+lote confirmado. Al terminar compara los conteos de origen y destino (el
+destino debería estar vacío antes de empezar) y termina con código 1 si no
+coinciden. Con --metrics-port expone las métricas Prometheus durante la
+corrida (diagnovet_migration_records_total).
+
+Uso (desde api/, con SQL_URL/SQL_ENGINE y FIRESTORE_PROJECT_ID configurados):
+    python -m cli.migrate_backend sql-to-firestore --checkpoint sql_fs.ckpt --max-ops 2000
+    python -m cli.migrate_backend firestore-to-sql --chunk-size 500
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.config import settings
+from repositories.backend_migration import (
+    FIRESTORE_TO_SQL, SQL_TO_FIRESTORE, FirestoreToSQLMigrator, SQLToFirestoreMigrator, verify_counts
+)
+from repositories.firestore_repository import FirestoreRepository
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("direction", choices=[SQL_TO_FIRESTORE, FIRESTORE_TO_SQL])
+    parser.add_argument("--project", default=settings.firestore_project_id, help="proyecto de Firestore")
+    parser.add_argument("--chunk-size", type=int, default=500, help="registros por lote (default: 500)")
+    parser.add_argument("--max-ops", type=int, default=2000,
+                        help="escrituras por segundo máximas de BulkWriter (default: 2000)")
+    parser.add_argument("--checkpoint", help="archivo de checkpoint para retomar la migración")
+    parser.add_argument("--metrics-port", type=int, help="exponer métricas Prometheus en este puerto")
+    parser.add_argument("--skip-verify", action="store_true", help="no comparar conteos al terminar")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if not args.project:
+        logger.error("FIRESTORE_PROJECT_ID no configurado (o --project)")
+        return 1
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+        start_http_server(args.metrics_port)
+
+    # Cliente síncrono: BulkWriter no admite AsyncClient y cada fase corre en su propio asyncio.run
+    repository = FirestoreRepository(project_id=args.project, credentials_path=settings.firestore_credentials_path)
+    on_progress = lambda s: logger.info(f"Progreso: {s.summary()}")
+    try:
+        if args.direction == SQL_TO_FIRESTORE:
+            migrator = SQLToFirestoreMigrator(repository, chunk_size=args.chunk_size, max_ops_per_second=args.max_ops)
+            stats = migrator.run(checkpoint_path=args.checkpoint, on_progress=on_progress)
+        else:
+            migrator = FirestoreToSQLMigrator(repository, chunk_size=args.chunk_size)
+            stats = asyncio.run(migrator.run(checkpoint_path=args.checkpoint, on_progress=on_progress))
+    except Exception as e:
+        logger.error(f"Migración interrumpida: {str(e)}")
+        if args.checkpoint:
+            logger.error(f"Puede retomarse con --checkpoint {args.checkpoint}")
+        return 1
+
+    logger.info(f"Migración finalizada: {stats.summary()}")
+    if args.skip_verify:
+        return 0
+
+    mismatches = 0
+    for entity, source, target, ok in asyncio.run(verify_counts(repository, args.direction)):
+        logger.info(f"{entity:<18} origen={source:<10} destino={target:<10} {'ok' if ok else 'DIFERENCIA'}")
+        mismatches += 0 if ok else 1
+    if mismatches:
+        logger.error(f"{mismatches} entidades con conteos distintos entre origen y destino")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Auditoría de planes de ejecución de las consultas del repositorio SQL.
+
+Ejecuta las operaciones calientes de SQLRepository (listados paginados y
+filtrados, lectura de un informe, búsqueda de pacientes, deduplicación de
+paciente/veterinario), captura las sentencias SELECT que emiten y obtiene
+su plan:
+
+    SQLite      EXPLAIN QUERY PLAN
+    SQL Server  SET SHOWPLAN_XML ON (no ejecuta la consulta)
+
+Marca los recorridos completos de tabla (table scan / clustered index scan)
+fuera de las tablas de dimensión. Termina con código 1 si encuentra alguno.
+Las escrituras de la deduplicación se revierten al final.
+
+Uso (desde api/):
+    python -m cli.query_plan_audit
+"""
+import argparse
+import logging
+import sys
+import xml.etree.ElementTree as ET
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import event, func
+
+logger = logging.getLogger(__name__)
+
+# Tablas chicas que se leen completas a propósito (cache de dimensiones)
+ALLOWED_SCANS = {"organos", "unidades", "medidas", "tipos_estudios", "schema_version"}
+SCAN_OPERATORS = {"Table Scan", "Clustered Index Scan", "Index Scan"}
+
+
+def capture_queries(engine, session_factory) -> List[Tuple[str, str, object]]:
+    """Correr las operaciones del repositorio y capturar sus SELECT"""
+    from models.entities import Informes
+    from models.schemas import DiagnosisListQuery, PatientCreate, PatientListQuery, VeterinarianCreate
+    from repositories.pagination import encode_cursor
+    from repositories.sql_repository import SQLRepository
+
+    repository = SQLRepository(session_factory=session_factory)
+    captured = []
+    current = {"label": None}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT") and current["label"]:
+            captured.append((current["label"], statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    session = session_factory()
+    try:
+        diagnosis_id = session.query(func.max(Informes.id)).scalar() or 1
+        cursor = encode_cursor(date.today().isoformat(), diagnosis_id)
+        operations = [
+            ("get_all_diagnoses (primera página)", lambda s: repository._get_all_diagnoses(
+                s, DiagnosisListQuery(limit=50))),
+            ("get_all_diagnoses (cursor)", lambda s: repository._get_all_diagnoses(
+                s, DiagnosisListQuery(limit=50, cursor=cursor))),
+            ("get_all_diagnoses (filtros + total)", lambda s: repository._get_all_diagnoses(
+                s, DiagnosisListQuery(limit=50, tutor="auditoria", raza="auditoria",
+                                      fecha_desde=date.today() - timedelta(days=30), include_total=True))),
+            ("get_patients (cursor)", lambda s: repository._get_patients(
+                s, PatientListQuery(limit=50, cursor=encode_cursor(1)))),
+            ("get_diagnosis", lambda s: repository._get_diagnosis(s, diagnosis_id)),
+            ("search_patients", lambda s: repository._search_patients(s, "Auditoría", 10, None)),
+            ("deduplicación de paciente", lambda s: repository._create_patient_entity(
+                PatientCreate(nombre="auditoria", tutor="auditoria", edad="1", raza="auditoria"), s)),
+            ("deduplicación de veterinario", lambda s: repository._create_veterinarian_entity(
+                VeterinarianCreate(nombre="auditoria", apellido="auditoria"), s)),
+        ]
+        for label, operation in operations:
+            current["label"] = label
+            operation(session)
+    finally:
+        current["label"] = None
+        session.rollback()
+        session.close()
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return captured
+
+
+def explain_sqlite(conn, statement, parameters) -> List[Tuple[str, bool]]:
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    findings = []
+    for row in rows:
+        detail = row[-1]
+        words = detail.split()
+        is_scan = len(words) >= 2 and words[0] == "SCAN" and "USING" not in words
+        table = words[1] if len(words) >= 2 else ""
+        findings.append((detail, is_scan and table not in ALLOWED_SCANS))
+    return findings
+
+
+def explain_mssql(conn, statement, parameters) -> List[Tuple[str, bool]]:
+    conn.exec_driver_sql("SET SHOWPLAN_XML ON")
+    try:
+        plan = conn.exec_driver_sql(statement, parameters).scalar()
+    finally:
+        conn.exec_driver_sql("SET SHOWPLAN_XML OFF")
+
+    findings = []
+    for rel_op in ET.fromstring(plan).iter("{*}RelOp"):
+        operator = rel_op.get("PhysicalOp")
+        if operator not in SCAN_OPERATORS:
+            continue
+        obj = rel_op.find(".//{*}Object")
+        table = (obj.get("Table") or "").strip("[]") if obj is not None else ""
+        index = (obj.get("Index") or "").strip("[]") if obj is not None else ""
+        detail = f"{operator} {table}{f' ({index})' if index else ''}"
+        findings.append((detail, table not in ALLOWED_SCANS))
+    return findings
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="mostrar el SQL de cada consulta")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from database.sql_connection import get_sql_engine, get_sql_session
+
+    engine = get_sql_engine()
+    explain = {"sqlite": explain_sqlite, "mssql": explain_mssql}.get(engine.dialect.name)
+    if explain is None:
+        logger.error(f"Dialecto no soportado para la auditoría: {engine.dialect.name}")
+        return 2
+
+    # Capturar antes de tomar la conexión del EXPLAIN: en SQLite el escritor
+    # tiene una sola conexión y la sesión de la captura se quedaría esperando
+    captured = capture_queries(engine, get_sql_session())
+    flagged = 0
+    with engine.connect() as conn:
+        for label, statement, parameters in captured:
+            findings = explain(conn, statement, parameters)
+            bad = [detail for detail, is_bad in findings if is_bad]
+            flagged += len(bad)
+            logger.info(f"{'SCAN' if bad else 'ok  '}  {label}")
+            if args.verbose:
+                logger.info(f"      {' '.join(statement.split())}")
+            for detail, is_bad in findings:
+                if is_bad or args.verbose:
+                    logger.info(f"      {'!!' if is_bad else '  '} {detail}")
+
+    if flagged:
+        logger.info(f"{flagged} recorridos completos de tabla detectados")
+        return 1
+    logger.info("Sin recorridos completos de tabla")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Regenerar la proyección del listado lateral (sidebar) del backend configurado.
+
+create_diagnosis y delete_all_data la mantienen en la misma transacción/batch;
+este comando la reconstruye desde los informes existentes (datos previos a la
+proyección o reparaciones manuales).
+
+    SQL        DELETE + INSERT ... SELECT en una transacción (sidebar_informes)
+    Firestore  reescribe sidebar_diagnosticos y borra entradas huérfanas
+
+Uso (desde api/):
+    python -m cli.rebuild_sidebar
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from repositories.repository_factory import repository_factory
+
+    repository = repository_factory.get_repository()
+    started = time.perf_counter()
+    try:
+        rows = asyncio.run(repository.rebuild_sidebar())
+    except Exception as e:
+        logger.error(f"No se pudo regenerar la proyección ({settings.database_type.value}): {str(e)}")
+        return 1
+
+    logger.info(f"Proyección regenerada: {rows} informes en {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,6 +17,7 @@ class FirestoreConnection:
         'studies': 'estudios',
         'measurements': 'mediciones',
         'observations': 'observaciones',
+        'sidebar': 'sidebar_diagnosticos',
         'organs': 'organos',
         'units': 'unidades',
         'measures': 'medidas',
@@ -0,0 +1,242 @@
+from typing import Callable, List
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, inspect, select, func, insert, update, bindparam
+from models.entities import Base, Pacientes, Informes, Sidebar_Informes, Informes_Busqueda
+from datetime import datetime, time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tabla de control separada de los modelos de negocio
+_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+class Migration:
+    """
+    Migración versionada: upgrade(conn) corre dentro de una transacción, salvo
+    con transactional=False (DDL que el motor no admite en una transacción,
+    como los índices full-text de SQL Server), que corre en AUTOCOMMIT.
+    """
+
+    def __init__(self, version: int, description: str, upgrade: Callable, transactional: bool = True):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+        self.transactional = transactional
+
+
+def _create_indexes(*index_names: str) -> Callable:
+    """Crear (si no existen) índices declarados en models/entities.py"""
+    def upgrade(conn):
+        declared = {
+            index.name: index
+            for table in Base.metadata.tables.values()
+            for index in table.indexes
+        }
+        inspector = inspect(conn)
+        for name in index_names:
+            index = declared[name]
+            existing = {i['name'] for i in inspector.get_indexes(index.table.name)}
+            if name in existing:
+                continue
+            logger.info(f"Creando índice {name} en {index.table.name}")
+            index.create(conn)
+    return upgrade
+
+
+def _add_columns(model, *column_names: str):
+    """Agregar (si no existen) columnas declaradas en el modelo; las bases nuevas ya las tienen por create_all"""
+    def upgrade(conn):
+        table = model.__table__
+        existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+        for name in column_names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            logger.info(f"Agregando columna {name} a {table.name}")
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD {name} {column.type.compile(dialect=conn.dialect)}"
+            )
+    return upgrade
+
+
+def _backfill_sidebar(conn):
+    """Cargar la proyección del listado lateral con los informes existentes"""
+    from repositories.sidebar_projection import rebuild_sidebar
+    Sidebar_Informes.__table__.create(conn, checkfirst=True)
+    rows = rebuild_sidebar(conn)
+    logger.info(f"Proyección sidebar_informes cargada con {rows} informes")
+
+
+def _search_documents(conn):
+    """Documentos de búsqueda de los informes existentes e índice FTS5 en SQLite"""
+    from repositories.full_text_search import backfill_search_documents, install_sqlite_fts
+    Informes_Busqueda.__table__.create(conn, checkfirst=True)
+    rows = backfill_search_documents(conn)
+    logger.info(f"Documentos de búsqueda generados para {rows} informes")
+    if conn.dialect.name == "sqlite":
+        install_sqlite_fts(conn)
+
+
+def _mssql_fulltext(conn):
+    from repositories.full_text_search import install_mssql_fulltext
+    if conn.dialect.name == "mssql":
+        install_mssql_fulltext(conn)
+
+
+def _patient_search_keys(conn):
+    """Columnas normalizadas de búsqueda en pacientes: alta, carga e índices"""
+    from utils.utils import normalize_key
+    _add_columns(Pacientes, 'nombre_norm', 'tutor_norm')(conn)
+
+    table = Pacientes.__table__
+    stmt = update(table).where(table.c.id == bindparam('b_id')).values(
+        nombre_norm=bindparam('b_nombre_norm'), tutor_norm=bindparam('b_tutor_norm')
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.nombre, table.c.tutor)
+            .where(table.c.id > last_id, table.c.nombre_norm.is_(None))
+            .order_by(table.c.id)
+            .limit(1000)
+        ).all()
+        if not rows:
+            break
+        conn.execute(stmt, [
+            dict(b_id=row.id, b_nombre_norm=normalize_key(row.nombre), b_tutor_norm=normalize_key(row.tutor))
+            for row in rows
+        ])
+        updated += len(rows)
+        last_id = rows[-1].id
+    logger.info(f"Claves de búsqueda generadas para {updated} pacientes")
+
+    _create_indexes('ix_pacientes_nombre_norm', 'ix_pacientes_tutor_norm')(conn)
+
+
+def _report_created_at(conn):
+    """Fecha de alta de los informes para la exportación incremental (los existentes se completan en la 7)"""
+    _add_columns(Informes, 'created_at')(conn)
+    _create_indexes('ix_informes_created_at')(conn)
+
+
+def _backfill_report_created_at(conn):
+    """
+    Completar created_at de los informes anteriores a la migración 6: sin fecha
+    de alta real, se toma la fecha del informe (a medianoche) sin pasar del
+    momento de la migración, para que `since` no los deje afuera para siempre
+    """
+    table = Informes.__table__
+    stmt = update(table).where(table.c.id == bindparam('b_id')).values(created_at=bindparam('b_created_at'))
+    migrated_at = datetime.utcnow()
+    updated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.fecha)
+            .where(table.c.id > last_id, table.c.created_at.is_(None))
+            .order_by(table.c.id)
+            .limit(1000)
+        ).all()
+        if not rows:
+            break
+        conn.execute(stmt, [
+            dict(b_id=row.id, b_created_at=min(datetime.combine(row.fecha, time.min), migrated_at))
+            for row in rows
+        ])
+        updated += len(rows)
+        last_id = rows[-1].id
+    logger.info(f"Fecha de alta completada para {updated} informes")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "Índices en claves foráneas, deduplicación de pacientes/veterinarios y orden del listado",
+        _create_indexes(
+            'ix_informes_fk_paciente',
+            'ix_informes_fk_referido',
+            'ix_informes_fecha_id',
+            'ix_estudios_fk_informe',
+            'ix_mediciones_fk_estudio',
+            'ix_observaciones_fk_estudio',
+            'ix_pacientes_dedup',
+            'ix_veterinarios_dedup',
+        ),
+    ),
+    Migration(
+        2,
+        "Proyección desnormalizada del listado lateral (sidebar_informes)",
+        _backfill_sidebar,
+    ),
+    Migration(
+        3,
+        "Documentos de búsqueda de texto completo (informes_busqueda, FTS5 en SQLite)",
+        _search_documents,
+    ),
+    Migration(
+        4,
+        "Catálogo e índice full-text de SQL Server sobre informes_busqueda",
+        _mssql_fulltext,
+        transactional=False,
+    ),
+    Migration(
+        5,
+        "Nombre y tutor normalizados e indexados en pacientes (búsqueda por prefijo)",
+        _patient_search_keys,
+    ),
+    Migration(
+        6,
+        "Fecha de alta de informes (created_at) para exportaciones incrementales",
+        _report_created_at,
+    ),
+    Migration(
+        7,
+        "Fecha de alta de los informes anteriores a la migración 6 (desde la fecha del informe)",
+        _backfill_report_created_at,
+    ),
+]
+
+
+def current_version(conn) -> int:
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def run_migrations(engine, target: int = None) -> int:
+    """Aplicar en orden las migraciones pendientes; devuelve la versión resultante"""
+    _metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        version = current_version(conn)
+
+    for migration in MIGRATIONS:
+        if migration.version <= version or (target is not None and migration.version > target):
+            continue
+        logger.info(f"Aplicando migración {migration.version}: {migration.description}")
+        if not migration.transactional:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                migration.upgrade(conn)
+        with engine.begin() as conn:
+            if migration.transactional:
+                migration.upgrade(conn)
+            conn.execute(insert(schema_version).values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+        version = migration.version
+
+    return version
+
+
+def pending_migrations(engine) -> List[Migration]:
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
@@ -0,0 +1,119 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from app.config import settings
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+# Identificador del cliente de la request en curso (lo fija ClientContextMiddleware)
+current_client: ContextVar[Optional[str]] = ContextVar("current_client", default=None)
+# Lecturas que deben ir al primario aunque haya réplica (llenado de la cache de diagnósticos)
+force_primary: ContextVar[bool] = ContextVar("force_primary", default=False)
+
+
+@contextmanager
+def reading_primary():
+    """
+    Mandar al primario las lecturas hechas dentro del bloque, incluidas las de
+    tareas creadas en él (heredan el contexto). Lo que se guarda en una cache
+    compartida no puede venir de una réplica atrasada: quedaría servido a todos
+    los clientes hasta el TTL aunque la generación ya se haya invalidado.
+    """
+    token = force_primary.set(True)
+    try:
+        yield
+    finally:
+        force_primary.reset(token)
+
+
+class RequestWrites:
+    """Estado read-your-writes del request en curso (ClientContextMiddleware)"""
+    __slots__ = ("last_write", "written_at")
+
+    def __init__(self, last_write: Optional[float] = None):
+        # Última escritura informada por el cliente (token firmado) y escritura de este request
+        self.last_write = last_write
+        self.written_at: Optional[float] = None
+
+
+# Objeto mutable: las escrituras hechas en tareas hijas también quedan registradas
+request_writes: ContextVar[Optional[RequestWrites]] = ContextVar("request_writes", default=None)
+
+
+class ReadYourWritesTracker:
+    """
+    Lecturas del primario durante una ventana corta tras una escritura del
+    mismo cliente (la réplica puede estar atrasada).
+
+    La marca de la última escritura viaja con el cliente: la respuesta de una
+    escritura trae un token firmado (cookie y header X-Last-Write) que el
+    cliente devuelve en los requests siguientes, así vale en cualquier worker o
+    réplica de la API. Todos deben compartir READ_YOUR_WRITES_SECRET; sin él
+    cada proceso firma con su propia clave y la garantía solo se cumple dentro
+    del mismo worker. Como respaldo se recuerda en el proceso la última
+    escritura por X-Client-Id (nunca por IP: detrás de un NAT o proxy muchos
+    clientes comparten la dirección).
+    """
+
+    def __init__(self, window_seconds: float, secret: str = ""):
+        self.window_seconds = window_seconds
+        self._secret = secret.encode("utf-8") if secret else secrets.token_bytes(32)
+        self._last_write: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_write(self, client_id: Optional[str] = None):
+        if self.window_seconds <= 0:
+            return
+        writes = request_writes.get()
+        if writes is not None:
+            writes.written_at = time.time()
+        client_id = client_id or current_client.get()
+        if client_id is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[client_id] = now
+            # Purga ocasional de clientes fuera de la ventana
+            if len(self._last_write) > 10000:
+                self._last_write = {
+                    k: t for k, t in self._last_write.items() if now - t < self.window_seconds
+                }
+
+    def should_read_primary(self, client_id: Optional[str] = None) -> bool:
+        writes = request_writes.get()
+        if writes is not None:
+            for written in (writes.written_at, writes.last_write):
+                if written is not None and time.time() - written < self.window_seconds:
+                    return True
+        client_id = client_id or current_client.get()
+        if client_id is None:
+            return False
+        last_write = self._last_write.get(client_id)
+        return last_write is not None and time.monotonic() - last_write < self.window_seconds
+
+    def sign(self, written_at: float) -> str:
+        """Token "<timestamp>.<hmac>" para devolver al cliente"""
+        stamp = f"{written_at:.3f}"
+        return f"{stamp}.{self._signature(stamp)}"
+
+    def verify(self, token: Optional[str]) -> Optional[float]:
+        """Timestamp de un token válido (firma correcta); None si falta o no es válido"""
+        if not token:
+            return None
+        stamp, _, signature = token.rpartition(".")
+        if not stamp or not hmac.compare_digest(signature, self._signature(stamp)):
+            return None
+        try:
+            return float(stamp)
+        except ValueError:
+            return None
+
+    def _signature(self, stamp: str) -> str:
+        return hmac.new(self._secret, stamp.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+# Instancia global
+read_your_writes = ReadYourWritesTracker(settings.read_your_writes_seconds, settings.read_your_writes_secret)
@@ -1,8 +1,10 @@
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
-from app.config import settings
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.config import settings, DatabaseType
 from models.entities import Base
+from database.migrations import run_migrations
 from monitoring.metrics import metrics_collector
 import logging
 
@@ -13,6 +15,13 @@ class SQLConnection:
     _instance = None
     _engine = None
     _session_factory = None
+    _async_engine = None
+    _async_session_factory = None
+    # Réplica de solo lectura opcional (pool propio)
+    _read_engine = None
+    _read_session_factory = None
+    _async_read_engine = None
+    _async_read_session_factory = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -24,14 +33,22 @@ class SQLConnection:
             self._create_engine()
             self._create_session_factory()
             self._create_tables()
+            if settings.sql_async:
+                self._create_async_engine()
+            if settings.sql_read_url or settings.sql_read_server:
+                self._create_read_engine()
     
-    def _create_engine(self):
-        """Crear engine de SQLAlchemy con configuración optimizada"""
-        try:
-            # Construir connection string
-            connection_string = (
+    def _build_url(self, explicit_url: str, server: str, read_only: bool = False):
+        """Armar la URL y las opciones del engine (URL explícita o SQL Server por ODBC)"""
+        engine_options = {}
+        if explicit_url:
+            # URL explícita (ej. SQLite local para desarrollo y benchmarks)
+            return explicit_url, engine_options
+        
+        # Construir connection string
+        connection_string = (
             f"DRIVER={settings.sql_driver};"
-            f"SERVER={settings.sql_server};"
+            f"SERVER={server};"
             f"DATABASE={settings.sql_database};"
             f"UID={settings.sql_user};"
             f"PWD={settings.sql_password};"
@@ -39,20 +56,36 @@ class SQLConnection:
             f"TrustServerCertificate=yes;"  # Necesario para Cloud SQL
             f"Connection Timeout=30;"  # Timeout más largo
         )
-            
-            # Crear engine con pool de conexiones
-            self._engine = create_engine(
-                f"mssql+pyodbc:///?odbc_connect={connection_string}",
-                poolclass=QueuePool,
-                pool_size=10,
-                max_overflow=20,
-                pool_pre_ping=True,  # Verificar conexiones antes de usar
-                pool_recycle=3600,   # Reciclar conexiones cada hora
-                echo=False  # Cambiar a True para debug SQL
-            )
-            
-            # Event listeners para métricas
-            self._setup_metrics_listeners()
+        if read_only:
+            # Enrutar a la réplica secundaria de un Availability Group
+            connection_string += "ApplicationIntent=ReadOnly;"
+        else:
+            # Inserciones masivas (executemany) en un solo round-trip
+            engine_options["fast_executemany"] = True
+        return f"mssql+pyodbc:///?odbc_connect={connection_string}", engine_options
+    
+    def _new_engine(self, url: str, engine_options: dict):
+        # Crear engine con pool de conexiones
+        engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=10,
+            max_overflow=20,
+            pool_pre_ping=True,  # Verificar conexiones antes de usar
+            pool_recycle=3600,   # Reciclar conexiones cada hora
+            echo=False,  # Cambiar a True para debug SQL
+            **engine_options
+        )
+        
+        # Event listeners para métricas
+        self._setup_metrics_listeners(engine)
+        return engine
+    
+    def _create_engine(self):
+        """Crear engine de SQLAlchemy con configuración optimizada"""
+        try:
+            self._url, engine_options = self._build_url(settings.sql_url, settings.sql_server)
+            self._engine = self._new_engine(self._url, engine_options)
             
             logger.info("SQL Server engine creado exitosamente")
             metrics_collector.update_database_status("sql_server", True)
@@ -62,6 +95,72 @@ class SQLConnection:
             metrics_collector.update_database_status("sql_server", False)
             raise e
     
+    def _create_read_engine(self):
+        """Crear engine (y sesiones) de la réplica de solo lectura"""
+        try:
+            self._read_url, engine_options = self._build_url(
+                settings.sql_read_url, settings.sql_read_server, read_only=True
+            )
+            self._read_engine = self._new_engine(self._read_url, engine_options)
+            self._read_session_factory = sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                bind=self._read_engine
+            )
+            if settings.sql_async:
+                self._async_read_engine, self._async_read_session_factory = \
+                    self._new_async_session_factory(self._read_url)
+            logger.info("Engine de réplica de lectura creado exitosamente")
+        except Exception as e:
+            # Sin réplica las lecturas siguen yendo al primario
+            logger.error(f"Error creando engine de réplica, se lee del primario: {str(e)}")
+            self._read_engine = None
+            self._read_session_factory = None
+            self._async_read_engine = None
+            self._async_read_session_factory = None
+    
+    def _create_async_engine(self):
+        """Crear engine asíncrono (aioodbc / aiosqlite) si el driver está disponible"""
+        self._async_engine, self._async_session_factory = self._new_async_session_factory(self._url)
+    
+    def _new_async_session_factory(self, url: str):
+        async_url = self._build_async_url(url)
+        if async_url is None:
+            logger.warning("No hay driver asíncrono para esta URL, se usará un pool de hilos")
+            return None, None
+        
+        try:
+            pool_options = {}
+            if not async_url.startswith("sqlite"):
+                pool_options = dict(pool_size=10, max_overflow=20, pool_recycle=3600)
+            async_engine = create_async_engine(
+                async_url,
+                pool_pre_ping=True,
+                echo=False,
+                **pool_options
+            )
+            self._setup_metrics_listeners(async_engine.sync_engine)
+            async_session_factory = async_sessionmaker(
+                bind=async_engine,
+                autoflush=False,
+                expire_on_commit=False
+            )
+            logger.info("Engine asíncrono creado exitosamente")
+            return async_engine, async_session_factory
+        except ImportError as e:
+            # Driver no instalado (aioodbc/aiosqlite): fallback a pool de hilos
+            logger.warning(f"Driver asíncrono no disponible ({str(e)}), se usará un pool de hilos")
+            return None, None
+    
+    @staticmethod
+    def _build_async_url(url: str):
+        """Traducir la URL síncrona a su equivalente con driver asíncrono"""
+        if url.startswith("mssql+pyodbc:"):
+            return url.replace("mssql+pyodbc:", "mssql+aioodbc:", 1)
+        if url.startswith("sqlite:"):
+            return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+        return None
+    
     def _create_session_factory(self):
         """Crear factory de sesiones"""
         self._session_factory = sessionmaker(
@@ -72,27 +171,31 @@ class SQLConnection:
         logger.info("Session factory creada exitosamente")
     
     def _create_tables(self):
-        """Crear tablas si no existen"""
+        """Crear tablas si no existen y aplicar migraciones pendientes"""
         try:
             Base.metadata.create_all(bind=self._engine)
             logger.info("Tablas de base de datos verificadas/creadas")
+            # create_all no modifica tablas existentes: índices/columnas nuevas van por migraciones
+            if settings.sql_auto_migrate:
+                version = run_migrations(self._engine)
+                logger.info(f"Esquema en versión {version}")
         except Exception as e:
             logger.error(f"Error creando tablas: {str(e)}")
             raise e
     
-    def _setup_metrics_listeners(self):
+    def _setup_metrics_listeners(self, engine):
         """Configurar listeners para métricas de base de datos"""
         
-        @event.listens_for(self._engine, "connect")
+        @event.listens_for(engine, "connect")
         def set_sqlite_pragma(dbapi_connection, connection_record):
             logger.debug("Nueva conexión SQL Server establecida")
             metrics_collector.update_database_status("sql_server", True)
         
-        @event.listens_for(self._engine, "engine_connect")
-        def receive_engine_connect(conn, branch):
+        @event.listens_for(engine, "engine_connect")
+        def receive_engine_connect(conn):
             logger.debug("Engine connect event")
         
-        @event.listens_for(self._engine, "close")
+        @event.listens_for(engine, "close")
         def receive_close(dbapi_connection, connection_record):
             logger.debug("Conexión SQL Server cerrada")
     
@@ -104,6 +207,30 @@ class SQLConnection:
         """Obtener factory de sesiones"""
         return self._session_factory
     
+    def get_async_engine(self):
+        """Obtener engine asíncrono (None si no hay driver asíncrono)"""
+        return self._async_engine
+    
+    def get_async_session_factory(self):
+        """Obtener factory de sesiones asíncronas (None si no hay driver asíncrono)"""
+        return self._async_session_factory
+    
+    def get_read_session_factory(self):
+        """Obtener factory de sesiones de la réplica (None si no hay réplica)"""
+        return self._read_session_factory
+
+    def get_batch_read_session_factory(self):
+        """
+        Sesiones para procesos por lotes de solo lectura que abren más de una
+        sesión a la vez (cursor del servidor + consultas por lote). Van al
+        primario: un proceso que migra o audita no debe leer con retraso.
+        """
+        return self._session_factory
+    
+    def get_async_read_session_factory(self):
+        """Obtener factory de sesiones asíncronas de la réplica (None si no hay)"""
+        return self._async_read_session_factory
+    
     def test_connection(self) -> bool:
         """Probar conexión a la base de datos"""
         try:
@@ -124,9 +251,142 @@ class SQLConnection:
         if self._engine:
             self._engine.dispose()
             logger.info("Conexiones SQL Server cerradas")
+        if self._read_engine:
+            self._read_engine.dispose()
+    
+    async def close_async_connections(self):
+        """Cerrar las conexiones de los engines asíncronos"""
+        if self._async_engine:
+            await self._async_engine.dispose()
+        if self._async_read_engine:
+            await self._async_read_engine.dispose()
+
+class SQLiteConnection(SQLConnection):
+    """
+    SQLite embebido en modo WAL para instalaciones de una sola máquina. Usa los
+    mismos modelos y migraciones que SQLConnection; el pool del escritor (una
+    única conexión: las escrituras se serializan en el proceso) es el primario
+    y un pool de lectores de solo lectura ocupa el lugar de la réplica. En WAL
+    los lectores no bloquean al escritor ni son bloqueados por él.
+    """
+    _instance = None
+    _engine = None
+    _session_factory = None
+    _async_engine = None
+    _async_session_factory = None
+    _read_engine = None
+    _read_session_factory = None
+    _async_read_engine = None
+    _async_read_session_factory = None
+
+    def __init__(self):
+        if self._engine is None:
+            self._url = f"sqlite:///{settings.sqlite_path}"
+            self._create_engine()
+            self._create_session_factory()
+            self._create_tables()
+            self._create_read_engine()
+            if settings.sql_async:
+                self._create_async_engine()
+
+    def _create_engine(self):
+        try:
+            self._engine = self._new_sqlite_engine(create_engine, self._url, QueuePool, writer=True)
+            logger.info(f"SQLite engine creado en {settings.sqlite_path} (WAL)")
+            metrics_collector.update_database_status("sqlite", True)
+        except Exception as e:
+            logger.error(f"Error creando SQLite engine: {str(e)}")
+            metrics_collector.update_database_status("sqlite", False)
+            raise e
+
+    def _create_read_engine(self):
+        self._read_engine = self._new_sqlite_engine(create_engine, self._url, QueuePool, writer=False)
+        self._read_session_factory = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=self._read_engine
+        )
+
+    def _create_async_engine(self):
+        """Escritor y lectores sobre aiosqlite (si está instalado)"""
+        async_url = self._build_async_url(self._url)
+        try:
+            self._async_engine = self._new_sqlite_engine(
+                create_async_engine, async_url, AsyncAdaptedQueuePool, writer=True
+            )
+            self._async_read_engine = self._new_sqlite_engine(
+                create_async_engine, async_url, AsyncAdaptedQueuePool, writer=False
+            )
+        except ImportError as e:
+            logger.warning(f"Driver asíncrono no disponible ({str(e)}), se usará un pool de hilos")
+            self._async_engine = None
+            self._async_read_engine = None
+            return
+        self._async_session_factory = async_sessionmaker(
+            bind=self._async_engine, autoflush=False, expire_on_commit=False
+        )
+        self._async_read_session_factory = async_sessionmaker(
+            bind=self._async_read_engine, autoflush=False, expire_on_commit=False
+        )
+        logger.info("Engines SQLite asíncronos creados exitosamente")
+
+    def get_batch_read_session_factory(self):
+        """El escritor tiene una sola conexión: los lotes de lectura usan los lectores (ven todo lo confirmado)"""
+        return self._read_session_factory
+
+    def _new_sqlite_engine(self, factory, url: str, poolclass, writer: bool):
+        engine = factory(
+            url,
+            poolclass=poolclass,
+            pool_size=1 if writer else settings.sqlite_readers,
+            max_overflow=0,
+            pool_timeout=30,
+            echo=False,
+            # Las conexiones del pool se usan desde el pool de hilos / el event loop
+            connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000}
+        )
+        sync_engine = getattr(engine, "sync_engine", engine)
+        self._setup_sqlite_listeners(sync_engine, writer)
+        self._setup_metrics_listeners(sync_engine)
+        return engine
+
+    @staticmethod
+    def _sqlite_pragmas(writer: bool):
+        pragmas = [
+            f"PRAGMA busy_timeout = {settings.sqlite_busy_timeout_ms}",
+            # En WAL, NORMAL solo puede perder la última transacción ante un corte de energía
+            "PRAGMA synchronous = NORMAL",
+            "PRAGMA foreign_keys = ON",
+            f"PRAGMA cache_size = -{settings.sqlite_cache_mb * 1024}",
+            f"PRAGMA mmap_size = {settings.sqlite_mmap_mb * 1024 * 1024}",
+            "PRAGMA temp_store = MEMORY",
+        ]
+        if writer:
+            # journal_mode es persistente en el archivo: lo fija el escritor, que se conecta primero
+            return ["PRAGMA journal_mode = WAL"] + pragmas
+        return pragmas + ["PRAGMA query_only = ON"]
 
-# Instancia global
-sql_connection = SQLConnection()
+    def _setup_sqlite_listeners(self, engine, writer: bool):
+        pragmas = self._sqlite_pragmas(writer)
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragma(dbapi_connection, connection_record):
+            # SQLAlchemy controla las transacciones: el driver no emite BEGIN implícitos
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+        @event.listens_for(engine, "begin")
+        def do_begin(conn):
+            # El escritor toma el lock al empezar (sin SQLITE_BUSY al pasar de leer a
+            # escribir); cada sesión de lectura ve una única instantánea consistente
+            conn.exec_driver_sql("BEGIN IMMEDIATE" if writer else "BEGIN")
+
+
+# Instancia global: SQLite embebido o SQL Server según DB_TYPE
+sql_connection = SQLiteConnection() if settings.database_type == DatabaseType.SQLITE else SQLConnection()
 
 def get_sql_engine():
     """Obtener engine SQL Server"""
@@ -136,6 +396,22 @@ def get_sql_session():
     """Obtener factory de sesiones SQL Server"""
     return sql_connection.get_session_factory()
 
+def get_sql_batch_read_session():
+    """Obtener factory de sesiones para lecturas por lotes (ver SQLConnection.get_batch_read_session_factory)"""
+    return sql_connection.get_batch_read_session_factory()
+
+def get_sql_async_session():
+    """Obtener factory de sesiones asíncronas (None si no hay driver asíncrono)"""
+    return sql_connection.get_async_session_factory()
+
+def get_sql_read_session():
+    """Obtener factory de sesiones de la réplica de lectura (None si no hay réplica)"""
+    return sql_connection.get_read_session_factory()
+
+def get_sql_async_read_session():
+    """Obtener factory de sesiones asíncronas de la réplica (None si no hay)"""
+    return sql_connection.get_async_read_session_factory()
+
 def test_sql_connection() -> bool:
     """Probar conexión SQL Server"""
     return sql_connection.test_connection()
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime
 
 Base = declarative_base()
 
@@ -12,9 +13,17 @@ class Pacientes(Base):
     tutor = Column(String(100), index=True, nullable=False)
     edad = Column(String(50), nullable=False)
     raza = Column(String(50), nullable=False)
+    # Nombre y tutor plegados (utils.normalize_key) para la búsqueda por prefijo
+    nombre_norm = Column(String(100), index=True)
+    tutor_norm = Column(String(100), index=True)
     # Relaciones
     informes = relationship("Informes", back_populates="paciente")
 
+    __table_args__ = (
+        # Búsqueda de paciente existente en create_diagnosis
+        Index('ix_pacientes_dedup', 'nombre', 'tutor', 'edad', 'raza'),
+    )
+
 class Veterinarios(Base):
     __tablename__ = 'veterinarios'
     
@@ -27,6 +36,10 @@ class Veterinarios(Base):
     informes = relationship("Informes", back_populates="veterinario")
     users = relationship("Users", back_populates="veterinario")
 
+    __table_args__ = (
+        Index('ix_veterinarios_dedup', 'nombre', 'apellido'),
+    )
+
 class Informes(Base):
     __tablename__ = 'informes'
     
@@ -35,14 +48,56 @@ class Informes(Base):
     diagnostico = Column(String(2000), nullable=False)
     img_folder = Column(String(200))
     fecha = Column(Date, nullable=False)
-    fk_paciente = Column(Integer, ForeignKey('pacientes.id'), nullable=False)
-    fk_referido = Column(Integer, ForeignKey('veterinarios.id'), nullable=False)
+    fk_paciente = Column(Integer, ForeignKey('pacientes.id'), nullable=False, index=True)
+    fk_referido = Column(Integer, ForeignKey('veterinarios.id'), nullable=False, index=True)
+    # Alta del informe (UTC) para exportaciones incrementales; NULL en informes previos a la migración 6
+    created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relaciones
     paciente = relationship("Pacientes", back_populates="informes")
     veterinario = relationship("Veterinarios", back_populates="informes")
     estudios = relationship("Estudios", back_populates="informe", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Orden keyset del listado (fecha desc, id desc)
+        Index('ix_informes_fecha_id', 'fecha', 'id'),
+        # Exportación incremental (created_at > since)
+        Index('ix_informes_created_at', 'created_at'),
+    )
+
+class Sidebar_Informes(Base):
+    """Proyección desnormalizada del listado lateral (un registro por informe)"""
+    __tablename__ = 'sidebar_informes'
+    
+    id = Column(Integer, ForeignKey('informes.id'), primary_key=True, autoincrement=False)
+    fk_paciente = Column(Integer, ForeignKey('pacientes.id'), nullable=False, index=True)
+    nombre = Column(String(100), nullable=False)
+    tutor = Column(String(100), nullable=False)
+    edad = Column(String(50), nullable=False)
+    raza = Column(String(50), nullable=False)
+    fecha = Column(Date, nullable=False)
+
+    __table_args__ = (
+        # Listado completo y filtrado por tutor/raza en orden keyset (fecha desc, id desc)
+        Index('ix_sidebar_informes_fecha_id', 'fecha', 'id'),
+        Index('ix_sidebar_informes_tutor_fecha_id', 'tutor', 'fecha', 'id'),
+        Index('ix_sidebar_informes_raza_fecha_id', 'raza', 'fecha', 'id'),
+    )
+
+class Informes_Busqueda(Base):
+    """Documento de búsqueda por informe (texto del informe + observaciones)"""
+    __tablename__ = 'informes_busqueda'
+    
+    # SQL Server exige un índice único con nombre como KEY INDEX del índice full-text
+    id = Column(Integer, ForeignKey('informes.id'), primary_key=True, autoincrement=False)
+    antecedentes = Column(Text)
+    diagnostico = Column(Text)
+    observaciones = Column(Text)
+
+    __table_args__ = (
+        UniqueConstraint('id', name='ux_informes_busqueda_id'),
+    )
+
 class Tipos_Estudios(Base):
     __tablename__ = 'tipos_estudios'
     
@@ -56,7 +111,7 @@ class Estudios(Base):
     __tablename__ = 'estudios'
     
     id = Column(Integer, primary_key=True, index=True)
-    fk_informe = Column(Integer, ForeignKey('informes.id'), nullable=False)
+    fk_informe = Column(Integer, ForeignKey('informes.id'), nullable=False, index=True)
     fk_tipos_estudios = Column(Integer, ForeignKey('tipos_estudios.id'), nullable=False)
     
     # Relaciones
@@ -102,7 +157,7 @@ class Mediciones(Base):
     fk_organo = Column(Integer, ForeignKey('organos.id'), nullable=False)
     fk_medida = Column(Integer, ForeignKey('medidas.id'), nullable=False)
     fk_unidad = Column(Integer, ForeignKey('unidades.id'))
-    fk_estudio = Column(Integer, ForeignKey('estudios.id'), nullable=False)
+    fk_estudio = Column(Integer, ForeignKey('estudios.id'), nullable=False, index=True)
     
     # Relaciones
     organo = relationship("Organos", back_populates="mediciones")
@@ -116,7 +171,7 @@ class Observaciones(Base):
     id = Column(Integer, primary_key=True, index=True)
     observacion = Column(String(1000), nullable=False)
     fk_organo = Column(Integer, ForeignKey('organos.id'), nullable=False)
-    fk_estudio = Column(Integer, ForeignKey('estudios.id'), nullable=False)
+    fk_estudio = Column(Integer, ForeignKey('estudios.id'), nullable=False, index=True)
     
     # Relaciones
     organo = relationship("Organos", back_populates="observaciones")
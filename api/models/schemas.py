@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import date
+from typing import List, Literal, Optional
+from datetime import date, datetime
 
 # DTOs de entrada (requests)
 class PatientCreate(BaseModel):
@@ -84,6 +84,9 @@ class DiagnosisResponse(BaseModel):
     veterinario: VeterinarianResponse
     estudios: List[StudyResponse] = []
 
+class DiagnosisExportRow(DiagnosisResponse):
+    created_at: Optional[datetime] = None
+
 class SidebarDiagnosisItem(BaseModel):
     id: str
     nombre: str
@@ -92,6 +95,61 @@ class SidebarDiagnosisItem(BaseModel):
     raza: Optional[str] = None
     fecha: date
 
+# Paginación por cursor (keyset) y filtros de listados
+class DiagnosisListQuery(BaseModel):
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    tutor: Optional[str] = None
+    raza: Optional[str] = None
+    include_total: bool = False
+
+class DiagnosisExportQuery(BaseModel):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    # Solo informes dados de alta después de este instante (UTC si no trae zona)
+    since: Optional[datetime] = None
+
+class PatientListQuery(BaseModel):
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    tutor: Optional[str] = None
+    raza: Optional[str] = None
+    include_total: bool = False
+
+class SidebarDiagnosisPage(BaseModel):
+    items: List[SidebarDiagnosisItem] = []
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+class PatientPage(BaseModel):
+    items: List[PatientResponse] = []
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+# Búsqueda de texto completo sobre informes y observaciones
+class SearchQuery(BaseModel):
+    q: str
+    limit: int = 20
+    cursor: Optional[str] = None
+    include_total: bool = False
+
+class SearchHit(BaseModel):
+    id: str
+    nombre: str
+    tutor: str
+    raza: Optional[str] = None
+    fecha: date
+    diagnostico: Optional[str] = None
+    score: float
+
+class SearchPage(BaseModel):
+    items: List[SearchHit] = []
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
 class ImageExtractResponse(BaseModel):
     status: str
     message: str
@@ -0,0 +1,127 @@
+from logging.handlers import QueueHandler, QueueListener
+from app.config import settings
+from monitoring.metrics import log_records_dropped_counter
+import atexit
+import copy
+import json
+import logging
+import queue
+import time
+
+_listener = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler con cola acotada que nunca bloquea: si el hilo escritor no da
+    abasto, el registro se descarta y se cuenta en
+    diagnovet_log_records_dropped_total.
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        """Resolver el mensaje y el traceback antes de encolar (los args pueden cambiar después)"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped_counter.inc()
+
+
+class _DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Al detener se espera lugar en la cola para no perder los registros pendientes
+        self.queue.put(self._sentinel)
+
+
+class _Truncating:
+    """Recorte de mensajes largos (payloads, volcados) al formatear"""
+    max_chars = 0
+
+    def _message(self, record) -> str:
+        message = record.getMessage()
+        if self.max_chars and len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}… (+{len(message) - self.max_chars} caracteres)"
+        return message
+
+
+class TextFormatter(_Truncating, logging.Formatter):
+    """Línea legible; los campos estructurados (extra={"fields": {...}}) van como clave=valor"""
+
+    def __init__(self, max_chars: int = 0):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+        self.max_chars = max_chars
+
+    def formatMessage(self, record) -> str:
+        record.message = self._message(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.message += " " + " ".join(f"{k}={v}" for k, v in fields.items() if v is not None)
+        return super().formatMessage(record)
+
+
+class JsonFormatter(_Truncating, logging.Formatter):
+    """Un objeto JSON por línea, para ingestión en el agregador de logs"""
+
+    def __init__(self, max_chars: int = 0):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self._message(record),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """
+    Configurar el logging de la app: todos los loggers (incluidos los de
+    uvicorn) escriben en una cola y un QueueListener formatea y emite desde su
+    propio hilo, así un stdout lento no bloquea el event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter_class = JsonFormatter if settings.log_format == "json" else TextFormatter
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter_class(max_chars=settings.log_max_chars))
+
+    log_queue = queue.Queue(maxsize=settings.log_queue_size)
+    root = logging.getLogger()
+    root.handlers = [DroppingQueueHandler(log_queue)]
+    root.setLevel(settings.log_level.upper())
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = _DrainingQueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Vaciar la cola y detener el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -23,6 +23,58 @@ database_status = Gauge(
     ['database_type']
 )
 
+# Métrica 4: Lecturas SQL según destino (primario / réplica)
+sql_reads_counter = Counter(
+    'diagnovet_sql_reads_total',
+    'SQL read operations by routing target',
+    ['target']
+)
+
+# Métrica 5: Registros migrados entre backends (cli.migrate_backend)
+migration_counter = Counter(
+    'diagnovet_migration_records_total',
+    'Records migrated between SQL and Firestore',
+    ['direction', 'entity', 'status']
+)
+
+# Métrica 6: Cache de diagnósticos (services.diagnosis_cache)
+cache_requests_counter = Counter(
+    'diagnovet_cache_requests_total',
+    'Diagnosis cache lookups by result (hit, miss, error)',
+    ['namespace', 'result']
+)
+
+cache_evictions_counter = Counter(
+    'diagnovet_cache_evictions_total',
+    'In-process diagnosis cache evictions by reason (lru, ttl, invalidation)',
+    ['reason']
+)
+
+cache_bytes_gauge = Gauge(
+    'diagnovet_cache_bytes',
+    'Bytes held by the in-process diagnosis cache'
+)
+
+# Métrica 7: Coalescencia de lecturas (services.single_flight)
+single_flight_counter = Counter(
+    'diagnovet_singleflight_calls_total',
+    'Repository reads executed vs coalesced into an in-flight identical call',
+    ['operation', 'result']
+)
+
+# Métrica 8: Registros de log descartados por cola llena (monitoring.logging_setup)
+log_records_dropped_counter = Counter(
+    'diagnovet_log_records_dropped_total',
+    'Log records dropped because the logging queue was full'
+)
+
+# Métrica 9: Informes exportados por formato (GET /export)
+export_rows_counter = Counter(
+    'diagnovet_export_rows_total',
+    'Diagnosis reports streamed by the export endpoint',
+    ['format']
+)
+
 class MetricsCollector:
     def __init__(self):
         self.start_time = time.time()
@@ -38,6 +90,10 @@ class MetricsCollector:
         """Actualizar estado de la base de datos"""
         database_status.labels(database_type=database_type).set(1 if is_up else 0)
     
+    def record_migration(self, direction: str, entity: str, count: int, status: str = "success"):
+        """Registrar registros migrados (o fallidos) entre backends"""
+        migration_counter.labels(direction=direction, entity=entity, status=status).inc(count)
+    
     def get_metrics(self) -> str:
         """Obtener métricas en formato Prometheus"""
         return generate_latest()
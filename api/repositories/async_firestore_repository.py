@@ -0,0 +1,42 @@
+from typing import List, Optional, Dict, Any
+from google.cloud import firestore
+from repositories.firestore_repository import FirestoreRepository
+
+
+class AsyncFirestoreRepository(FirestoreRepository):
+    """
+    FirestoreRepository sobre firestore.AsyncClient: las primitivas de E/S se
+    esperan directamente en el event loop (gRPC asíncrono) en lugar de ocupar un
+    hilo del pool por cada lectura, batch o conteo. El resto del repositorio
+    (armado de respuestas, batches atómicos, lecturas en paralelo con gather)
+    es el mismo.
+
+    El canal gRPC queda ligado al event loop donde se usa por primera vez: la
+    instancia debe usarse dentro de un único loop (la app o un asyncio.run).
+    """
+
+    def _create_client(self, project_id: str):
+        return firestore.AsyncClient(project=project_id)
+
+    async def _get_doc(self, ref):
+        return await ref.get()
+
+    async def _get_all(self, refs: List, field_paths: Optional[List[str]] = None) -> List:
+        """Varios documentos en un solo RPC (BatchGetDocuments)"""
+        if not refs:
+            return []
+        return [doc async for doc in self.db.get_all(refs, field_paths=field_paths)]
+
+    async def _get_docs(self, query) -> List:
+        return await query.get()
+
+    async def _commit(self, batch):
+        return await batch.commit()
+
+    async def _set(self, ref, data: Dict[str, Any], merge: bool = False):
+        return await ref.set(data, merge=merge)
+
+    async def _count(self, query) -> int:
+        """Conteo con agregación del servidor (no descarga documentos)"""
+        result = await query.count().get()
+        return int(result[0][0].value)
@@ -0,0 +1,406 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, time
+from google.cloud import firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions, SendMode
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from models.entities import (
+    Pacientes, Veterinarios, Informes, Estudios, Tipos_Estudios, Mediciones, Observaciones, Organos,
+    Unidades, Sidebar_Informes
+)
+from models.schemas import DiagnosisCreate
+from repositories.firestore_repository import FirestoreRepository
+from repositories.sql_bulk_importer import ImportStats, SQLBulkImporter, MAX_IN_PARAMS, _chunks
+from monitoring.metrics import metrics_collector
+from database.sql_connection import get_sql_session, get_sql_batch_read_session
+import asyncio
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+SQL_TO_FIRESTORE = "sql-to-firestore"
+FIRESTORE_TO_SQL = "firestore-to-sql"
+
+# Tabla SQL -> colección Firestore, para la verificación de conteos
+COUNTED_ENTITIES = [
+    (Pacientes, 'patients'),
+    (Veterinarios, 'veterinarians'),
+    (Informes, 'diagnoses'),
+    (Sidebar_Informes, 'sidebar'),
+    (Estudios, 'studies'),
+    (Mediciones, 'measurements'),
+    (Observaciones, 'observations'),
+]
+
+
+class MigrationCheckpoint:
+    """Última posición confirmada de una migración: (dirección, fase, último id)"""
+
+    def __init__(self, path: Optional[str], direction: str):
+        self.path = path
+        self.direction = direction
+        self.phase = None
+        self.last_id = None
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("direction") != direction:
+                raise ValueError(f"El checkpoint {path} corresponde a otra dirección: {data.get('direction')}")
+            self.phase = data.get("phase")
+            self.last_id = data.get("last_id")
+
+    def start_for(self, phase: str, phases: List[str]):
+        """Id desde el cual retomar la fase, o False si la fase ya se completó"""
+        if self.phase is None:
+            return None
+        if phases.index(phase) < phases.index(self.phase):
+            return False
+        return self.last_id if phase == self.phase else None
+
+    def save(self, phase: str, last_id):
+        """Guardar la posición (escritura atómica)"""
+        self.phase = phase
+        self.last_id = last_id
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"direction": self.direction, "phase": phase, "last_id": last_id}, f)
+        os.replace(tmp_path, self.path)
+
+
+class SQLToFirestoreMigrator:
+    """
+    Copia el historial SQL a Firestore. Cada tabla se lee con un cursor del
+    servidor (stream_results) en orden de id y se escribe con BulkWriter en
+    paralelo. Pacientes y veterinarios usan el id determinístico de
+    FirestoreRepository y el resto de los documentos el id SQL, por lo que
+    reintentar un lote (o retomar desde el checkpoint) sobrescribe en lugar de duplicar.
+    El checkpoint avanza solo después de un flush sin errores.
+    """
+
+    PHASES = ['pacientes', 'veterinarios', 'informes']
+
+    def __init__(self, repository: FirestoreRepository, session_factory=None, chunk_size: int = 500,
+                 max_ops_per_second: int = 2000, max_attempts: int = 10):
+        self.repository = repository
+        self.collections = repository.collections
+        # Dos sesiones abiertas a la vez (cursor + hijos): en SQLite, sobre los lectores
+        self.session_factory = session_factory or get_sql_batch_read_session()
+        self.chunk_size = chunk_size
+        self.max_ops_per_second = max_ops_per_second
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._failed = 0
+        self._retries = 0
+
+    def run(self, checkpoint_path: Optional[str] = None, on_progress=None) -> ImportStats:
+        checkpoint = MigrationCheckpoint(checkpoint_path, SQL_TO_FIRESTORE)
+        stats = ImportStats()
+        # El cliente síncrono: BulkWriter paraleliza el envío en su propio pool de hilos
+        writer = self.repository.db.bulk_writer(BulkWriterOptions(
+            initial_ops_per_second=min(500, self.max_ops_per_second),
+            max_ops_per_second=self.max_ops_per_second,
+            mode=SendMode.parallel
+        ))
+        writer.on_write_error(self._on_write_error)
+
+        stream_session = self.session_factory()
+        lookup_session = self.session_factory()
+        try:
+            for phase in self.PHASES:
+                start = checkpoint.start_for(phase, self.PHASES)
+                if start is False:
+                    continue
+                logger.info(f"Migrando {phase} desde el id {start or 0}")
+                for rows in self._stream(stream_session, phase, start or 0):
+                    if phase == 'informes':
+                        documents = self._write_reports(writer, lookup_session, rows)
+                        stats.reports += len(rows)
+                    else:
+                        documents = self._write_dimension(writer, phase, rows)
+                    self._flush(writer, phase)
+                    stats.rows += documents
+                    metrics_collector.record_migration(SQL_TO_FIRESTORE, phase, documents)
+                    checkpoint.save(phase, rows[-1].id)
+                    if on_progress:
+                        on_progress(stats)
+        finally:
+            writer.close()
+            stream_session.close()
+            lookup_session.close()
+        return stats
+
+    def _stream(self, session, phase: str, last_id: int):
+        """Filas de la fase en orden de id, por particiones de chunk_size (cursor del servidor)"""
+        if phase == 'pacientes':
+            stmt = select(Pacientes.id, Pacientes.nombre, Pacientes.tutor, Pacientes.edad, Pacientes.raza).where(
+                Pacientes.id > last_id
+            ).order_by(Pacientes.id)
+        elif phase == 'veterinarios':
+            stmt = select(Veterinarios.id, Veterinarios.nombre, Veterinarios.apellido, Veterinarios.matricula).where(
+                Veterinarios.id > last_id
+            ).order_by(Veterinarios.id)
+        else:
+            stmt = select(
+                Informes.id, Informes.antecedentes, Informes.diagnostico, Informes.img_folder, Informes.fecha,
+                Pacientes.nombre, Pacientes.tutor, Pacientes.edad, Pacientes.raza,
+                Veterinarios.nombre.label('vet_nombre'), Veterinarios.apellido.label('vet_apellido'),
+                Veterinarios.matricula.label('vet_matricula')
+            ).join(Pacientes, Pacientes.id == Informes.fk_paciente).join(
+                Veterinarios, Veterinarios.id == Informes.fk_referido
+            ).where(
+                Informes.id > last_id
+            ).order_by(Informes.id)
+
+        result = session.execute(stmt.execution_options(stream_results=True, yield_per=self.chunk_size))
+        for partition in result.partitions():
+            yield partition
+
+    def _write_dimension(self, writer, phase: str, rows) -> int:
+        if phase == 'pacientes':
+            collection = self.repository.db.collection(self.collections['patients'])
+            # Misma clave que en SQL (nombre, tutor, edad, raza): solo se fusionan
+            # filas que difieren en mayúsculas, acentos o espacios
+            for row in rows:
+                patient_id = FirestoreRepository._patient_doc_id(row.nombre, row.tutor, row.edad, row.raza)
+                writer.set(collection.document(patient_id), {
+                    'nombre': row.nombre,
+                    'tutor': row.tutor,
+                    'edad': row.edad,
+                    'raza': row.raza,
+                    **FirestoreRepository._patient_search_keys(row.nombre, row.tutor),
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                }, merge=True)
+        else:
+            collection = self.repository.db.collection(self.collections['veterinarians'])
+            for row in rows:
+                writer.set(collection.document(FirestoreRepository._vet_doc_id(row.nombre, row.apellido, row.matricula)), {
+                    'nombre': row.nombre,
+                    'apellido': row.apellido,
+                    'matricula': row.matricula,
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                }, merge=True)
+        return len(rows)
+
+    def _write_reports(self, writer, session, rows) -> int:
+        """Informe, proyección del listado, estudios, mediciones y observaciones de un lote"""
+        db = self.repository.db
+        estudios, mediciones, observaciones = self._load_children(session, [row.id for row in rows])
+
+        for row in rows:
+            fecha = datetime.combine(row.fecha, time()) if row.fecha else None
+            patient_id = FirestoreRepository._patient_doc_id(row.nombre, row.tutor, row.edad, row.raza)
+            writer.set(db.collection(self.collections['diagnoses']).document(str(row.id)), {
+                'antecedentes': row.antecedentes,
+                'diagnostico': row.diagnostico,
+                'img_folder': row.img_folder,
+                'fecha': fecha,
+                'patient_id': patient_id,
+                'veterinarian_id': FirestoreRepository._vet_doc_id(row.vet_nombre, row.vet_apellido, row.vet_matricula),
+                'tutor': row.tutor,
+                'raza': row.raza,
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+            writer.set(
+                db.collection(self.collections['sidebar']).document(str(row.id)),
+                FirestoreRepository._sidebar_document(
+                    dict(nombre=row.nombre, tutor=row.tutor, edad=row.edad, raza=row.raza), fecha, patient_id
+                )
+            )
+
+        for estudio in estudios:
+            writer.set(db.collection(self.collections['studies']).document(str(estudio.id)), {
+                'tipo_estudio': estudio.tipo_estudio,
+                'diagnosis_id': str(estudio.fk_informe),
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+        for medicion in mediciones:
+            writer.set(db.collection(self.collections['measurements']).document(str(medicion.id)), {
+                'tipo_medicion': medicion.tipo_medicion,
+                'valor': medicion.valor,
+                'unidad': medicion.unidad,
+                'organo': medicion.organo,
+                'study_id': str(medicion.fk_estudio),
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+        for obs in observaciones:
+            writer.set(db.collection(self.collections['observations']).document(str(obs.id)), {
+                'observacion': obs.observacion,
+                'organo': obs.organo,
+                'study_id': str(obs.fk_estudio),
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+        return 2 * len(rows) + len(estudios) + len(mediciones) + len(observaciones)
+
+    @staticmethod
+    def _load_children(session, informe_ids: List[int]) -> Tuple[List, List, List]:
+        """Estudios y sus mediciones/observaciones (con nombres de dimensiones), por lotes de IN"""
+        estudios = []
+        for ids in _chunks(informe_ids, MAX_IN_PARAMS):
+            estudios.extend(session.execute(
+                select(Estudios.id, Estudios.fk_informe, Tipos_Estudios.tipo_estudio)
+                .join(Tipos_Estudios, Tipos_Estudios.id == Estudios.fk_tipos_estudios)
+                .where(Estudios.fk_informe.in_(ids))
+            ).all())
+
+        mediciones = []
+        observaciones = []
+        for ids in _chunks([estudio.id for estudio in estudios], MAX_IN_PARAMS):
+            mediciones.extend(session.execute(
+                select(
+                    Mediciones.id, Mediciones.fk_estudio, Mediciones.tipo_medicion, Mediciones.valor,
+                    Organos.nombre.label('organo'), Unidades.unidad
+                )
+                .join(Organos, Organos.id == Mediciones.fk_organo)
+                .outerjoin(Unidades, Unidades.id == Mediciones.fk_unidad)
+                .where(Mediciones.fk_estudio.in_(ids))
+            ).all())
+            observaciones.extend(session.execute(
+                select(Observaciones.id, Observaciones.fk_estudio, Observaciones.observacion,
+                       Organos.nombre.label('organo'))
+                .join(Organos, Organos.id == Observaciones.fk_organo)
+                .where(Observaciones.fk_estudio.in_(ids))
+            ).all())
+        return estudios, mediciones, observaciones
+
+    def _on_write_error(self, error, writer) -> bool:
+        """Reintentar (con backoff de BulkWriter) hasta max_attempts; después contar la falla"""
+        with self._lock:
+            if error.attempts < self.max_attempts:
+                self._retries += 1
+                return True
+            self._failed += 1
+        logger.error(f"Escritura fallida tras {error.attempts} intentos ({error.code}): {error.message}")
+        return False
+
+    def _flush(self, writer, phase: str):
+        writer.flush()
+        with self._lock:
+            failed, self._failed = self._failed, 0
+            retries, self._retries = self._retries, 0
+        if retries:
+            metrics_collector.record_migration(SQL_TO_FIRESTORE, phase, retries, status="retry")
+        if failed:
+            metrics_collector.record_migration(SQL_TO_FIRESTORE, phase, failed, status="error")
+            raise RuntimeError(f"{failed} escrituras fallidas en {phase}: el checkpoint no avanza")
+
+
+class FirestoreToSQLMigrator:
+    """
+    Copia los diagnósticos de Firestore a SQL: páginas ordenadas por id de
+    documento, hijos leídos con las primitivas del repositorio (get_all e 'in'
+    en paralelo) y escritura con SQLBulkImporter (un lote por transacción).
+    Los pacientes y veterinarios se deduplican con la misma clave que
+    create_diagnosis, así que sus conteos pueden ser menores que en Firestore.
+    """
+
+    def __init__(self, repository: FirestoreRepository, importer: Optional[SQLBulkImporter] = None,
+                 chunk_size: int = 500):
+        self.repository = repository
+        self.importer = importer or SQLBulkImporter(chunk_size=chunk_size)
+        self.chunk_size = chunk_size
+
+    async def run(self, checkpoint_path: Optional[str] = None, on_progress=None) -> ImportStats:
+        checkpoint = MigrationCheckpoint(checkpoint_path, FIRESTORE_TO_SQL)
+        start = checkpoint.start_for('diagnosticos', ['diagnosticos'])
+        stats = ImportStats()
+        diagnoses = self.repository.db.collection(self.repository.collections['diagnoses'])
+
+        async for page in self.repository._iter_pages(diagnoses, self.chunk_size, start_after=start):
+            records = await self._load_records(page, stats)
+            if records:
+                batch_stats = await asyncio.to_thread(self.importer.import_records, records)
+                stats.add(batch_stats)
+                metrics_collector.record_migration(FIRESTORE_TO_SQL, 'informes', batch_stats.reports)
+            checkpoint.save('diagnosticos', page[-1].id)
+            if on_progress:
+                on_progress(stats)
+        return stats
+
+    async def _load_records(self, page, stats: ImportStats) -> List[DiagnosisCreate]:
+        repository = self.repository
+        diagnoses = {doc.id: doc.to_dict() for doc in page}
+        patients, vets, study_docs = await asyncio.gather(
+            repository._get_docs_by_ids('patients', [d.get('patient_id') for d in diagnoses.values()]),
+            repository._get_docs_by_ids('veterinarians', [d.get('veterinarian_id') for d in diagnoses.values()]),
+            repository._get_by_field_in('studies', 'diagnosis_id', list(diagnoses))
+        )
+        study_ids = [doc.id for doc in study_docs]
+        measurement_docs, observation_docs = await asyncio.gather(
+            repository._get_by_field_in('measurements', 'study_id', study_ids),
+            repository._get_by_field_in('observations', 'study_id', study_ids)
+        )
+
+        children: Dict[str, Dict[str, List[Dict[str, Any]]]] = {
+            study_id: {'mediciones': [], 'observaciones': []} for study_id in study_ids
+        }
+        for doc in measurement_docs:
+            m = doc.to_dict()
+            children[m['study_id']]['mediciones'].append(dict(
+                tipo_medicion=m.get('tipo_medicion'), valor=m.get('valor'),
+                unidad=m.get('unidad'), organo=m.get('organo')
+            ))
+        for doc in observation_docs:
+            o = doc.to_dict()
+            children[o['study_id']]['observaciones'].append(dict(
+                observacion=o.get('observacion'), organo=o.get('organo')
+            ))
+        studies: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in study_docs:
+            s = doc.to_dict()
+            studies.setdefault(s['diagnosis_id'], []).append(dict(tipo_estudio=s.get('tipo_estudio'), **children[doc.id]))
+
+        records = []
+        for diagnosis_id, d in diagnoses.items():
+            patient = patients.get(d.get('patient_id'), {})
+            vet = vets.get(d.get('veterinarian_id'), {})
+            try:
+                records.append(DiagnosisCreate(
+                    paciente=dict(
+                        nombre=patient.get('nombre'), tutor=patient.get('tutor'),
+                        edad=str(patient['edad']) if patient.get('edad') is not None else None,
+                        raza=patient.get('raza')
+                    ),
+                    veterinario=dict(nombre=vet.get('nombre'), apellido=vet.get('apellido'), matricula=vet.get('matricula')),
+                    informe=dict(
+                        antecedentes=d.get('antecedentes'),
+                        diagnostico=d.get('diagnostico'),
+                        img_folder=d.get('img_folder'),
+                        fecha=d['fecha'].strftime("%d/%m/%Y") if d.get('fecha') else None,
+                        estudios=studies.get(diagnosis_id, [])
+                    )
+                ))
+            except ValidationError as e:
+                stats.errors += 1
+                metrics_collector.record_migration(FIRESTORE_TO_SQL, 'informes', 1, status="error")
+                logger.warning(f"Diagnóstico {diagnosis_id} inválido, se omite: {str(e)}")
+        return records
+
+
+async def verify_counts(repository: FirestoreRepository, direction: str,
+                        session_factory=None) -> List[Tuple[str, int, int, bool]]:
+    """
+    Conteos origen/destino por entidad: [(entidad, origen, destino, coincide)].
+    Pacientes y veterinarios se informan pero no se exigen iguales: cada
+    backend los deduplica con su propia clave.
+    """
+    session = (session_factory or get_sql_session())()
+    try:
+        sql_counts = [session.execute(select(func.count()).select_from(model)).scalar() for model, _ in COUNTED_ENTITIES]
+    finally:
+        session.close()
+    firestore_counts = await asyncio.gather(*[
+        repository._count(repository.db.collection(repository.collections[key]))
+        for _, key in COUNTED_ENTITIES
+    ])
+
+    results = []
+    for (model, key), sql_count, firestore_count in zip(COUNTED_ENTITIES, sql_counts, firestore_counts):
+        source, target = (sql_count, firestore_count) if direction == SQL_TO_FIRESTORE else (firestore_count, sql_count)
+        deduplicated = key in ('patients', 'veterinarians')
+        results.append((model.__tablename__, source, target, deduplicated or source == target))
+    return results
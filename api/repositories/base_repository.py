@@ -1,6 +1,23 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Any, Dict
-from models.schemas import DiagnosisCreate, DiagnosisResponse, PatientResponse, SidebarDiagnosisItem
+from typing import AsyncIterator, List, Optional, Any, Dict
+from models.schemas import (
+    DiagnosisCreate, DiagnosisResponse, PatientResponse, SidebarDiagnosisItem,
+    DiagnosisListQuery, PatientListQuery, SidebarDiagnosisPage, PatientPage, SearchQuery, SearchPage,
+    DiagnosisExportQuery, DiagnosisExportRow
+)
+
+
+class PartialWriteError(Exception):
+    """
+    create_diagnoses falló después de confirmar parte del grupo (backends sin
+    transacción para todo el grupo): committed_ids son los ids de los primeros
+    informes, ya escritos, en el mismo orden que records
+    """
+
+    def __init__(self, committed_ids: List[str], cause: Exception):
+        super().__init__(str(cause))
+        self.committed_ids = committed_ids
+
 
 class BaseRepository(ABC):
     """Interfaz base para repositorios (DAO Pattern)"""
@@ -10,19 +27,53 @@ class BaseRepository(ABC):
         """Crear un nuevo diagnóstico"""
         pass
     
+    @abstractmethod
+    async def create_diagnoses(self, records: List[DiagnosisCreate]) -> List[str]:
+        """
+        Crear un grupo de diagnósticos en una sola escritura (transacción o
+        batch); ids en el mismo orden. Si el grupo no es atómico y falla a
+        mitad de camino lanza PartialWriteError con los ya escritos.
+        """
+        pass
+    
     @abstractmethod
     async def get_diagnosis(self, diagnosis_id: str) -> Optional[DiagnosisResponse]:
         """Obtener un diagnóstico por ID"""
         pass
 
     @abstractmethod
-    async def get_all_diagnoses(self) -> List[SidebarDiagnosisItem]:
-        """Obtener todos los diagnósticos"""
+    async def get_data_version(self) -> str:
+        """Marcador barato (una lectura indexada) que cambia con cada alta o borrado de informes"""
+        pass
+
+    @abstractmethod
+    async def get_all_diagnoses(self, query: Optional[DiagnosisListQuery] = None) -> SidebarDiagnosisPage:
+        """Obtener diagnósticos (más recientes primero) paginados por cursor"""
+        pass
+    
+    @abstractmethod
+    def export_diagnoses(self, query: DiagnosisExportQuery, chunk_size: int) -> AsyncIterator[List[DiagnosisExportRow]]:
+        """Recorrer todos los informes completos que cumplen el filtro, de a tandas de hasta chunk_size"""
+        pass
+    
+    @abstractmethod
+    async def search_diagnoses(self, query: SearchQuery) -> SearchPage:
+        """Búsqueda de texto completo (rankeada) en informes y observaciones"""
+        pass
+    
+    @abstractmethod
+    async def rebuild_sidebar(self) -> int:
+        """Regenerar la proyección del listado lateral desde los datos existentes"""
+        pass
+    
+    @abstractmethod
+    async def get_patients(self, query: Optional[PatientListQuery] = None) -> PatientPage:
+        """Obtener pacientes paginados por cursor"""
         pass
     
     @abstractmethod
-    async def get_patients(self) -> List[PatientResponse]:
-        """Obtener todos los pacientes"""
+    async def search_patients(self, term: str, limit: int = 20, field: Optional[str] = None) -> List[PatientResponse]:
+        """Buscar pacientes por prefijo de nombre y/o tutor (sin distinguir mayúsculas ni acentos)"""
         pass
     
     @abstractmethod
@@ -0,0 +1,117 @@
+from typing import Dict, Tuple
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from models.entities import Organos, Unidades, Medidas, Tipos_Estudios
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "dimension_cache_pending"
+
+
+class DimensionCache:
+    """
+    Cache en proceso nombre→id de las tablas de dimensión (órganos, unidades,
+    medidas y tipos de estudio). Son tablas chicas que casi no cambian, así que
+    se cargan completas una vez y solo se consulta la base ante un fallo.
+    """
+    _instance = None
+    _dimensions = {
+        'organos': (Organos, 'nombre'),
+        'unidades': (Unidades, 'unidad'),
+        'medidas': (Medidas, 'medida'),
+        'tipos_estudios': (Tipos_Estudios, 'tipo_estudio'),
+    }
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(DimensionCache, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._ids = {name: {} for name in cls._dimensions}
+            cls._instance._warmed = False
+        return cls._instance
+
+    def warm(self, session):
+        """Cargar en bloque todas las tablas de dimensión (una consulta por tabla)"""
+        loaded = {}
+        for name, (model, column) in self._dimensions.items():
+            rows = session.query(getattr(model, column), model.id).all()
+            loaded[name] = {value: row_id for value, row_id in rows}
+
+        with self._lock:
+            for name, values in loaded.items():
+                self._ids[name].update(values)
+            self._warmed = True
+        logger.info(f"Cache de dimensiones cargada: { {k: len(v) for k, v in loaded.items()} }")
+
+    def get_id(self, session, dimension: str, value: str) -> int:
+        """Obtener el id de un valor de dimensión, creándolo si no existe (get-or-create)"""
+        if not self._warmed:
+            self.warm(session)
+
+        row_id = self._ids[dimension].get(value)
+        if row_id is not None:
+            return row_id
+
+        # Valores creados en esta misma transacción (aún no confirmados)
+        pending = session.info.get(_PENDING_KEY, {})
+        if (dimension, value) in pending:
+            return pending[(dimension, value)]
+
+        # Fallo: refrescar desde la base (otro proceso pudo haberlo creado)
+        model, column = self._dimensions[dimension]
+        row_id = self._select_id(session, model, column, value)
+        if row_id is not None:
+            self._store(dimension, value, row_id)
+            return row_id
+
+        row_id = self._insert(session, model, column, value)
+        self._add_pending(session, dimension, value, row_id)
+        return row_id
+
+    def invalidate(self):
+        """Vaciar la cache (se recarga en el próximo uso)"""
+        with self._lock:
+            self._ids = {name: {} for name in self._dimensions}
+            self._warmed = False
+
+    def _select_id(self, session, model, column: str, value: str):
+        return session.query(model.id).filter(getattr(model, column) == value).scalar()
+
+    def _insert(self, session, model, column: str, value: str) -> int:
+        """Insertar dentro de un savepoint; si otra transacción lo insertó primero, releer"""
+        try:
+            with session.begin_nested():
+                instance = model(**{column: value})
+                session.add(instance)
+            return instance.id
+        except IntegrityError:
+            logger.debug(f"Inserción concurrente de {model.__tablename__}='{value}', releyendo")
+            return self._select_id(session, model, column, value)
+
+    def _store(self, dimension: str, value: str, row_id: int):
+        with self._lock:
+            self._ids[dimension][value] = row_id
+
+    def _add_pending(self, session, dimension: str, value: str, row_id: int):
+        # Los ids nuevos solo se publican en la cache cuando la transacción confirma
+        if _PENDING_KEY not in session.info:
+            session.info[_PENDING_KEY] = {}
+            event.listen(session, "after_commit", self._promote_pending)
+            event.listen(session, "after_rollback", self._discard_pending)
+        session.info[_PENDING_KEY][(dimension, value)] = row_id
+
+    def _promote_pending(self, session):
+        pending: Dict[Tuple[str, str], int] = session.info.get(_PENDING_KEY, {})
+        with self._lock:
+            for (dimension, value), row_id in pending.items():
+                self._ids[dimension][value] = row_id
+        pending.clear()
+
+    def _discard_pending(self, session):
+        session.info.get(_PENDING_KEY, {}).clear()
+
+
+# Instancia global (compartida por todo el proceso)
+dimension_cache = DimensionCache()
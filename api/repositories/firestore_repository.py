@@ -1,301 +1,979 @@
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from google.cloud import firestore
 from models.schemas import (
     DiagnosisCreate, DiagnosisResponse, PatientResponse, VeterinarianResponse,
-    StudyResponse, MeasurementResponse, ObservationResponse, SidebarDiagnosisItem
+    StudyResponse, MeasurementResponse, ObservationResponse, SidebarDiagnosisItem,
+    DiagnosisListQuery, PatientListQuery, SidebarDiagnosisPage, PatientPage, SearchQuery, SearchHit, SearchPage,
+    DiagnosisExportQuery, DiagnosisExportRow
 )
-from repositories.base_repository import BaseRepository
+from repositories.base_repository import BaseRepository, PartialWriteError
+from repositories.pagination import encode_cursor, decode_cursor
+from repositories.inverted_index import InvertedIndex
+from app.config import settings
+from utils.utils import normalize_key
 import uuid
-from datetime import datetime
+import hashlib
+from datetime import datetime, time, timezone
+import time as time_module
+import asyncio
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# Máximo de valores admitidos por un filtro 'in' de Firestore
+IN_QUERY_LIMIT = 30
+# Documentos por llamada a get_all y operaciones por batch de escritura (límite 500)
+GET_ALL_CHUNK = 100
+BATCH_LIMIT = 450
+# Campos del paciente que usa la proyección del listado (máscara de get_all)
+SIDEBAR_PATIENT_FIELDS = ['nombre', 'tutor', 'edad', 'raza']
+
+
+def _chunks(values: List, size: int):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _identity_hash(*parts: str) -> str:
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _written_at(data: Dict[str, Any]) -> float:
+    written = data.get('updated_at') or data.get('created_at')
+    return written.timestamp() if hasattr(written, 'timestamp') else 0.0
+
 
 class FirestoreRepository(BaseRepository):
     def __init__(self, project_id: str, credentials_path: str = None):
         if credentials_path:
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
-        self.db = firestore.Client(project=project_id)
+        self.db = self._create_client(project_id)
         self.collections = {
             'patients': 'pacientes',
             'veterinarians': 'veterinarios',
             'diagnoses': 'diagnosticos',
             'studies': 'estudios',
             'measurements': 'mediciones',
-            'observations': 'observaciones'
+            'observations': 'observaciones',
+            'sidebar': 'sidebar_diagnosticos'
         }
+        # Firestore no tiene búsqueda de texto: índice invertido en memoria,
+        # cargado en el primer uso y actualizado en cada create_diagnosis; cada
+        # SEARCH_INDEX_REFRESH_SECONDS se agregan los informes escritos por otras
+        # instancias (created_at posterior al último indexado)
+        self.search_index = InvertedIndex()
+        self._search_index_loaded_at = None
+        self._search_index_synced_at: Optional[datetime] = None
+        self._search_index_lock = asyncio.Lock()
 
     async def create_diagnosis(self, diagnosis_data: DiagnosisCreate) -> str:
         try:
-            diagnosis_id = str(uuid.uuid4())
-            patient_id = str(uuid.uuid4())
-            vet_id = str(uuid.uuid4())
+            diagnosis_id, writes = self._diagnosis_writes(diagnosis_data)
+            await self._commit_writes({ref.path: (ref, data, merge) for ref, data, merge in writes})
+            self._index_new_diagnosis(diagnosis_id, diagnosis_data)
+            return diagnosis_id
 
-            batch = self.db.batch()
+        except Exception as e:
+            raise e
 
-            # Paciente
-            patient_ref = self.db.collection(self.collections['patients']).document(patient_id)
-            batch.set(patient_ref, {
-                'nombre': diagnosis_data.paciente.nombre,
-                'tutor': diagnosis_data.paciente.tutor,
-                'edad': diagnosis_data.paciente.edad,
-                'raza': getattr(diagnosis_data.paciente, 'raza', None),
-                'created_at': firestore.SERVER_TIMESTAMP
-            })
-
-            # Veterinario
-            vet_ref = self.db.collection(self.collections['veterinarians']).document(vet_id)
-            batch.set(vet_ref, {
-                'nombre': diagnosis_data.veterinario.nombre,
-                'apellido': diagnosis_data.veterinario.apellido,
-                'matricula': diagnosis_data.veterinario.matricula,
-                'created_at': firestore.SERVER_TIMESTAMP
-            })
-
-            # Diagnóstico
-            diagnostico = diagnosis_data.informe.diagnostico
-            if isinstance(diagnostico, list):
-                diagnostico = "; ".join(diagnostico)
-
-            fecha_obj = None
-            if diagnosis_data.informe.fecha:
-                fecha_obj = datetime.strptime(diagnosis_data.informe.fecha, "%d/%m/%Y")
-
-            diagnosis_ref = self.db.collection(self.collections['diagnoses']).document(diagnosis_id)
-            batch.set(diagnosis_ref, {
-                'antecedentes': diagnosis_data.informe.antecedentes,
-                'diagnostico': diagnostico,
-                'img_folder': diagnosis_data.informe.img_folder,
-                'fecha': fecha_obj if fecha_obj else None,
-                'patient_id': patient_id,
-                'veterinarian_id': vet_id,
-                'created_at': firestore.SERVER_TIMESTAMP
-            })
+    async def create_diagnoses(self, records: List[DiagnosisCreate]) -> List[str]:
+        """
+        Varios informes por batch (hasta BATCH_LIMIT escrituras; un informe
+        nunca se reparte entre dos batches). Pacientes y veterinarios repetidos
+        en el grupo se combinan en una sola escritura. Cada batch es atómico
+        pero el grupo no: si falla un batch posterior al primero se lanza
+        PartialWriteError con los informes de los batches ya confirmados.
+        """
+        diagnosis_ids = []
+        committed = 0
+        try:
+            pending: Dict[str, tuple] = {}
+            for diagnosis_data in records:
+                diagnosis_id, writes = self._diagnosis_writes(diagnosis_data)
+                if pending and len(pending) + len(writes) > BATCH_LIMIT:
+                    await self._commit_writes(pending)
+                    self._index_new_diagnoses(diagnosis_ids[committed:], records[committed:len(diagnosis_ids)])
+                    committed = len(diagnosis_ids)
+                    pending = {}
+                for ref, data, merge in writes:
+                    previous = pending.get(ref.path)
+                    if previous is not None and merge:
+                        data = {**previous[1], **data}
+                    pending[ref.path] = (ref, data, merge)
+                diagnosis_ids.append(diagnosis_id)
+            if pending:
+                await self._commit_writes(pending)
+                self._index_new_diagnoses(diagnosis_ids[committed:], records[committed:])
+            return diagnosis_ids
 
-            # Estudios
-            for estudio_data in diagnosis_data.informe.estudios:
-                study_id = str(uuid.uuid4())
-                study_ref = self.db.collection(self.collections['studies']).document(study_id)
+        except Exception as e:
+            if committed:
+                raise PartialWriteError(diagnosis_ids[:committed], e) from e
+            raise e
 
-                batch.set(study_ref, {
-                    'tipo_estudio': estudio_data.tipo_estudio,
-                    'diagnosis_id': diagnosis_id,
+    async def _commit_writes(self, writes: Dict[str, tuple]):
+        batch = self.db.batch()
+        for ref, data, merge in writes.values():
+            batch.set(ref, data, merge=merge)
+        await self._commit(batch)
+
+    def _diagnosis_writes(self, diagnosis_data: DiagnosisCreate):
+        """(id del diagnóstico, escrituras [(ref, datos, merge)]) de un informe completo"""
+        diagnosis_id = str(uuid.uuid4())
+        # Paciente y veterinario con id derivado de su clave: un paciente que
+        # vuelve actualiza (merge) su documento en lugar de duplicarlo
+        patient_id = self._patient_doc_id(
+            diagnosis_data.paciente.nombre, diagnosis_data.paciente.tutor,
+            diagnosis_data.paciente.edad, diagnosis_data.paciente.raza
+        )
+        vet_id = self._vet_doc_id(
+            diagnosis_data.veterinario.nombre, diagnosis_data.veterinario.apellido,
+            diagnosis_data.veterinario.matricula
+        )
+
+        writes = []
+
+        # Paciente
+        patient_ref = self.db.collection(self.collections['patients']).document(patient_id)
+        writes.append((patient_ref, {
+            'nombre': diagnosis_data.paciente.nombre,
+            'tutor': diagnosis_data.paciente.tutor,
+            'edad': diagnosis_data.paciente.edad,
+            'raza': getattr(diagnosis_data.paciente, 'raza', None),
+            **self._patient_search_keys(diagnosis_data.paciente.nombre, diagnosis_data.paciente.tutor),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, True))
+
+        # Veterinario
+        vet_ref = self.db.collection(self.collections['veterinarians']).document(vet_id)
+        writes.append((vet_ref, {
+            'nombre': diagnosis_data.veterinario.nombre,
+            'apellido': diagnosis_data.veterinario.apellido,
+            'matricula': diagnosis_data.veterinario.matricula,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, True))
+
+        # Diagnóstico
+        diagnostico, fecha_obj = self._report_fields(diagnosis_data)
+        diagnosis_ref = self.db.collection(self.collections['diagnoses']).document(diagnosis_id)
+        writes.append((diagnosis_ref, {
+            'antecedentes': diagnosis_data.informe.antecedentes,
+            'diagnostico': diagnostico,
+            'img_folder': diagnosis_data.informe.img_folder,
+            'fecha': fecha_obj if fecha_obj else None,
+            'patient_id': patient_id,
+            'veterinarian_id': vet_id,
+            # Desnormalizados para filtrar el listado sin leer pacientes
+            'tutor': diagnosis_data.paciente.tutor,
+            'raza': getattr(diagnosis_data.paciente, 'raza', None),
+            'created_at': firestore.SERVER_TIMESTAMP
+        }, False))
+
+        # Proyección del listado lateral (mismo batch que el diagnóstico)
+        sidebar_ref = self.db.collection(self.collections['sidebar']).document(diagnosis_id)
+        writes.append((sidebar_ref, self._sidebar_document(
+            diagnosis_data.paciente.model_dump(), fecha_obj, patient_id
+        ), False))
+
+        # Estudios
+        for estudio_data in diagnosis_data.informe.estudios:
+            study_id = str(uuid.uuid4())
+            study_ref = self.db.collection(self.collections['studies']).document(study_id)
+
+            writes.append((study_ref, {
+                'tipo_estudio': estudio_data.tipo_estudio,
+                'diagnosis_id': diagnosis_id,
+                'created_at': firestore.SERVER_TIMESTAMP
+            }, False))
+
+            # Mediciones
+            for medicion in estudio_data.mediciones:
+                measurement_id = str(uuid.uuid4())
+                measurement_ref = self.db.collection(self.collections['measurements']).document(measurement_id)
+
+                writes.append((measurement_ref, {
+                    'tipo_medicion': medicion.tipo_medicion,
+                    'valor': str(medicion.valor) if medicion.valor is not None else None,
+                    'unidad': medicion.unidad,
+                    'organo': medicion.organo,
+                    'study_id': study_id,
                     'created_at': firestore.SERVER_TIMESTAMP
-                })
+                }, False))
 
-                # Mediciones
-                for medicion in estudio_data.mediciones:
-                    measurement_id = str(uuid.uuid4())
-                    measurement_ref = self.db.collection(self.collections['measurements']).document(measurement_id)
-
-                    batch.set(measurement_ref, {
-                        'tipo_medicion': medicion.tipo_medicion,
-                        'valor': str(medicion.valor) if medicion.valor is not None else None,
-                        'unidad': medicion.unidad,
-                        'organo': medicion.organo,
-                        'study_id': study_id,
-                        'created_at': firestore.SERVER_TIMESTAMP
-                    })
-
-                # Observaciones
-                for obs in estudio_data.observaciones:
-                    obs_id = str(uuid.uuid4())
-                    obs_ref = self.db.collection(self.collections['observations']).document(obs_id)
-
-                    batch.set(obs_ref, {
-                        'observacion': obs.observacion,
-                        'organo': obs.organo,
-                        'study_id': study_id,
-                        'created_at': firestore.SERVER_TIMESTAMP
-                    })
-
-            batch.commit()
-            return diagnosis_id
+            # Observaciones
+            for obs in estudio_data.observaciones:
+                obs_id = str(uuid.uuid4())
+                obs_ref = self.db.collection(self.collections['observations']).document(obs_id)
 
-        except Exception as e:
-            raise e
+                writes.append((obs_ref, {
+                    'observacion': obs.observacion,
+                    'organo': obs.organo,
+                    'study_id': study_id,
+                    'created_at': firestore.SERVER_TIMESTAMP
+                }, False))
+
+        return diagnosis_id, writes
+
+    @staticmethod
+    def _report_fields(diagnosis_data: DiagnosisCreate):
+        """(diagnóstico como texto, fecha como datetime o None)"""
+        diagnostico = diagnosis_data.informe.diagnostico
+        if isinstance(diagnostico, list):
+            diagnostico = "; ".join(diagnostico)
+        fecha_obj = None
+        if diagnosis_data.informe.fecha:
+            fecha_obj = datetime.strptime(diagnosis_data.informe.fecha, "%d/%m/%Y")
+        return diagnostico, fecha_obj
+
+    def _index_new_diagnoses(self, diagnosis_ids: List[str], records: List[DiagnosisCreate]):
+        for diagnosis_id, diagnosis_data in zip(diagnosis_ids, records):
+            self._index_new_diagnosis(diagnosis_id, diagnosis_data)
+
+    def _index_new_diagnosis(self, diagnosis_id: str, diagnosis_data: DiagnosisCreate):
+        """Agregar un informe recién escrito al índice de búsqueda en memoria (si ya está cargado)"""
+        if self._search_index_loaded_at is None:
+            return
+        diagnostico, fecha_obj = self._report_fields(diagnosis_data)
+        self.search_index.add(
+            diagnosis_id,
+            self._search_fields(
+                diagnosis_data.informe.antecedentes,
+                diagnostico,
+                [obs.observacion for estudio in diagnosis_data.informe.estudios for obs in estudio.observaciones]
+            ),
+            self._search_meta(diagnosis_data.paciente.model_dump(), fecha_obj, diagnostico)
+        )
+
+    def _create_client(self, project_id: str):
+        return firestore.Client(project=project_id)
+
+    # Primitivas de E/S: todo acceso a Firestore pasa por estos métodos. El cliente
+    # síncrono corre en hilos para no bloquear el event loop y poder lanzar
+    # operaciones independientes en paralelo; AsyncFirestoreRepository los
+    # reemplaza por llamadas nativas de firestore.AsyncClient.
+    async def _get_doc(self, ref):
+        return await asyncio.to_thread(ref.get)
+
+    async def _get_all(self, refs: List, field_paths: Optional[List[str]] = None) -> List:
+        """Varios documentos en un solo RPC (BatchGetDocuments)"""
+        if not refs:
+            return []
+        return await asyncio.to_thread(lambda: list(self.db.get_all(refs, field_paths=field_paths)))
+
+    async def _get_docs(self, query) -> List:
+        return await asyncio.to_thread(query.get)
+
+    async def _commit(self, batch):
+        return await asyncio.to_thread(batch.commit)
+
+    async def _set(self, ref, data: Dict[str, Any], merge: bool = False):
+        return await asyncio.to_thread(ref.set, data, merge=merge)
+
+    async def _count(self, query) -> int:
+        """Conteo con agregación del servidor (no descarga documentos)"""
+        result = await asyncio.to_thread(query.count().get)
+        return int(result[0][0].value)
+
+    async def _get_docs_by_ids(self, collection_key: str, ids, field_paths: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Documentos por id: ids deduplicados, get_all en lotes de GET_ALL_CHUNK
+        ejecutados en paralelo (acotado) y, opcionalmente, solo los campos pedidos.
+        """
+        collection = self.db.collection(self.collections[collection_key])
+        unique_ids = list(dict.fromkeys(doc_id for doc_id in ids if doc_id))
+        semaphore = asyncio.Semaphore(settings.firestore_concurrency)
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await self._get_all([collection.document(doc_id) for doc_id in chunk], field_paths)
+
+        results = await asyncio.gather(*[fetch(chunk) for chunk in _chunks(unique_ids, GET_ALL_CHUNK)])
+        return {doc.id: doc.to_dict() for docs in results for doc in docs if doc.exists}
+
+    async def _iter_pages(self, query, page_size: int = 1000, start_after: Optional[str] = None):
+        """Recorrer una consulta completa por páginas ordenadas por id de documento (opcionalmente desde un id)"""
+        last = {'__name__': start_after} if start_after else None
+        while True:
+            page_query = query.order_by('__name__').limit(page_size)
+            if last is not None:
+                page_query = page_query.start_after(last)
+            docs = await self._get_docs(page_query)
+            if docs:
+                yield docs
+            if len(docs) < page_size:
+                return
+            last = docs[-1]
+
+    async def _write_in_batches(self, operations: List):
+        """Aplicar operaciones ('set' | 'update' | 'delete', ref, datos) en batches de BATCH_LIMIT en paralelo"""
+        semaphore = asyncio.Semaphore(settings.firestore_concurrency)
+
+        async def commit(chunk):
+            batch = self.db.batch()
+            for kind, ref, data in chunk:
+                if kind == 'set':
+                    batch.set(ref, data)
+                elif kind == 'update':
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            async with semaphore:
+                await self._commit(batch)
+
+        await asyncio.gather(*[commit(chunk) for chunk in _chunks(operations, BATCH_LIMIT)])
+
+    async def _get_by_field_in(self, collection_key: str, field: str, values: List[str]) -> List:
+        """Documentos cuyo field está en values: consultas 'in' de hasta 30 valores, en paralelo"""
+        collection = self.db.collection(self.collections[collection_key])
+        results = await asyncio.gather(*[
+            self._get_docs(collection.where(field, 'in', chunk))
+            for chunk in _chunks(values, IN_QUERY_LIMIT)
+        ])
+        return [doc for docs in results for doc in docs]
 
     async def get_diagnosis(self, diagnosis_id: str) -> Optional[DiagnosisResponse]:
         try:
-            diagnosis_doc = self.db.collection(self.collections['diagnoses']).document(diagnosis_id).get()
+            # Ronda 1: diagnóstico y estudios no dependen entre sí
+            diagnosis_doc, study_docs = await asyncio.gather(
+                self._get_doc(self.db.collection(self.collections['diagnoses']).document(diagnosis_id)),
+                self._get_docs(self.db.collection(self.collections['studies']).where(
+                    'diagnosis_id', '==', diagnosis_id
+                ))
+            )
             if not diagnosis_doc.exists:
                 return None
 
             diagnosis_data = diagnosis_doc.to_dict()
+            study_ids = [doc.id for doc in study_docs]
+
+            # Ronda 2: paciente + veterinario en un get_all, mediciones y observaciones
+            # de todos los estudios con consultas 'in', todo en paralelo
+            patient_ref = self.db.collection(self.collections['patients']).document(diagnosis_data['patient_id'])
+            vet_ref = self.db.collection(self.collections['veterinarians']).document(diagnosis_data['veterinarian_id'])
+            people_docs, measurement_docs, observation_docs = await asyncio.gather(
+                self._get_all([patient_ref, vet_ref]),
+                self._get_by_field_in('measurements', 'study_id', study_ids),
+                self._get_by_field_in('observations', 'study_id', study_ids)
+            )
+            # get_all no garantiza el orden de los documentos
+            people = {doc.reference.path: doc.to_dict() for doc in people_docs}
+            mediciones_por_estudio, observaciones_por_estudio = self._group_children(measurement_docs, observation_docs)
 
-            # Paciente
-            patient_doc = self.db.collection(self.collections['patients']).document(
-                diagnosis_data['patient_id']
-            ).get()
-            patient_data = patient_doc.to_dict()
-
-            # Veterinario
-            vet_doc = self.db.collection(self.collections['veterinarians']).document(
-                diagnosis_data['veterinarian_id']
-            ).get()
-            vet_data = vet_doc.to_dict()
-
-            # Estudios
-            studies_query = self.db.collection(self.collections['studies']).where(
-                'diagnosis_id', '==', diagnosis_id
-            ).get()
-
-            estudios = []
-            for study_doc in studies_query:
-                study_data = study_doc.to_dict()
-                study_id = study_doc.id
-
-                # Mediciones
-                measurements_query = self.db.collection(self.collections['measurements']).where(
-                    'study_id', '==', study_id
-                ).get()
-                mediciones = [
-                    MeasurementResponse(
-                        id=doc.id,
-                        tipo_medicion=md['tipo_medicion'],
-                        valor=md['valor'],
-                        organo=md['organo'],
-                        unidad=md.get('unidad')
-                    )
-                    for doc in measurements_query
-                    for md in [doc.to_dict()]
-                ]
+            return self._diagnosis_response(
+                diagnosis_id, diagnosis_data, people[patient_ref.path], people[vet_ref.path],
+                study_docs, mediciones_por_estudio, observaciones_por_estudio
+            )
 
-                # Observaciones
-                observations_query = self.db.collection(self.collections['observations']).where(
-                    'study_id', '==', study_id
-                ).get()
-                observaciones = [
-                    ObservationResponse(
-                        id=doc.id,
-                        observacion=od['observacion'],
-                        organo=od['organo']
-                    )
-                    for doc in observations_query
-                    for od in [doc.to_dict()]
-                ]
+        except Exception as e:
+            raise e
 
-                estudios.append(
-                    StudyResponse(
-                        id=study_id,
-                        tipo_estudio=study_data['tipo_estudio'],
-                        mediciones=mediciones,
-                        observaciones=observaciones
-                    )
+    async def get_data_version(self) -> str:
+        # Último informe dado de alta (un documento leído); sin informes, "0"
+        docs = await self._get_docs(
+            self.db.collection(self.collections['diagnoses']).order_by(
+                'created_at', direction=firestore.Query.DESCENDING
+            ).limit(1)
+        )
+        if not docs:
+            return "0"
+        created_at = docs[0].get('created_at')
+        return f"{docs[0].id}:{created_at.isoformat() if created_at else ''}"
+
+    @staticmethod
+    def _group_children(measurement_docs: List, observation_docs: List):
+        """Mediciones y observaciones agrupadas por study_id"""
+        mediciones_por_estudio: Dict[str, List[MeasurementResponse]] = {}
+        for doc in measurement_docs:
+            md = doc.to_dict()
+            mediciones_por_estudio.setdefault(md['study_id'], []).append(
+                MeasurementResponse(
+                    id=doc.id,
+                    tipo_medicion=md['tipo_medicion'],
+                    valor=md['valor'],
+                    organo=md['organo'],
+                    unidad=md.get('unidad')
                 )
+            )
 
-            fecha = diagnosis_data.get('fecha')
-            if isinstance(fecha, datetime):
-                fecha = fecha.date()
-            elif isinstance(fecha, str):
-                fecha = datetime.strptime(fecha, "%Y-%m-%d").date()
-
-            return DiagnosisResponse(
-                id=diagnosis_id,
-                antecedentes=diagnosis_data.get('antecedentes'),
-                diagnostico=diagnosis_data.get('diagnostico'),
-                fecha=fecha,
-                img_folder=diagnosis_data.get('img_folder'),
-                paciente=PatientResponse(
-                    id=diagnosis_data['patient_id'],
-                    nombre=patient_data['nombre'],
-                    tutor=patient_data['tutor'],
-                    edad=str(patient_data['edad']),
-                    raza=patient_data.get('raza')
-                ),
-                veterinario=VeterinarianResponse(
-                    id=diagnosis_data['veterinarian_id'],
-                    nombre=vet_data['nombre'],
-                    apellido=vet_data['apellido'],
-                    matricula=vet_data.get('matricula')
-                ),
-                estudios=estudios
+        observaciones_por_estudio: Dict[str, List[ObservationResponse]] = {}
+        for doc in observation_docs:
+            od = doc.to_dict()
+            observaciones_por_estudio.setdefault(od['study_id'], []).append(
+                ObservationResponse(
+                    id=doc.id,
+                    observacion=od['observacion'],
+                    organo=od['organo']
+                )
+            )
+        return mediciones_por_estudio, observaciones_por_estudio
+
+    @staticmethod
+    def _diagnosis_response(diagnosis_id: str, diagnosis_data: Dict[str, Any], patient_data: Dict[str, Any],
+                            vet_data: Dict[str, Any], study_docs: List,
+                            mediciones_por_estudio: Dict[str, List[MeasurementResponse]],
+                            observaciones_por_estudio: Dict[str, List[ObservationResponse]]) -> DiagnosisResponse:
+        estudios = [
+            StudyResponse(
+                id=study_doc.id,
+                tipo_estudio=study_doc.get('tipo_estudio'),
+                mediciones=mediciones_por_estudio.get(study_doc.id, []),
+                observaciones=observaciones_por_estudio.get(study_doc.id, [])
             )
+            for study_doc in study_docs
+        ]
+
+        fecha = diagnosis_data.get('fecha')
+        if isinstance(fecha, datetime):
+            fecha = fecha.date()
+        elif isinstance(fecha, str):
+            fecha = datetime.strptime(fecha, "%Y-%m-%d").date()
+
+        return DiagnosisResponse(
+            id=diagnosis_id,
+            antecedentes=diagnosis_data.get('antecedentes'),
+            diagnostico=diagnosis_data.get('diagnostico'),
+            fecha=fecha,
+            img_folder=diagnosis_data.get('img_folder'),
+            paciente=PatientResponse(
+                id=diagnosis_data['patient_id'],
+                nombre=patient_data['nombre'],
+                tutor=patient_data['tutor'],
+                edad=str(patient_data['edad']),
+                raza=patient_data.get('raza')
+            ),
+            veterinario=VeterinarianResponse(
+                id=diagnosis_data['veterinarian_id'],
+                nombre=vet_data['nombre'],
+                apellido=vet_data['apellido'],
+                matricula=vet_data.get('matricula')
+            ),
+            estudios=estudios
+        )
+
+    async def export_diagnoses(self, query: DiagnosisExportQuery, chunk_size: int) -> AsyncIterator[List[DiagnosisExportRow]]:
+        """
+        Informes por páginas de chunk_size (cursor start_after), cada una armada
+        con lecturas en lote de estudios, mediciones, observaciones, pacientes y
+        veterinarios. La página siguiente se pide recién cuando se consumió la
+        anterior. Filtrar por fecha y since a la vez requiere el índice compuesto
+        (fecha, created_at, __name__) en diagnosticos.
+        """
+        filtered = self.db.collection(self.collections['diagnoses'])
+        if query.fecha_desde:
+            filtered = filtered.where('fecha', '>=', datetime.combine(query.fecha_desde, time.min))
+        if query.fecha_hasta:
+            filtered = filtered.where('fecha', '<=', datetime.combine(query.fecha_hasta, time.max))
+        if query.fecha_desde or query.fecha_hasta:
+            filtered = filtered.order_by('fecha')
+        if query.since:
+            since = query.since if query.since.tzinfo else query.since.replace(tzinfo=timezone.utc)
+            filtered = filtered.where('created_at', '>', since).order_by('created_at')
+
+        async for docs in self._iter_pages(filtered, page_size=chunk_size):
+            yield await self._export_page(docs)
+
+    async def _export_page(self, diagnosis_docs: List) -> List[DiagnosisExportRow]:
+        diagnoses = {doc.id: doc.to_dict() for doc in diagnosis_docs}
+        diagnosis_ids = list(diagnoses)
+        study_docs, patients, vets = await asyncio.gather(
+            self._get_by_field_in('studies', 'diagnosis_id', diagnosis_ids),
+            self._get_docs_by_ids('patients', [data.get('patient_id') for data in diagnoses.values()]),
+            self._get_docs_by_ids('veterinarians', [data.get('veterinarian_id') for data in diagnoses.values()])
+        )
+        study_ids = [doc.id for doc in study_docs]
+        measurement_docs, observation_docs = await asyncio.gather(
+            self._get_by_field_in('measurements', 'study_id', study_ids),
+            self._get_by_field_in('observations', 'study_id', study_ids)
+        )
+        mediciones_por_estudio, observaciones_por_estudio = self._group_children(measurement_docs, observation_docs)
+        estudios_por_informe: Dict[str, List] = {}
+        for doc in study_docs:
+            estudios_por_informe.setdefault(doc.get('diagnosis_id'), []).append(doc)
+
+        rows = []
+        for diagnosis_id, data in diagnoses.items():
+            patient_data = patients.get(data.get('patient_id'))
+            vet_data = vets.get(data.get('veterinarian_id'))
+            if patient_data is None or vet_data is None:
+                logger.warning(f"Informe {diagnosis_id} sin paciente o veterinario, se omite de la exportación")
+                continue
+            response = self._diagnosis_response(
+                diagnosis_id, data, patient_data, vet_data, estudios_por_informe.get(diagnosis_id, []),
+                mediciones_por_estudio, observaciones_por_estudio
+            )
+            rows.append(DiagnosisExportRow(**response.model_dump(), created_at=data.get('created_at')))
+        return rows
+
+    async def get_all_diagnoses(self, query: Optional[DiagnosisListQuery] = None) -> SidebarDiagnosisPage:
+        try:
+            query = query or DiagnosisListQuery()
+            # Una sola consulta por rango sobre la proyección (sin lecturas de pacientes)
+            sidebar_ref = self.db.collection(self.collections['sidebar'])
+            filtered = sidebar_ref
+            if query.fecha_desde:
+                filtered = filtered.where('fecha', '>=', datetime.combine(query.fecha_desde, time.min))
+            if query.fecha_hasta:
+                filtered = filtered.where('fecha', '<=', datetime.combine(query.fecha_hasta, time.max))
+            if query.tutor:
+                filtered = filtered.where('tutor', '==', query.tutor)
+            if query.raza:
+                filtered = filtered.where('raza', '==', query.raza)
+
+            ordered = filtered.order_by('fecha', direction=firestore.Query.DESCENDING).order_by(
+                '__name__', direction=firestore.Query.DESCENDING
+            )
+            if query.cursor:
+                fecha_cursor, id_cursor = decode_cursor(query.cursor, 2)
+                ordered = ordered.start_after({
+                    'fecha': datetime.fromisoformat(fecha_cursor) if fecha_cursor else None,
+                    '__name__': sidebar_ref.document(id_cursor)
+                })
+
+            sidebar_docs, next_cursor = await self._fetch_page(
+                ordered, query.limit, lambda doc: encode_cursor(
+                    doc.get('fecha').isoformat() if doc.get('fecha') else None, doc.id
+                )
+            )
+            sidebar_items = []
+
+            for doc in sidebar_docs:
+                data = doc.to_dict()
+
+                fecha = data.get('fecha')
+                if isinstance(fecha, datetime):
+                    fecha = fecha.date()
+
+                sidebar_items.append(
+                    SidebarDiagnosisItem(
+                        id=str(doc.id),
+                        nombre=data.get('nombre', ''),
+                        tutor=data.get('tutor', ''),
+                        edad=data.get('edad', ''),
+                        raza=data.get('raza', None),
+                        fecha=fecha
+                    )
+                )
+
+            total = await self._count(filtered) if query.include_total else None
+            return SidebarDiagnosisPage(items=sidebar_items, next_cursor=next_cursor, total=total)
 
         except Exception as e:
             raise e
 
-    async def get_all_diagnoses(self) -> List[SidebarDiagnosisItem]:
+    @staticmethod
+    def _sidebar_document(patient_data: Dict[str, Any], fecha, patient_id: str) -> Dict[str, Any]:
+        """Documento de la proyección del listado lateral"""
+        return {
+            'nombre': patient_data.get('nombre', ''),
+            'tutor': patient_data.get('tutor', ''),
+            'edad': patient_data.get('edad', ''),
+            'raza': patient_data.get('raza'),
+            'fecha': fecha,
+            'patient_id': patient_id
+        }
+
+    async def search_diagnoses(self, query: SearchQuery) -> SearchPage:
         try:
-            diagnoses_query = self.db.collection(self.collections['diagnoses']).get()
-            sidebar_items = []
+            await self._ensure_search_index()
+            offset = decode_cursor(query.cursor, 1)[0] if query.cursor else 0
+            # El ranking es CPU pura (decenas de ms con índices grandes): fuera del event loop
+            hits, total = await asyncio.to_thread(self.search_index.search, query.q, query.limit, offset)
+            next_cursor = encode_cursor(offset + query.limit) if offset + query.limit < total else None
+            return SearchPage(
+                items=[SearchHit(id=doc_id, score=score, **meta) for doc_id, score, meta in hits],
+                next_cursor=next_cursor,
+                total=total if query.include_total else None
+            )
+        except Exception as e:
+            raise e
 
-            for doc in diagnoses_query:
-                diagnosis_data = doc.to_dict()
-                patient_doc = self.db.collection(self.collections['patients']).document(
-                    diagnosis_data['patient_id']
-                ).get()
-
-                if patient_doc.exists:
-                    patient_data = patient_doc.to_dict()
-
-                    fecha = diagnosis_data.get('fecha')
-                    if isinstance(fecha, datetime):
-                        fecha = fecha.date()
-                    elif isinstance(fecha, str):
-                        fecha = datetime.strptime(fecha, "%Y-%m-%d").date()
-
-                    sidebar_items.append(
-                        SidebarDiagnosisItem(
-                            id=str(doc.id),
-                            nombre=patient_data.get('nombre', ''),
-                            tutor=patient_data.get('tutor', ''),
-                            edad=patient_data.get('edad', ''),
-                            raza=patient_data.get('raza', None),
-                            fecha=fecha
-                        )
-                    )
+    def _search_index_stale(self) -> bool:
+        loaded_at = self._search_index_loaded_at
+        refresh = settings.search_index_refresh_seconds
+        return loaded_at is None or (refresh > 0 and time_module.monotonic() - loaded_at > refresh)
+
+    async def _ensure_search_index(self):
+        if not self._search_index_stale():
+            return
+        # Una sola carga a la vez: los requests concurrentes esperan la que está en curso
+        async with self._search_index_lock:
+            if not self._search_index_stale():
+                return
+            if self._search_index_loaded_at is None or self._search_index_synced_at is None:
+                await self._load_search_index()
+            else:
+                await self._refresh_search_index()
+
+    async def _load_search_index(self):
+        """Construir el índice con lecturas proyectadas de cada colección (en paralelo) y reemplazarlo de una vez"""
+        started = time_module.perf_counter()
+        sidebar_docs, study_docs, observation_docs, diagnosis_docs = await asyncio.gather(
+            self._get_docs(self.db.collection(self.collections['sidebar']).select(['nombre', 'tutor', 'raza', 'fecha'])),
+            self._get_docs(self.db.collection(self.collections['studies']).select(['diagnosis_id'])),
+            self._get_docs(self.db.collection(self.collections['observations']).select(['observacion', 'study_id'])),
+            self._get_docs(self.db.collection(self.collections['diagnoses']).select(['antecedentes', 'diagnostico', 'created_at']))
+        )
+        sidebar = {doc.id: doc.to_dict() for doc in sidebar_docs}
+        index = InvertedIndex()
+        synced_at = await asyncio.to_thread(
+            self._index_search_docs, index, diagnosis_docs, sidebar, study_docs, observation_docs
+        )
+
+        self.search_index = index
+        self._search_index_synced_at = synced_at
+        self._search_index_loaded_at = time_module.monotonic()
+        logger.info(f"Índice de búsqueda cargado: {len(index)} diagnósticos en {time_module.perf_counter() - started:.1f}s")
+
+    async def _refresh_search_index(self):
+        """
+        Agregar al índice los informes con created_at posterior al último
+        indexado (escritos por otras instancias). Un informe nunca se reparte
+        entre batches, así que sus estudios y observaciones ya están escritos.
+        Si hay menos informes que documentos indexados (delete_all en otra
+        instancia) se recarga todo.
+        """
+        started = time_module.perf_counter()
+        diagnoses = self.db.collection(self.collections['diagnoses'])
+        diagnosis_docs, total = await asyncio.gather(
+            self._get_docs(
+                diagnoses.where('created_at', '>', self._search_index_synced_at)
+                .select(['antecedentes', 'diagnostico', 'created_at'])
+            ),
+            self._count(diagnoses)
+        )
+        if total < len(self.search_index):
+            await self._load_search_index()
+            return
+
+        if diagnosis_docs:
+            diagnosis_ids = [doc.id for doc in diagnosis_docs]
+            sidebar, study_docs = await asyncio.gather(
+                self._get_docs_by_ids('sidebar', diagnosis_ids, ['nombre', 'tutor', 'raza', 'fecha']),
+                self._get_by_field_in('studies', 'diagnosis_id', diagnosis_ids)
+            )
+            observation_docs = await self._get_by_field_in(
+                'observations', 'study_id', [doc.id for doc in study_docs]
+            ) if study_docs else []
+            synced_at = await asyncio.to_thread(
+                self._index_search_docs, self.search_index, diagnosis_docs, sidebar, study_docs, observation_docs
+            )
+            self._search_index_synced_at = synced_at or self._search_index_synced_at
+
+        self._search_index_loaded_at = time_module.monotonic()
+        logger.info(
+            f"Índice de búsqueda actualizado: {len(diagnosis_docs)} diagnósticos nuevos "
+            f"en {time_module.perf_counter() - started:.1f}s"
+        )
+
+    def _index_search_docs(self, index: InvertedIndex, diagnosis_docs, sidebar: Dict[str, Dict[str, Any]],
+                           study_docs, observation_docs) -> Optional[datetime]:
+        """Indexar los informes dados; devuelve el created_at más reciente entre ellos"""
+        study_diagnosis = {doc.id: doc.get('diagnosis_id') for doc in study_docs}
+        observaciones: Dict[str, List[str]] = {}
+        for doc in observation_docs:
+            diagnosis_id = study_diagnosis.get(doc.get('study_id'))
+            if diagnosis_id:
+                observaciones.setdefault(diagnosis_id, []).append(doc.get('observacion'))
+
+        synced_at = None
+        for doc in diagnosis_docs:
+            data = doc.to_dict()
+            created_at = data.get('created_at')
+            if isinstance(created_at, datetime) and (synced_at is None or created_at > synced_at):
+                synced_at = created_at
+            patient_data = sidebar.get(doc.id)
+            if patient_data is None:
+                continue
+            index.add(
+                doc.id,
+                self._search_fields(data.get('antecedentes'), data.get('diagnostico'), observaciones.get(doc.id, [])),
+                self._search_meta(patient_data, patient_data.get('fecha'), data.get('diagnostico'))
+            )
+        return synced_at
+
+    @staticmethod
+    def _search_fields(antecedentes, diagnostico, observaciones: List[str]) -> Dict[str, Optional[str]]:
+        return {
+            'antecedentes': antecedentes,
+            'diagnostico': diagnostico,
+            'observaciones': "\n".join(o for o in observaciones if o)
+        }
 
-            return sidebar_items
+    @staticmethod
+    def _search_meta(patient_data: Dict[str, Any], fecha, diagnostico) -> Dict[str, Any]:
+        if isinstance(fecha, datetime):
+            fecha = fecha.date()
+        return {
+            'nombre': patient_data.get('nombre', ''),
+            'tutor': patient_data.get('tutor', ''),
+            'raza': patient_data.get('raza'),
+            'fecha': fecha,
+            'diagnostico': diagnostico
+        }
 
+    async def rebuild_sidebar(self) -> int:
+        """
+        Regenerar la proyección desde los diagnósticos, por páginas: pacientes
+        deduplicados y leídos con get_all en lotes paralelos (solo los campos del
+        listado), escrituras en batches y borrado de entradas huérfanas.
+        """
+        try:
+            sidebar_collection = self.db.collection(self.collections['sidebar'])
+            diagnoses = self.db.collection(self.collections['diagnoses']).select(['patient_id', 'fecha'])
+            written = set()
+
+            async for page in self._iter_pages(diagnoses):
+                page_data = [(doc.id, doc.to_dict()) for doc in page]
+                patients = await self._get_docs_by_ids(
+                    'patients', [data.get('patient_id') for _, data in page_data], SIDEBAR_PATIENT_FIELDS
+                )
+                operations = []
+                for diagnosis_id, data in page_data:
+                    patient_data = patients.get(data.get('patient_id'))
+                    if patient_data is None:
+                        continue
+                    operations.append(('set', sidebar_collection.document(diagnosis_id), self._sidebar_document(
+                        patient_data, data.get('fecha'), data['patient_id']
+                    )))
+                    written.add(diagnosis_id)
+                await self._write_in_batches(operations)
+
+            # Entradas de diagnósticos que ya no existen
+            async for page in self._iter_pages(sidebar_collection.select([])):
+                await self._write_in_batches([
+                    ('delete', doc.reference, None) for doc in page if doc.id not in written
+                ])
+            return len(written)
+
+        except Exception as e:
+            raise e
+
+    async def get_patients(self, query: Optional[PatientListQuery] = None) -> PatientPage:
+        try:
+            query = query or PatientListQuery()
+            patients_ref = self.db.collection(self.collections['patients'])
+            filtered = patients_ref
+            if query.tutor:
+                filtered = filtered.where('tutor', '==', query.tutor)
+            if query.raza:
+                filtered = filtered.where('raza', '==', query.raza)
+
+            ordered = filtered.order_by('__name__')
+            if query.cursor:
+                (id_cursor,) = decode_cursor(query.cursor, 1)
+                ordered = ordered.start_after({'__name__': patients_ref.document(id_cursor)})
+
+            patients_query, next_cursor = await self._fetch_page(
+                ordered, query.limit, lambda doc: encode_cursor(doc.id)
+            )
+            total = await self._count(filtered) if query.include_total else None
+            return PatientPage(
+                items=[
+                    PatientResponse(
+                        id=doc.id,
+                        nombre=data['nombre'],
+                        tutor=data['tutor'],
+                        edad=str(data['edad']),
+                        raza=data.get('raza')
+                    )
+                    for doc in patients_query
+                    for data in [doc.to_dict()]
+                ],
+                next_cursor=next_cursor,
+                total=total
+            )
         except Exception as e:
             raise e
 
-    async def get_patients(self) -> List[PatientResponse]:
+    async def _fetch_page(self, query, limit: Optional[int], cursor_for):
+        """Ejecutar la consulta pidiendo limit+1 documentos para saber si hay otra página"""
+        if limit is None:
+            return await self._get_docs(query), None
+
+        docs = await self._get_docs(query.limit(limit + 1))
+        if len(docs) <= limit:
+            return docs, None
+        docs = docs[:limit]
+        return docs, cursor_for(docs[-1])
+
+    async def create_patient(self, patient_data: Dict[str, Any]) -> str:
+        patient_id = self._patient_doc_id(
+            patient_data.get('nombre'), patient_data.get('tutor'), patient_data.get('edad'), patient_data.get('raza')
+        )
+        patient_ref = self.db.collection(self.collections['patients']).document(patient_id)
+        await self._set(patient_ref, {
+            **patient_data,
+            **self._patient_search_keys(patient_data.get('nombre'), patient_data.get('tutor')),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, merge=True)
+        return patient_id
+
+    async def search_patients(self, term: str, limit: int = 20, field: Optional[str] = None) -> List[PatientResponse]:
         try:
-            patients_query = self.db.collection(self.collections['patients']).get()
+            prefix = normalize_key(term)
+            if not prefix:
+                return []
+
+            fields = ['nombre_norm', 'tutor_norm'] if field is None else [f'{field}_norm']
+            patients_ref = self.db.collection(self.collections['patients'])
+            # Rango [prefijo, prefijo + \uf8ff) sobre cada campo normalizado (índice simple), en paralelo
+            results = await asyncio.gather(*[
+                self._get_docs(patients_ref.where(field_name, '>=', prefix).where(
+                    field_name, '<', prefix + '\uf8ff'
+                ).order_by(field_name).limit(limit))
+                for field_name in fields
+            ])
+            found = {doc.id: doc.to_dict() for docs in results for doc in docs}
+
+            ordered = sorted(found.items(), key=lambda item: (item[1].get('nombre_norm', ''), item[0]))[:limit]
             return [
                 PatientResponse(
-                    id=doc.id,
+                    id=doc_id,
                     nombre=data['nombre'],
                     tutor=data['tutor'],
                     edad=str(data['edad']),
                     raza=data.get('raza')
                 )
-                for doc in patients_query
-                for data in [doc.to_dict()]
+                for doc_id, data in ordered
             ]
         except Exception as e:
             raise e
 
-    async def create_patient(self, patient_data: Dict[str, Any]) -> str:
-        patient_id = str(uuid.uuid4())
-        patient_ref = self.db.collection(self.collections['patients']).document(patient_id)
-        patient_ref.set({
-            **patient_data,
-            'created_at': firestore.SERVER_TIMESTAMP
-        })
-        return patient_id
+    @staticmethod
+    def _patient_search_keys(nombre: Optional[str], tutor: Optional[str]) -> Dict[str, str]:
+        return {'nombre_norm': normalize_key(nombre), 'tutor_norm': normalize_key(tutor)}
+
+    @staticmethod
+    def _patient_doc_id(nombre: Optional[str], tutor: Optional[str], edad: Optional[str], raza: Optional[str]) -> str:
+        """
+        Id determinístico del paciente: hash de nombre + tutor + edad + raza
+        normalizados, la misma clave que SQL (ix_pacientes_dedup). Con otra edad
+        es otro documento: el merge de un informe nuevo no cambia la edad que
+        muestran los informes anteriores.
+        """
+        return _identity_hash(
+            'paciente', normalize_key(nombre), normalize_key(tutor),
+            normalize_key(str(edad) if edad is not None else None), normalize_key(raza)
+        )
+
+    @staticmethod
+    def _vet_doc_id(nombre: Optional[str], apellido: Optional[str], matricula: Optional[int]) -> str:
+        """Id determinístico del veterinario: por matrícula si la tiene, si no por nombre + apellido"""
+        if matricula is not None:
+            return _identity_hash('matricula', str(matricula))
+        return _identity_hash('veterinario', normalize_key(nombre), normalize_key(apellido))
+
+    async def compact_duplicates(self) -> Dict[str, int]:
+        """
+        Fusionar los pacientes y veterinarios duplicados (ids uuid4 anteriores o
+        ids de una clave vieja, como la de pacientes sin edad) en su documento
+        de id determinístico y reescribir las referencias de
+        diagnósticos y del listado. Los duplicados se borran al final, así que
+        si se interrumpe las referencias siguen siendo válidas y puede volver a correrse.
+        """
+        try:
+            patient_moves = await self._compact_collection(
+                'patients', lambda d: self._patient_doc_id(d.get('nombre'), d.get('tutor'), d.get('edad'), d.get('raza')),
+                # Un ganador anterior a la búsqueda por prefijo no tiene nombre_norm/tutor_norm
+                lambda d: {**d, **self._patient_search_keys(d.get('nombre'), d.get('tutor'))}
+            )
+            vet_moves = await self._compact_collection(
+                'veterinarians', lambda d: self._vet_doc_id(d.get('nombre'), d.get('apellido'), d.get('matricula'))
+            )
+            references = 0
+            for collection_key, field, moves in [
+                ('diagnoses', 'patient_id', patient_moves),
+                ('sidebar', 'patient_id', patient_moves),
+                ('diagnoses', 'veterinarian_id', vet_moves)
+            ]:
+                references += await self._rewrite_references(collection_key, field, moves)
+
+            for collection_key, moves in [('patients', patient_moves), ('veterinarians', vet_moves)]:
+                collection = self.db.collection(self.collections[collection_key])
+                await self._write_in_batches([('delete', collection.document(old_id), None) for old_id in moves])
+
+            return {'patients': len(patient_moves), 'veterinarians': len(vet_moves), 'references': references}
+        except Exception as e:
+            raise e
+
+    async def _compact_collection(self, collection_key: str, doc_id_for, canonical_data=None) -> Dict[str, str]:
+        """
+        Agrupar por id determinístico y escribir el documento canónico (datos del
+        ganador, pasados por canonical_data si se indica). Devuelve {id viejo: id canónico}
+        """
+        groups: Dict[str, List] = {}
+        async for page in self._iter_pages(self.db.collection(self.collections[collection_key])):
+            for doc in page:
+                groups.setdefault(doc_id_for(doc.to_dict()), []).append(doc)
+
+        collection = self.db.collection(self.collections[collection_key])
+        moves = {}
+        operations = []
+        for canonical_id, docs in groups.items():
+            if len(docs) == 1 and docs[0].id == canonical_id:
+                continue
+            # Gana el documento escrito más recientemente (datos más actuales)
+            winner = max(docs, key=lambda doc: _written_at(doc.to_dict()))
+            if winner.id != canonical_id:
+                data = winner.to_dict()
+                operations.append(('set', collection.document(canonical_id), canonical_data(data) if canonical_data else data))
+            moves.update({doc.id: canonical_id for doc in docs if doc.id != canonical_id})
+        await self._write_in_batches(operations)
+        return moves
+
+    async def _rewrite_references(self, collection_key: str, field: str, moves: Dict[str, str]) -> int:
+        """Apuntar field de los documentos que referencian ids viejos a su id canónico"""
+        updated = 0
+        old_ids = list(moves)
+        # Tandas de consultas 'in' acotadas a firestore_concurrency en vuelo
+        for chunk in _chunks(old_ids, IN_QUERY_LIMIT * settings.firestore_concurrency):
+            docs = await self._get_by_field_in(collection_key, field, chunk)
+            await self._write_in_batches([
+                ('update', doc.reference, {field: moves[doc.get(field)]}) for doc in docs
+            ])
+            updated += len(docs)
+        return updated
+
+    async def backfill_patient_search_keys(self) -> int:
+        """Completar nombre_norm/tutor_norm en pacientes creados antes de la búsqueda por prefijo"""
+        try:
+            updated = 0
+            patients = self.db.collection(self.collections['patients']).select(
+                ['nombre', 'tutor', 'nombre_norm', 'tutor_norm']
+            )
+            async for page in self._iter_pages(patients):
+                operations = []
+                for doc in page:
+                    data = doc.to_dict()
+                    keys = self._patient_search_keys(data.get('nombre'), data.get('tutor'))
+                    if any(data.get(k) != v for k, v in keys.items()):
+                        operations.append(('update', doc.reference, keys))
+                await self._write_in_batches(operations)
+                updated += len(operations)
+            return updated
+        except Exception as e:
+            raise e
 
     async def get_veterinarian(self, vet_id: str) -> Optional[Dict[str, Any]]:
-        doc = self.db.collection(self.collections['veterinarians']).document(vet_id).get()
+        doc = await self._get_doc(self.db.collection(self.collections['veterinarians']).document(vet_id))
         return doc.to_dict() if doc.exists else None
 
     async def create_veterinarian(self, vet_data: Dict[str, Any]) -> str:
-        vet_id = str(uuid.uuid4())
+        vet_id = self._vet_doc_id(vet_data.get('nombre'), vet_data.get('apellido'), vet_data.get('matricula'))
         vet_ref = self.db.collection(self.collections['veterinarians']).document(vet_id)
-        vet_ref.set({
+        await self._set(vet_ref, {
             **vet_data,
-            'created_at': firestore.SERVER_TIMESTAMP
-        })
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, merge=True)
         return vet_id
 
     async def delete_all_data(self) -> bool:
             """Elimina todos los documentos de Firestore manteniendo las colecciones"""
             try:
-                batch = self.db.batch()
-                
                 # Eliminar todos los documentos de cada colección
                 collections_to_clear = [
+                    self.collections['sidebar'],
                     self.collections['observations'],
                     self.collections['measurements'], 
                     self.collections['studies'],
@@ -304,21 +982,12 @@ class FirestoreRepository(BaseRepository):
                     self.collections['veterinarians']
                 ]
                 
-                deleted_count = 0
                 for collection_name in collections_to_clear:
-                    docs = self.db.collection(collection_name).stream()
-                    for doc in docs:
-                        batch.delete(doc.reference)
-                        deleted_count += 1
-                        
+                    async for page in self._iter_pages(self.db.collection(collection_name).select([])):
                         # Firestore limita los batches a 500 operaciones
-                        if deleted_count % 450 == 0:
-                            batch.commit()
-                            batch = self.db.batch()
-                
-                # Commit final
-                if deleted_count % 450 != 0:
-                    batch.commit()
+                        await self._write_in_batches([('delete', doc.reference, None) for doc in page])
+
+                self.search_index.clear()
                     
                 return True
                 
@@ -0,0 +1,182 @@
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Date, Float, Integer, String, Text, select, insert, text
+from models.entities import Informes, Estudios, Observaciones, Informes_Busqueda
+from models.schemas import DiagnosisCreate
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Peso relativo de cada columna en el ranking (antecedentes, diagnostico, observaciones)
+COLUMN_WEIGHTS = (1.0, 2.0, 1.0)
+BACKFILL_CHUNK = 1000
+
+_SQLITE_DDL = [
+    # Índice FTS5 de contenido externo sobre informes_busqueda; unicode61 con
+    # remove_diacritics 2 pliega mayúsculas y acentos (á, ü, ñ) al indexar y al buscar
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS informes_fts USING fts5(
+        antecedentes, diagnostico, observaciones,
+        content='informes_busqueda', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Los triggers mantienen el índice en la misma transacción que la escritura
+    """
+    CREATE TRIGGER IF NOT EXISTS informes_busqueda_ai AFTER INSERT ON informes_busqueda BEGIN
+        INSERT INTO informes_fts(rowid, antecedentes, diagnostico, observaciones)
+        VALUES (new.id, new.antecedentes, new.diagnostico, new.observaciones);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS informes_busqueda_ad AFTER DELETE ON informes_busqueda BEGIN
+        INSERT INTO informes_fts(informes_fts, rowid, antecedentes, diagnostico, observaciones)
+        VALUES ('delete', old.id, old.antecedentes, old.diagnostico, old.observaciones);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS informes_busqueda_au AFTER UPDATE ON informes_busqueda BEGIN
+        INSERT INTO informes_fts(informes_fts, rowid, antecedentes, diagnostico, observaciones)
+        VALUES ('delete', old.id, old.antecedentes, old.diagnostico, old.observaciones);
+        INSERT INTO informes_fts(rowid, antecedentes, diagnostico, observaciones)
+        VALUES (new.id, new.antecedentes, new.diagnostico, new.observaciones);
+    END
+    """,
+    "INSERT INTO informes_fts(informes_fts) VALUES ('rebuild')",
+]
+
+_MSSQL_DDL = [
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = 'ft_diagnovet')
+        CREATE FULLTEXT CATALOG ft_diagnovet WITH ACCENT_SENSITIVITY = OFF
+    """,
+    # LANGUAGE 3082: español (alfabetización internacional), con su stemmer y palabras vacías
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('informes_busqueda'))
+        CREATE FULLTEXT INDEX ON informes_busqueda (
+            antecedentes LANGUAGE 3082,
+            diagnostico LANGUAGE 3082,
+            observaciones LANGUAGE 3082
+        )
+        KEY INDEX ux_informes_busqueda_id ON ft_diagnovet
+        WITH CHANGE_TRACKING AUTO
+    """,
+]
+
+_HIT_COLUMNS = dict(id=Integer, nombre=String, tutor=String, raza=String, fecha=Date, diagnostico=Text, score=Float)
+
+
+def search_document_row(informe_id: int, diagnosis_data: DiagnosisCreate, diagnostico: Optional[str]) -> Dict[str, Any]:
+    """Documento de búsqueda de un informe recién insertado"""
+    return dict(
+        id=informe_id,
+        antecedentes=diagnosis_data.informe.antecedentes,
+        diagnostico=diagnostico,
+        observaciones="\n".join(
+            obs.observacion
+            for estudio in diagnosis_data.informe.estudios
+            for obs in estudio.observaciones
+        )
+    )
+
+
+def install_sqlite_fts(conn):
+    """Crear el índice FTS5 y sus triggers (SQLite); idempotente"""
+    for statement in _SQLITE_DDL:
+        conn.exec_driver_sql(statement)
+
+
+def install_mssql_fulltext(conn):
+    """Crear catálogo e índice full-text (SQL Server). Requiere una conexión en AUTOCOMMIT"""
+    for statement in _MSSQL_DDL:
+        conn.exec_driver_sql(statement)
+
+
+def backfill_search_documents(conn) -> int:
+    """Generar los documentos de búsqueda de los informes que no lo tienen, por lotes"""
+    written = 0
+    last_id = 0
+    while True:
+        informes = conn.execute(
+            select(Informes.id, Informes.antecedentes, Informes.diagnostico)
+            .outerjoin(Informes_Busqueda, Informes_Busqueda.id == Informes.id)
+            .where(Informes.id > last_id, Informes_Busqueda.id.is_(None))
+            .order_by(Informes.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not informes:
+            return written
+
+        ids = [row.id for row in informes]
+        observaciones: Dict[int, List[str]] = {}
+        for informe_id, observacion in conn.execute(
+            select(Estudios.fk_informe, Observaciones.observacion)
+            .join(Observaciones, Observaciones.fk_estudio == Estudios.id)
+            .where(Estudios.fk_informe.in_(ids))
+            .order_by(Estudios.id, Observaciones.id)
+        ):
+            observaciones.setdefault(informe_id, []).append(observacion)
+
+        conn.execute(insert(Informes_Busqueda.__table__), [
+            dict(
+                id=row.id,
+                antecedentes=row.antecedentes,
+                diagnostico=row.diagnostico,
+                observaciones="\n".join(observaciones.get(row.id, []))
+            )
+            for row in informes
+        ])
+        written += len(informes)
+        last_id = ids[-1]
+
+
+def match_expression(terms: List[str]) -> str:
+    """Todos los términos (AND), cada uno como prefijo; los términos ya vienen plegados y son \\w+"""
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+def containstable_expression(terms: List[str]) -> str:
+    return " AND ".join(f'"{term}*"' for term in terms)
+
+
+def search(session, terms: List[str], limit: int, offset: int,
+           include_total: bool = False) -> Tuple[List[Any], Optional[int]]:
+    """Búsqueda rankeada (mayor score primero) sobre el índice del dialecto de la sesión"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        weights = ", ".join(str(w) for w in COLUMN_WEIGHTS)
+        params = dict(q=match_expression(terms), limit=limit, offset=offset)
+        # bm25() es menor cuanto más relevante: se invierte el signo para el score
+        hits_sql = f"""
+            SELECT s.id, s.nombre, s.tutor, s.raza, s.fecha, b.diagnostico,
+                   -bm25(informes_fts, {weights}) AS score
+            FROM informes_fts
+            JOIN informes_busqueda b ON b.id = informes_fts.rowid
+            JOIN sidebar_informes s ON s.id = b.id
+            WHERE informes_fts MATCH :q
+            ORDER BY score DESC, s.id DESC
+            LIMIT :limit OFFSET :offset
+        """
+        count_sql = "SELECT count(*) FROM informes_fts WHERE informes_fts MATCH :q"
+    elif dialect == "mssql":
+        params = dict(q=containstable_expression(terms), limit=limit, offset=offset)
+        hits_sql = """
+            SELECT s.id, s.nombre, s.tutor, s.raza, s.fecha, b.diagnostico,
+                   CAST(ft.[RANK] AS FLOAT) AS score
+            FROM CONTAINSTABLE(informes_busqueda, (antecedentes, diagnostico, observaciones), :q) AS ft
+            JOIN informes_busqueda b ON b.id = ft.[KEY]
+            JOIN sidebar_informes s ON s.id = b.id
+            ORDER BY ft.[RANK] DESC, s.id DESC
+            OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
+        """
+        count_sql = """
+            SELECT count(*)
+            FROM CONTAINSTABLE(informes_busqueda, (antecedentes, diagnostico, observaciones), :q)
+        """
+    else:
+        raise NotImplementedError(f"Búsqueda de texto completo no soportada para {dialect}")
+
+    hits = session.execute(text(hits_sql).columns(**_HIT_COLUMNS), params).all()
+    total = None
+    if include_total:
+        total = session.execute(text(count_sql), {"q": params["q"]}).scalar()
+    return hits, total
@@ -0,0 +1,110 @@
+from typing import Any, Dict, List, Optional, Tuple
+from bisect import bisect_left, insort
+from utils.utils import search_terms
+import math
+import threading
+
+
+class InvertedIndex:
+    """
+    Índice invertido en memoria con ranking BM25 para backends sin búsqueda de
+    texto (Firestore). Los términos se pliegan con search_terms (minúsculas, sin
+    acentos ni palabras vacías); cada término de la consulta se busca como
+    prefijo y todos deben aparecer en el documento (AND).
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75):
+        self.field_weights = field_weights or {'antecedentes': 1.0, 'diagnostico': 2.0, 'observaciones': 1.0}
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # término -> {doc_id: frecuencia ponderada por campo}
+            self._postings: Dict[str, Dict[str, float]] = {}
+            self._terms: List[str] = []  # ordenados, para expandir prefijos con bisect
+            self._doc_terms: Dict[str, List[str]] = {}
+            self._doc_len: Dict[str, float] = {}
+            self._docs: Dict[str, Dict[str, Any]] = {}
+            self._total_len = 0.0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, fields: Dict[str, Optional[str]], meta: Dict[str, Any]):
+        """Indexar (o reindexar) un documento; meta se devuelve tal cual en los resultados"""
+        frequencies: Dict[str, float] = {}
+        for field, value in fields.items():
+            weight = self.field_weights.get(field, 1.0)
+            for term in search_terms(value or ""):
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove(doc_id)
+            for term, frequency in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    insort(self._terms, term)
+                postings[doc_id] = frequency
+            doc_len = sum(frequencies.values())
+            self._doc_terms[doc_id] = list(frequencies)
+            self._doc_len[doc_id] = doc_len
+            self._docs[doc_id] = meta
+            self._total_len += doc_len
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+        self._total_len -= self._doc_len.pop(doc_id)
+        del self._docs[doc_id]
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[List[Tuple[str, float, Dict[str, Any]]], int]:
+        """Devuelve ([(doc_id, score, meta)], total de coincidencias) ordenado por score"""
+        terms = search_terms(query)
+        if not terms:
+            return [], 0
+
+        with self._lock:
+            doc_count = len(self._docs)
+            avg_len = self._total_len / doc_count if doc_count else 0.0
+            scores: Optional[Dict[str, float]] = None
+            for term in terms:
+                term_scores = self._score_prefix(term, doc_count, avg_len)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: s + term_scores[doc_id] for doc_id, s in scores.items() if doc_id in term_scores}
+                if not scores:
+                    return [], 0
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            page = ranked[offset:offset + limit]
+            return [(doc_id, score, self._docs[doc_id]) for doc_id, score in page], len(ranked)
+
+    def _score_prefix(self, prefix: str, doc_count: int, avg_len: float) -> Dict[str, float]:
+        """BM25 del mejor término que empieza con prefix, por documento"""
+        scores: Dict[str, float] = {}
+        position = bisect_left(self._terms, prefix)
+        while position < len(self._terms) and self._terms[position].startswith(prefix):
+            postings = self._postings[self._terms[position]]
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / (avg_len or 1.0))
+                score = idf * frequency * (self.k1 + 1) / (frequency + norm)
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+            position += 1
+        return scores
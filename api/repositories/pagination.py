@@ -0,0 +1,22 @@
+from typing import Any, List
+import base64
+import json
+
+
+def encode_cursor(*values: Any) -> str:
+    """Codificar la clave de orden del último elemento de una página como cursor opaco"""
+    raw = json.dumps(list(values), default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decodificar un cursor generado por encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor de paginación inválido")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Cursor de paginación inválido")
+    return values
@@ -1,6 +1,8 @@
 from repositories.base_repository import BaseRepository
 from repositories.sql_repository import SQLRepository
+from repositories.sqlite_repository import SQLiteRepository
 from repositories.firestore_repository import FirestoreRepository
+from repositories.async_firestore_repository import AsyncFirestoreRepository
 from app.config import settings, DatabaseType
 from monitoring.metrics import metrics_collector
 import logging
@@ -31,12 +33,19 @@ class RepositoryFactory:
                 metrics_collector.update_database_status("sql_server", True)
                 return repo
             
+            elif settings.database_type == DatabaseType.SQLITE:
+                logger.info(f"Inicializando repositorio SQLite ({settings.sqlite_path})")
+                repo = SQLiteRepository()
+                metrics_collector.update_database_status("sqlite", True)
+                return repo
+            
             elif settings.database_type == DatabaseType.FIRESTORE:
                 logger.info("Inicializando repositorio Firestore")
                 if not settings.firestore_project_id:
                     raise ValueError("FIRESTORE_PROJECT_ID no configurado")
                 
-                repo = FirestoreRepository(
+                repository_class = AsyncFirestoreRepository if settings.firestore_async else FirestoreRepository
+                repo = repository_class(
                     project_id=settings.firestore_project_id,
                     credentials_path=settings.firestore_credentials_path
                 )
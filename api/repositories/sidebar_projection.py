@@ -0,0 +1,39 @@
+from typing import Any, Dict
+from sqlalchemy import select, delete, insert
+from models.entities import Informes, Pacientes, Sidebar_Informes
+
+# Columnas de la proyección del listado lateral, en el orden del INSERT ... SELECT
+_COLUMNS = ('id', 'fk_paciente', 'nombre', 'tutor', 'edad', 'raza', 'fecha')
+
+
+def sidebar_row(informe_id: int, paciente, fecha) -> Dict[str, Any]:
+    """Fila de la proyección para un informe recién insertado"""
+    return dict(
+        id=informe_id,
+        fk_paciente=paciente.id,
+        nombre=paciente.nombre,
+        tutor=paciente.tutor,
+        edad=paciente.edad,
+        raza=paciente.raza,
+        fecha=fecha
+    )
+
+
+def rebuild_sidebar(conn) -> int:
+    """
+    Regenerar la proyección completa desde Informes + Pacientes con un único
+    INSERT ... SELECT en el servidor. conn puede ser una Connection o una
+    Session; el llamador maneja la transacción. Devuelve las filas escritas.
+    """
+    conn.execute(delete(Sidebar_Informes))
+    source = select(
+        Informes.id,
+        Informes.fk_paciente,
+        Pacientes.nombre,
+        Pacientes.tutor,
+        Pacientes.edad,
+        Pacientes.raza,
+        Informes.fecha
+    ).join(Pacientes, Informes.fk_paciente == Pacientes.id)
+    result = conn.execute(insert(Sidebar_Informes).from_select(list(_COLUMNS), source))
+    return result.rowcount
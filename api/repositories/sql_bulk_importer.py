@@ -0,0 +1,313 @@
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import and_, delete, func, insert, literal, select, union_all
+from pydantic import ValidationError
+from models.entities import (
+    Pacientes, Veterinarios, Informes, Estudios, Mediciones, Observaciones, Sidebar_Informes,
+    Informes_Busqueda
+)
+from models.schemas import DiagnosisCreate
+from repositories.dimension_cache import dimension_cache
+from repositories.sql_repository import SQLRepository
+from repositories.full_text_search import search_document_row
+from utils.utils import normalize_key
+from database.sql_connection import get_sql_session
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# SQL Server admite hasta 2100 parámetros por sentencia
+MAX_IN_PARAMS = 1000
+
+
+def _chunks(values: List, size: int) -> Iterator[List]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class ImportStats:
+    """Contadores de una importación masiva"""
+
+    def __init__(self):
+        self.reports = 0
+        self.rows = 0
+        self.errors = 0
+        self.started_at = time.perf_counter()
+
+    def add(self, other: "ImportStats"):
+        self.reports += other.reports
+        self.rows += other.rows
+        self.errors += other.errors
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def summary(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        return (
+            f"{self.reports} informes, {self.rows} filas, {self.errors} errores en {elapsed:.1f}s "
+            f"({self.reports / elapsed:.1f} informes/s, {self.rows / elapsed:.1f} filas/s)"
+        )
+
+
+class SQLBulkImporter:
+    """
+    Ingesta masiva de DiagnosisCreate en SQL. Cada lote se escribe en una
+    transacción: pacientes, veterinarios y dimensiones se resuelven en bloque,
+    informes y estudios se insertan con insertmanyvalues (RETURNING ordenado) y
+    mediciones/observaciones con executemany (fast_executemany en pyodbc).
+    """
+
+    def __init__(self, session_factory=None, chunk_size: int = 500,
+                 validate: Optional[Callable[[DiagnosisCreate], None]] = None):
+        self.session_factory = session_factory or get_sql_session()
+        self.chunk_size = chunk_size
+        self.validate = validate
+
+    def import_file(self, path: str, checkpoint_path: Optional[str] = None,
+                    on_progress: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+        """Importar un archivo NDJSON, retomando desde el checkpoint si existe"""
+        start_line = self._load_checkpoint(checkpoint_path, path)
+        if start_line:
+            logger.info(f"Retomando importación de {path} desde la línea {start_line + 1}")
+
+        stats = ImportStats()
+        batch: List[DiagnosisCreate] = []
+        last_line = start_line
+        for line_number, record in self._read_records(path, start_line, stats):
+            batch.append(record)
+            last_line = line_number
+            if len(batch) >= self.chunk_size:
+                stats.add(self.import_records(batch))
+                self._save_checkpoint(checkpoint_path, path, last_line)
+                batch = []
+                if on_progress:
+                    on_progress(stats)
+
+        if batch:
+            stats.add(self.import_records(batch))
+            if on_progress:
+                on_progress(stats)
+        self._save_checkpoint(checkpoint_path, path, last_line)
+        return stats
+
+    def import_records(self, records: List[DiagnosisCreate]) -> ImportStats:
+        """Escribir un lote de informes en una única transacción"""
+        session = self.session_factory()
+        try:
+            stats = self._insert_batch(session, records)
+            session.commit()
+            return stats
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error importando lote de {len(records)} informes: {str(e)}")
+            raise e
+        finally:
+            session.close()
+
+    def _read_records(self, path: str, start_line: int, stats: ImportStats) -> Iterator[Tuple[int, DiagnosisCreate]]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if line_number <= start_line or not line.strip():
+                    continue
+                try:
+                    record = DiagnosisCreate.model_validate_json(line)
+                    if self.validate:
+                        self.validate(record)
+                except (ValidationError, ValueError) as e:
+                    stats.errors += 1
+                    logger.warning(f"Línea {line_number} inválida, se omite: {str(e)}")
+                    continue
+                yield line_number, record
+
+    def _insert_batch(self, session, records: List[DiagnosisCreate]) -> ImportStats:
+        _, stats = self.insert_reports(session, records)
+        return stats
+
+    def insert_reports(self, session, records: List[DiagnosisCreate]) -> Tuple[List[int], ImportStats]:
+        """Insertar un lote en la sesión sin commit; devuelve los ids de informe en el orden de records"""
+        stats = ImportStats()
+        patient_ids, new_patients = self._resolve_patients(session, records)
+        vet_ids, new_vets = self._resolve_veterinarians(session, records)
+
+        informe_rows = [
+            dict(
+                **SQLRepository._report_values(record),
+                fk_paciente=patient_ids[self._patient_key(record.paciente)],
+                fk_referido=vet_ids[self._vet_key(record.veterinario)]
+            )
+            for record in records
+        ]
+        informe_ids = self._insert_returning_ids(session, Informes, informe_rows)
+        session.execute(insert(Sidebar_Informes.__table__), [
+            dict(
+                id=informe_id,
+                fk_paciente=row['fk_paciente'],
+                nombre=record.paciente.nombre,
+                tutor=record.paciente.tutor,
+                edad=record.paciente.edad,
+                raza=record.paciente.raza,
+                fecha=row['fecha']
+            )
+            for informe_id, row, record in zip(informe_ids, informe_rows, records)
+        ])
+        session.execute(insert(Informes_Busqueda.__table__), [
+            search_document_row(informe_id, record, row['diagnostico'])
+            for informe_id, row, record in zip(informe_ids, informe_rows, records)
+        ])
+
+        estudio_rows = []
+        estudio_data = []
+        for informe_id, record in zip(informe_ids, records):
+            for estudio in record.informe.estudios:
+                estudio_rows.append(dict(
+                    fk_informe=informe_id,
+                    fk_tipos_estudios=dimension_cache.get_id(session, 'tipos_estudios', estudio.tipo_estudio)
+                ))
+                estudio_data.append(estudio)
+        estudio_ids = self._insert_returning_ids(session, Estudios, estudio_rows)
+
+        mediciones = []
+        observaciones = []
+        for estudio_id, estudio in zip(estudio_ids, estudio_data):
+            for medicion in estudio.mediciones:
+                mediciones.append(dict(
+                    tipo_medicion=medicion.tipo_medicion,
+                    valor=str(medicion.valor) if medicion.valor is not None else None,
+                    fk_organo=dimension_cache.get_id(session, 'organos', medicion.organo),
+                    fk_medida=dimension_cache.get_id(session, 'medidas', medicion.tipo_medicion),
+                    fk_unidad=dimension_cache.get_id(session, 'unidades', medicion.unidad) if medicion.unidad else None,
+                    fk_estudio=estudio_id
+                ))
+            for obs in estudio.observaciones:
+                observaciones.append(dict(
+                    observacion=obs.observacion,
+                    fk_organo=dimension_cache.get_id(session, 'organos', obs.organo),
+                    fk_estudio=estudio_id
+                ))
+
+        if mediciones:
+            session.execute(insert(Mediciones.__table__), mediciones)
+        if observaciones:
+            session.execute(insert(Observaciones.__table__), observaciones)
+
+        stats.reports = len(records)
+        stats.rows = (
+            new_patients + new_vets + len(informe_ids) + len(estudio_ids) + len(mediciones) + len(observaciones)
+        )
+        return informe_ids, stats
+
+    @staticmethod
+    def _insert_returning_ids(session, model, rows: List[Dict]) -> List[int]:
+        """INSERT masivo (insertmanyvalues) devolviendo los ids en el orden de las filas"""
+        if not rows:
+            return []
+        table = model.__table__
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return list(session.execute(stmt, rows).scalars())
+
+    @staticmethod
+    def _patient_key(patient) -> Tuple:
+        return (patient.nombre, patient.tutor, patient.edad, patient.raza)
+
+    @staticmethod
+    def _vet_key(vet) -> Tuple:
+        return (vet.nombre, vet.apellido)
+
+    def _resolve_patients(self, session, records: List[DiagnosisCreate]) -> Tuple[Dict[Tuple, int], int]:
+        """Deduplicar pacientes del lote contra la base (misma clave que create_diagnosis)"""
+        pending = {self._patient_key(r.paciente): r.paciente for r in records}
+        columns = (Pacientes.nombre, Pacientes.tutor, Pacientes.edad, Pacientes.raza)
+        ids = self._select_existing(session, Pacientes, columns, list(pending))
+
+        missing = [key for key in pending if key not in ids]
+        inserted = 0
+        if missing:
+            inserted = self._insert_missing(session, Pacientes, columns, missing, ids, [
+                dict(
+                    nombre=p.nombre, tutor=p.tutor, edad=p.edad, raza=p.raza,
+                    nombre_norm=normalize_key(p.nombre), tutor_norm=normalize_key(p.tutor)
+                )
+                for p in (pending[key] for key in missing)
+            ])
+        return ids, inserted
+
+    def _resolve_veterinarians(self, session, records: List[DiagnosisCreate]) -> Tuple[Dict[Tuple, int], int]:
+        pending = {self._vet_key(r.veterinario): r.veterinario for r in records}
+        columns = (Veterinarios.nombre, Veterinarios.apellido)
+        ids = self._select_existing(session, Veterinarios, columns, list(pending))
+
+        missing = [key for key in pending if key not in ids]
+        inserted = 0
+        if missing:
+            inserted = self._insert_missing(session, Veterinarios, columns, missing, ids, [
+                dict(nombre=v.nombre, apellido=v.apellido, matricula=v.matricula)
+                for v in (pending[key] for key in missing)
+            ])
+        return ids, inserted
+
+    @classmethod
+    def _insert_missing(cls, session, model, columns, missing: List[Tuple], ids: Dict[Tuple, int], rows: List[Dict]) -> int:
+        """
+        Insertar las claves faltantes y resolverlas con la misma consulta. Si la
+        collation considera iguales dos claves del lote (mayúsculas, acentos)
+        ambas quedan en la fila de menor id y las sobrantes se borran, como si
+        se hubieran creado de a una con create_diagnosis.
+        """
+        new_ids = cls._insert_returning_ids(session, model, rows)
+        ids.update(cls._select_existing(session, model, columns, missing))
+        unused = sorted(set(new_ids) - set(ids.values()))
+        for ids_chunk in _chunks(unused, MAX_IN_PARAMS):
+            session.execute(delete(model.__table__).where(model.id.in_(ids_chunk)))
+        return len(new_ids) - len(unused)
+
+    @staticmethod
+    def _keys_table(columns, rows: List[Tuple]):
+        """
+        Las claves del lote como tabla derivada (SELECT de literales unidos con
+        UNION ALL; k es la posición en rows) para compararlas en la base con la
+        misma igualdad y collation que usa create_diagnosis
+        """
+        return union_all(*[
+            select(literal(k).label("k"), *[literal(value, column.type).label(column.key) for column, value in zip(columns, row)])
+            for k, row in enumerate(rows)
+        ]).subquery("claves")
+
+    @classmethod
+    def _select_existing(cls, session, model, columns, keys: List[Tuple]) -> Dict[Tuple, int]:
+        """Id existente de cada clave (el menor si la collation hace coincidir varias filas)"""
+        ids = {}
+        # SQLite admite hasta 500 SELECT por UNION y SQL Server 2100 parámetros por sentencia
+        for keys_chunk in _chunks(keys, MAX_IN_PARAMS // (len(columns) + 1)):
+            claves = cls._keys_table(columns, keys_chunk)
+            rows = session.execute(
+                select(claves.c.k, func.min(model.id))
+                .select_from(claves)
+                .join(model, and_(*[column == claves.c[column.key] for column in columns]))
+                .group_by(claves.c.k)
+            ).all()
+            ids.update({keys_chunk[k]: row_id for k, row_id in rows})
+        return ids
+
+    @staticmethod
+    def _load_checkpoint(checkpoint_path: Optional[str], path: str) -> int:
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return 0
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("source") != os.path.abspath(path):
+            raise ValueError(f"El checkpoint {checkpoint_path} corresponde a otro archivo: {checkpoint.get('source')}")
+        return int(checkpoint.get("line", 0))
+
+    @staticmethod
+    def _save_checkpoint(checkpoint_path: Optional[str], path: str, line: int):
+        """Guardar la última línea confirmada (escritura atómica)"""
+        if not checkpoint_path:
+            return
+        tmp_path = f"{checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": os.path.abspath(path), "line": line}, f)
+        os.replace(tmp_path, checkpoint_path)
@@ -1,93 +1,387 @@
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import sessionmaker, joinedload
+from typing import AsyncIterator, Iterator, List, Optional, Dict, Any, Callable, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert, select, func, or_, and_
+from sqlalchemy.orm import sessionmaker, joinedload, selectinload
 from models.entities import *
-from models.schemas import DiagnosisCreate, DiagnosisResponse, PatientResponse, VeterinarianResponse, StudyResponse, MeasurementResponse, ObservationResponse, SidebarDiagnosisItem
+from models.schemas import (
+    DiagnosisCreate, DiagnosisResponse, PatientResponse, VeterinarianResponse, StudyResponse,
+    MeasurementResponse, ObservationResponse, SidebarDiagnosisItem, DiagnosisListQuery,
+    PatientListQuery, SidebarDiagnosisPage, PatientPage, SearchQuery, SearchHit, SearchPage,
+    DiagnosisExportQuery, DiagnosisExportRow
+)
 from repositories.base_repository import BaseRepository
-from database.sql_connection import get_sql_session
-from datetime import datetime
+from repositories.dimension_cache import dimension_cache
+from repositories.pagination import encode_cursor, decode_cursor
+from repositories.sidebar_projection import sidebar_row, rebuild_sidebar
+from repositories import full_text_search
+from utils.utils import search_terms, normalize_key
+from database.sql_connection import (
+    get_sql_session, get_sql_async_session, get_sql_read_session, get_sql_async_read_session
+)
+from database.read_routing import read_your_writes, force_primary
+from monitoring.metrics import sql_reads_counter
+from app.config import settings
+from datetime import datetime, date, timezone
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 class SQLRepository(BaseRepository):
-    def __init__(self):
-        self.session_factory = get_sql_session()
+    # Tras escribir, leer del primario durante la ventana de read-your-writes (réplica con retraso)
+    needs_read_your_writes = True
+
+    def __init__(self, session_factory=None, async_session_factory=None,
+                 read_session_factory=None, async_read_session_factory=None):
+        self.session_factory = session_factory or get_sql_session()
+        if session_factory is None and async_session_factory is None:
+            async_session_factory = get_sql_async_session()
+            read_session_factory = read_session_factory or get_sql_read_session()
+            async_read_session_factory = async_read_session_factory or get_sql_async_read_session()
+        self.async_session_factory = async_session_factory
+        # Réplica de lectura opcional (si es None todo va al primario)
+        self.read_session_factory = read_session_factory
+        self.async_read_session_factory = async_read_session_factory
+        # Fallback acotado cuando no hay driver asíncrono: las sesiones síncronas
+        # corren en un pool de hilos para no bloquear el event loop
+        self._executor = None
+        # aioodbc no puede activar fast_executemany en el cursor de pyodbc (el
+        # adaptador asíncrono de SQLAlchemy no lo expone): si el engine síncrono
+        # lo usa, las escrituras van por él en el pool de hilos para conservar
+        # los executemany en un solo round-trip (informes y SQLBulkImporter)
+        bind = getattr(self.session_factory, "kw", {}).get("bind")
+        self._async_writes = not getattr(getattr(bind, "dialect", None), "fast_executemany", False)
+        # Hilos y cupos compartidos por todas las exportaciones (se crean en la primera)
+        self._export_executor = None
+        self._export_slots = None
+        self._warm_dimension_cache()
+
+    async def _run(self, fn: Callable[..., T], *args, read: bool = False) -> T:
+        """
+        Ejecutar fn(session, *args) sin bloquear el event loop. Las lecturas van
+        a la réplica salvo que el cliente haya escrito hace menos de la ventana
+        de read-your-writes o que se estén llenando caches (reading_primary);
+        las escrituras siempre van al primario (por el engine síncrono si usa
+        fast_executemany).
+        """
+        use_replica = (
+            read
+            and (self.read_session_factory or self.async_read_session_factory) is not None
+            and not force_primary.get()
+            and not (self.needs_read_your_writes and read_your_writes.should_read_primary())
+        )
+        if read:
+            sql_reads_counter.labels(target="replica" if use_replica else "primary").inc()
+        
+        if use_replica:
+            async_factory, sync_factory = self.async_read_session_factory, self.read_session_factory
+        else:
+            async_factory, sync_factory = self.async_session_factory, self.session_factory
+        
+        if async_factory is not None and (read or self._async_writes):
+            async with async_factory() as session:
+                result = await session.run_sync(fn, *args)
+        else:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._get_executor(), self._run_with_session, sync_factory, fn, *args
+            )
+        
+        if not read:
+            read_your_writes.record_write()
+        return result
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.sql_executor_workers,
+                thread_name_prefix="sql-repository"
+            )
+        return self._executor
+
+    def _run_blocking(self, fn: Callable[..., T], *args) -> T:
+        """Ejecutar fn(session, *args) de forma síncrona contra el primario"""
+        return self._run_with_session(self.session_factory, fn, *args)
+
+    @staticmethod
+    def _run_with_session(session_factory, fn: Callable[..., T], *args) -> T:
+        session = session_factory()
+        try:
+            return fn(session, *args)
+        finally:
+            session.close()
+
+    def _warm_dimension_cache(self):
+        """Precargar la cache de tablas de dimensión al crear el repositorio"""
+        session = self.session_factory()
+        try:
+            dimension_cache.warm(session)
+        except Exception as e:
+            # No es crítico: la cache se carga en el primer uso
+            logger.warning(f"No se pudo precargar la cache de dimensiones: {str(e)}")
+        finally:
+            session.close()
     
     async def create_diagnosis(self, diagnosis_data: DiagnosisCreate) -> str:
-        print("=== create_diagnosis START ===", diagnosis_data.paciente.nombre)
-        session = self.session_factory()
+        informe_id = await self._run(self._create_diagnosis_tx, diagnosis_data)
+        return str(informe_id)
+
+    async def create_diagnoses(self, records: List[DiagnosisCreate]) -> List[str]:
+        informe_ids = await self._run(self._create_diagnoses_tx, records)
+        return [str(informe_id) for informe_id in informe_ids]
+
+    def _create_diagnoses_tx(self, session, records: List[DiagnosisCreate]) -> List[int]:
+        # Import local: sql_bulk_importer depende de este módulo
+        from repositories.sql_bulk_importer import SQLBulkImporter
+
         try:
-            # Crear paciente
-            paciente = self._create_patient_entity(diagnosis_data.paciente, session)
-            
-            # Crear veterinario
-            veterinario = self._create_veterinarian_entity(diagnosis_data.veterinario, session)
-            
-            diagnostico = diagnosis_data.informe.diagnostico
-            if isinstance(diagnostico, list): # En caso de que el LLM quiera darnos una lista
-                diagnostico = "; ".join(diagnostico)
-            
-            fecha_str = diagnosis_data.informe.fecha
-            fecha_obj = None
-            if fecha_str:
-                fecha_obj = datetime.strptime(fecha_str, "%d/%m/%Y").date()
-            # Crear informe
-            informe = Informes(
-                antecedentes=diagnosis_data.informe.antecedentes,
-                diagnostico=diagnostico,
-                img_folder=diagnosis_data.informe.img_folder,
-                fecha=fecha_obj,
-                fk_paciente=paciente.id,
-                fk_referido=veterinario.id
-            )
-            session.add(informe)
+            # Todo el grupo en una transacción, con los INSERT masivos del importador
+            informe_ids, _ = SQLBulkImporter(session_factory=self.session_factory).insert_reports(session, records)
             session.commit()
-            
-            # Crear estudios
-            for estudio_data in diagnosis_data.informe.estudios:
-                self._create_study_entity(estudio_data, informe.id, session)
-            
+            return informe_ids
+
+        except Exception as e:
+            session.rollback()
+            raise e
+
+    def _create_diagnosis_tx(self, session, diagnosis_data: DiagnosisCreate) -> int:
+        try:
+            # Todo el informe se escribe en una única transacción: flush() para
+            # obtener ids y un solo commit al final.
+            informe_id = self._insert_diagnosis(diagnosis_data, session)
             session.commit()
-            return str(informe.id)
+            return informe_id
             
         except Exception as e:
             session.rollback()
             raise e
-        finally:
-            session.close()
+
+    def _insert_diagnosis(self, diagnosis_data: DiagnosisCreate, session) -> int:
+        """Inserta el informe completo en la sesión sin hacer commit"""
+        # Crear paciente
+        paciente = self._create_patient_entity(diagnosis_data.paciente, session)
+        
+        # Crear veterinario
+        veterinario = self._create_veterinarian_entity(diagnosis_data.veterinario, session)
+        
+        # Crear informe
+        informe = Informes(
+            **self._report_values(diagnosis_data),
+            fk_paciente=paciente.id,
+            fk_referido=veterinario.id
+        )
+        session.add(informe)
+        session.flush()
+        
+        # Proyección del listado lateral (misma transacción que el informe)
+        session.execute(
+            insert(Sidebar_Informes.__table__), [sidebar_row(informe.id, paciente, informe.fecha)]
+        )
+        
+        # Documento de búsqueda (el índice full-text/FTS5 se actualiza desde esta tabla)
+        session.execute(
+            insert(Informes_Busqueda.__table__),
+            [full_text_search.search_document_row(informe.id, diagnosis_data, informe.diagnostico)]
+        )
+        
+        # Crear estudios (un solo flush para todos)
+        estudios = [
+            self._create_study_entity(estudio_data, informe.id, session)
+            for estudio_data in diagnosis_data.informe.estudios
+        ]
+        session.flush()
+        
+        # Mediciones y observaciones en inserciones masivas (executemany)
+        mediciones = []
+        observaciones = []
+        for estudio, estudio_data in zip(estudios, diagnosis_data.informe.estudios):
+            mediciones.extend(
+                self._create_measurement_entity(medicion, estudio.id, session)
+                for medicion in estudio_data.mediciones
+            )
+            observaciones.extend(
+                self._create_observation_entity(obs, estudio.id, session)
+                for obs in estudio_data.observaciones
+            )
+        
+        if mediciones:
+            session.execute(insert(Mediciones.__table__), mediciones)
+        if observaciones:
+            session.execute(insert(Observaciones.__table__), observaciones)
+        
+        return informe.id
+    
+    @staticmethod
+    def _report_values(diagnosis_data: DiagnosisCreate) -> Dict[str, Any]:
+        """Columnas de Informes a partir del payload (sin claves foráneas)"""
+        diagnostico = diagnosis_data.informe.diagnostico
+        if isinstance(diagnostico, list): # En caso de que el LLM quiera darnos una lista
+            diagnostico = "; ".join(diagnostico)
+        
+        fecha_str = diagnosis_data.informe.fecha
+        fecha_obj = None
+        if fecha_str:
+            fecha_obj = datetime.strptime(fecha_str, "%d/%m/%Y").date()
+        
+        return dict(
+            antecedentes=diagnosis_data.informe.antecedentes,
+            diagnostico=diagnostico,
+            img_folder=diagnosis_data.informe.img_folder,
+            fecha=fecha_obj
+        )
     
     async def get_diagnosis(self, diagnosis_id: str) -> Optional[DiagnosisResponse]:
-        session = self.session_factory()
-        try:
-            informe = session.query(Informes).options(
-                joinedload(Informes.paciente),
-                joinedload(Informes.veterinario),
-                joinedload(Informes.estudios).joinedload(Estudios.mediciones),
-                joinedload(Informes.estudios).joinedload(Estudios.observaciones),
-                joinedload(Informes.estudios).joinedload(Estudios.tipo_estudio)
-            ).filter(Informes.id == int(diagnosis_id)).first()
-            
-            if not informe:
-                return None
-                
-            return self._map_to_diagnosis_response(informe)
+        return await self._run(self._get_diagnosis, int(diagnosis_id), read=True)
+
+    def _get_diagnosis(self, session, diagnosis_id: int) -> Optional[DiagnosisResponse]:
+        # Colecciones con selectin (una consulta por nivel, sin producto cartesiano
+        # mediciones × observaciones); las relaciones many-to-one van con joinedload
+        # dentro de esas mismas consultas. Total: 4 consultas sin importar el tamaño.
+        informe = session.query(Informes).options(
+            *self._diagnosis_load_options()
+        ).filter(Informes.id == diagnosis_id).first()
+        
+        if not informe:
+            return None
             
-        except Exception as e:
-            raise e
-        finally:
-            session.close()
+        return self._map_to_diagnosis_response(informe)
 
-    async def get_all_diagnoses(self) -> List[SidebarDiagnosisItem]:
-        session = self.session_factory()
+    async def get_data_version(self) -> str:
+        return await self._run(self._get_data_version, read=True)
+
+    @staticmethod
+    def _get_data_version(session) -> str:
+        # Ambos máximos salen de un índice (PK e ix_informes_created_at). created_at
+        # cubre el caso de borrar todo y volver a crear con los mismos ids
+        max_id, max_created_at = session.execute(
+            select(func.max(Informes.id), func.max(Informes.created_at))
+        ).one()
+        return f"{max_id or 0}:{max_created_at.isoformat() if max_created_at else ''}"
+
+    async def export_diagnoses(self, query: DiagnosisExportQuery, chunk_size: int) -> AsyncIterator[List[DiagnosisExportRow]]:
+        """
+        Cada tanda se pide al generador síncrono recién cuando se consumió la
+        anterior, así el cursor del servidor avanza al ritmo del cliente. Las
+        exportaciones comparten un pool de hilos acotado y un semáforo con el
+        mismo tamaño: las que pasan el cupo esperan en lugar de abrir más
+        conexiones. Cerrar el generador (cliente desconectado) se encola recién
+        cuando termina la lectura en curso y libera las sesiones.
+        """
+        executor, slots = self._get_export_executor()
+        async with slots:
+            chunks = self._export_chunks(query, chunk_size)
+            pending = None
+            try:
+                while True:
+                    pending = executor.submit(next, chunks, None)
+                    chunk = await asyncio.wrap_future(pending)
+                    if chunk is None:
+                        return
+                    yield chunk
+            finally:
+                if pending is None:
+                    chunks.close()
+                else:
+                    pending.add_done_callback(lambda _: executor.submit(chunks.close))
+
+    def _get_export_executor(self):
+        if self._export_executor is None:
+            workers = self._export_concurrency()
+            self._export_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sql-export")
+            self._export_slots = asyncio.Semaphore(workers)
+        return self._export_executor, self._export_slots
+
+    def _export_concurrency(self) -> int:
+        """EXPORT_CONCURRENCY, sin ocupar más de la mitad del pool de lectura (2 conexiones por exportación)"""
+        session_factory = self.read_session_factory or self.session_factory
+        bind = getattr(session_factory, "kw", {}).get("bind")
+        pool_size = getattr(getattr(bind, "pool", None), "size", None)
+        if not callable(pool_size):
+            return max(1, settings.export_concurrency)
+        return max(1, min(settings.export_concurrency, pool_size() // 4))
+
+    def _export_chunks(self, query: DiagnosisExportQuery, chunk_size: int) -> Iterator[List[DiagnosisExportRow]]:
+        # Lectura larga: va a la réplica si existe (sin ventana de read-your-writes)
+        session_factory = self.read_session_factory or self.session_factory
+        sql_reads_counter.labels(target="replica" if self.read_session_factory else "primary").inc()
+        # Una sesión mantiene el cursor del servidor (ids en orden) y otra carga
+        # cada tanda completa: 4 consultas por tanda, memoria acotada a chunk_size
+        stream_session = session_factory()
+        lookup_session = session_factory()
         try:
-            results = session.query(
-                Informes.id,
-                Pacientes.nombre,
-                Pacientes.tutor, 
-                Pacientes.edad,
-                Pacientes.raza,
-                Informes.fecha
-            ).join(Pacientes, Informes.fk_paciente == Pacientes.id).all()
-            
-            return [
+            stmt = select(Informes.id).order_by(Informes.id)
+            if query.fecha_desde:
+                stmt = stmt.where(Informes.fecha >= query.fecha_desde)
+            if query.fecha_hasta:
+                stmt = stmt.where(Informes.fecha <= query.fecha_hasta)
+            if query.since:
+                since = query.since
+                if since.tzinfo is not None:
+                    since = since.astimezone(timezone.utc).replace(tzinfo=None)
+                stmt = stmt.where(Informes.created_at > since)
+
+            result = stream_session.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+            for partition in result.partitions():
+                informes = lookup_session.query(Informes).options(
+                    *self._diagnosis_load_options()
+                ).filter(Informes.id.in_([row.id for row in partition])).order_by(Informes.id).all()
+                yield [
+                    DiagnosisExportRow(**self._map_to_diagnosis_response(informe).model_dump(), created_at=informe.created_at)
+                    for informe in informes
+                ]
+                lookup_session.expunge_all()
+        finally:
+            stream_session.close()
+            lookup_session.close()
+
+    async def get_all_diagnoses(self, query: Optional[DiagnosisListQuery] = None) -> SidebarDiagnosisPage:
+        return await self._run(self._get_all_diagnoses, query or DiagnosisListQuery(), read=True)
+
+    def _get_all_diagnoses(self, session, query: DiagnosisListQuery) -> SidebarDiagnosisPage:
+        # Se lee la proyección sidebar_informes (sin join con Pacientes): un
+        # único recorrido por rango sobre los índices (fecha, id) / (tutor|raza, fecha, id)
+        filters = []
+        if query.fecha_desde:
+            filters.append(Sidebar_Informes.fecha >= query.fecha_desde)
+        if query.fecha_hasta:
+            filters.append(Sidebar_Informes.fecha <= query.fecha_hasta)
+        if query.tutor:
+            filters.append(Sidebar_Informes.tutor == query.tutor)
+        if query.raza:
+            filters.append(Sidebar_Informes.raza == query.raza)
+        
+        rows_query = session.query(
+            Sidebar_Informes.id,
+            Sidebar_Informes.nombre,
+            Sidebar_Informes.tutor,
+            Sidebar_Informes.edad,
+            Sidebar_Informes.raza,
+            Sidebar_Informes.fecha
+        ).filter(*filters)
+        
+        # Keyset: (fecha, id) descendente, continuando después del cursor
+        if query.cursor:
+            fecha_cursor, id_cursor = decode_cursor(query.cursor, 2)
+            fecha_cursor = date.fromisoformat(fecha_cursor)
+            rows_query = rows_query.filter(or_(
+                Sidebar_Informes.fecha < fecha_cursor,
+                and_(Sidebar_Informes.fecha == fecha_cursor, Sidebar_Informes.id < id_cursor)
+            ))
+        rows_query = rows_query.order_by(Sidebar_Informes.fecha.desc(), Sidebar_Informes.id.desc())
+        
+        results, next_cursor = self._fetch_page(
+            rows_query, query.limit, lambda row: encode_cursor(row.fecha.isoformat(), row.id)
+        )
+        
+        total = None
+        if query.include_total:
+            total = session.query(func.count(Sidebar_Informes.id)).filter(*filters).scalar()
+        
+        return SidebarDiagnosisPage(
+            items=[
                 SidebarDiagnosisItem(
                     id=str(row.id),
                     nombre=row.nombre,
@@ -97,16 +391,84 @@ class SQLRepository(BaseRepository):
                     fecha=row.fecha
                 )
                 for row in results
-            ]
-        finally:
-            session.close()
+            ],
+            next_cursor=next_cursor,
+            total=total
+        )
 
+    async def search_diagnoses(self, query: SearchQuery) -> SearchPage:
+        return await self._run(self._search_diagnoses, query, read=True)
 
-    async def get_patients(self) -> List[PatientResponse]:
-        session = self.session_factory()
+    def _search_diagnoses(self, session, query: SearchQuery) -> SearchPage:
+        terms = search_terms(query.q)
+        if not terms:
+            return SearchPage(items=[], total=0 if query.include_total else None)
+        
+        offset = decode_cursor(query.cursor, 1)[0] if query.cursor else 0
+        # limit+1 para saber si hay otra página
+        hits, total = full_text_search.search(
+            session, terms, query.limit + 1, offset, include_total=query.include_total
+        )
+        next_cursor = None
+        if len(hits) > query.limit:
+            hits = hits[:query.limit]
+            next_cursor = encode_cursor(offset + query.limit)
+        
+        return SearchPage(
+            items=[
+                SearchHit(
+                    id=str(hit.id),
+                    nombre=hit.nombre,
+                    tutor=hit.tutor,
+                    raza=hit.raza,
+                    fecha=hit.fecha,
+                    diagnostico=hit.diagnostico,
+                    score=hit.score
+                )
+                for hit in hits
+            ],
+            next_cursor=next_cursor,
+            total=total
+        )
+
+    async def rebuild_sidebar(self) -> int:
+        """Regenerar la proyección del listado lateral desde los informes"""
+        return await self._run(self._rebuild_sidebar)
+
+    def _rebuild_sidebar(self, session) -> int:
         try:
-            pacientes = session.query(Pacientes).all()
-            return [
+            rows = rebuild_sidebar(session)
+            session.commit()
+            return rows
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error regenerando la proyección del listado: {str(e)}")
+            raise e
+
+    async def get_patients(self, query: Optional[PatientListQuery] = None) -> PatientPage:
+        return await self._run(self._get_patients, query or PatientListQuery(), read=True)
+
+    def _get_patients(self, session, query: PatientListQuery) -> PatientPage:
+        filters = []
+        if query.tutor:
+            filters.append(Pacientes.tutor == query.tutor)
+        if query.raza:
+            filters.append(Pacientes.raza == query.raza)
+        
+        rows_query = session.query(Pacientes).filter(*filters)
+        if query.cursor:
+            (id_cursor,) = decode_cursor(query.cursor, 1)
+            rows_query = rows_query.filter(Pacientes.id > id_cursor)
+        rows_query = rows_query.order_by(Pacientes.id)
+        
+        pacientes, next_cursor = self._fetch_page(rows_query, query.limit, lambda p: encode_cursor(p.id))
+        
+        total = None
+        if query.include_total:
+            total = session.query(func.count(Pacientes.id)).filter(*filters).scalar()
+        
+        return PatientPage(
+            items=[
                 PatientResponse(
                     id=str(p.id),
                     nombre=p.nombre,
@@ -114,9 +476,65 @@ class SQLRepository(BaseRepository):
                     edad=str(p.edad),
                     raza=p.raza
                 ) for p in pacientes
-            ]
-        finally:
-            session.close()
+            ],
+            next_cursor=next_cursor,
+            total=total
+        )
+
+    async def search_patients(self, term: str, limit: int = 20, field: Optional[str] = None) -> List[PatientResponse]:
+        return await self._run(self._search_patients, term, limit, field, read=True)
+
+    def _search_patients(self, session, term: str, limit: int, field: Optional[str]) -> List[PatientResponse]:
+        prefix = normalize_key(term)
+        if not prefix:
+            return []
+        
+        columns = {'nombre': Pacientes.nombre_norm, 'tutor': Pacientes.tutor_norm}
+        if field is not None:
+            columns = {field: columns[field]}
+        
+        # Una consulta por columna, cada una un rango sobre su índice; se unen en Python
+        dialect = session.get_bind().dialect.name
+        found = {}
+        for column in columns.values():
+            for paciente in session.query(Pacientes).filter(
+                self._prefix_filter(dialect, column, prefix)
+            ).order_by(column, Pacientes.id).limit(limit):
+                found[paciente.id] = paciente
+        
+        pacientes = sorted(found.values(), key=lambda p: (p.nombre_norm or "", p.id))[:limit]
+        return [
+            PatientResponse(
+                id=str(p.id),
+                nombre=p.nombre,
+                tutor=p.tutor,
+                edad=str(p.edad),
+                raza=p.raza
+            ) for p in pacientes
+        ]
+
+    @staticmethod
+    def _prefix_filter(dialect: str, column, prefix: str):
+        """
+        Filtro por prefijo que usa el índice: en SQLite LIKE no usa índices con la
+        colación BINARY, así que se expresa como rango; en SQL Server LIKE 'x%' es sargable.
+        """
+        if dialect == "sqlite":
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            return and_(column >= prefix, column < upper)
+        return column.startswith(prefix, autoescape=True)
+
+    @staticmethod
+    def _fetch_page(rows_query, limit: Optional[int], cursor_for):
+        """Ejecutar una consulta keyset pidiendo limit+1 filas para saber si hay otra página"""
+        if limit is None:
+            return rows_query.all(), None
+        
+        rows = rows_query.limit(limit + 1).all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, cursor_for(rows[-1])
     
     def _create_patient_entity(self, patient_data, session):
 
@@ -131,10 +549,12 @@ class SQLRepository(BaseRepository):
                 nombre=patient_data.nombre,
                 tutor=patient_data.tutor,
                 edad=patient_data.edad,
-                raza=getattr(patient_data, 'raza', None)
+                raza=getattr(patient_data, 'raza', None),
+                nombre_norm=normalize_key(patient_data.nombre),
+                tutor_norm=normalize_key(patient_data.tutor)
             )
             session.add(paciente)
-            session.commit()
+            session.flush()
             return paciente
         return existing
     
@@ -151,87 +571,69 @@ class SQLRepository(BaseRepository):
                 matricula=vet_data.matricula
             )
             session.add(veterinario)
-            session.commit()
+            session.flush()
             return veterinario
         return existing
     
     def _create_study_entity(self, study_data, informe_id, session):
         # Crear tipo de estudio si no existe
-        tipo_estudio = session.query(Tipos_Estudios).filter_by(
-            tipo_estudio=study_data.tipo_estudio
-        ).first()
-        
-        if not tipo_estudio:
-            tipo_estudio = Tipos_Estudios(tipo_estudio=study_data.tipo_estudio)
-            session.add(tipo_estudio)
-            session.commit()
+        tipo_estudio_id = dimension_cache.get_id(session, 'tipos_estudios', study_data.tipo_estudio)
         
-        # Crear estudio
+        # Crear estudio (el id se obtiene en el flush del llamador)
         estudio = Estudios(
             fk_informe=informe_id,
-            fk_tipos_estudios=tipo_estudio.id
+            fk_tipos_estudios=tipo_estudio_id
         )
         session.add(estudio)
-        session.commit()
-        
-        # Crear mediciones y observaciones
-        for medicion in study_data.mediciones:
-            self._create_measurement_entity(medicion, estudio.id, session)
-        
-        for obs in study_data.observaciones:
-            self._create_observation_entity(obs, estudio.id, session)
-        
-        session.commit()
+        return estudio
     
-    def _create_measurement_entity(self, measurement_data, estudio_id, session):
+    def _create_measurement_entity(self, measurement_data, estudio_id, session) -> Dict[str, Any]:
         # Crear órgano si no existe
-        organo = session.query(Organos).filter_by(nombre=measurement_data.organo).first()
-        if not organo:
-            organo = Organos(nombre=measurement_data.organo)
-            session.add(organo)
-            session.commit()
+        organo_id = dimension_cache.get_id(session, 'organos', measurement_data.organo)
         
         # Crear unidad si no existe
-        unidad = None
+        unidad_id = None
         if measurement_data.unidad:
-            unidad = session.query(Unidades).filter_by(unidad=measurement_data.unidad).first()
-            if not unidad:
-                unidad = Unidades(unidad=measurement_data.unidad)
-                session.add(unidad)
-                session.commit()
+            unidad_id = dimension_cache.get_id(session, 'unidades', measurement_data.unidad)
         
         # Crear medida si no existe
-        medida = session.query(Medidas).filter_by(medida=measurement_data.tipo_medicion).first()
-        if not medida:
-            medida = Medidas(medida=measurement_data.tipo_medicion)
-            session.add(medida)
-            session.commit()
+        medida_id = dimension_cache.get_id(session, 'medidas', measurement_data.tipo_medicion)
         
-        medicion = Mediciones(
+        return dict(
             tipo_medicion=measurement_data.tipo_medicion,
             valor=str(measurement_data.valor) if measurement_data.valor is not None else None,
-            fk_organo=organo.id,
-            fk_medida=medida.id,
-            fk_unidad=unidad.id if unidad else None,
+            fk_organo=organo_id,
+            fk_medida=medida_id,
+            fk_unidad=unidad_id,
             fk_estudio=estudio_id
         )
-        session.add(medicion)
     
-    def _create_observation_entity(self, obs_data, estudio_id, session):
+    def _create_observation_entity(self, obs_data, estudio_id, session) -> Dict[str, Any]:
         # Crear órgano si no existe
-        organo = session.query(Organos).filter_by(nombre=obs_data.organo).first()
-        if not organo:
-            organo = Organos(nombre=obs_data.organo)
-            session.add(organo)
-            session.commit()
+        organo_id = dimension_cache.get_id(session, 'organos', obs_data.organo)
         
-        observacion = Observaciones(
+        return dict(
             observacion=obs_data.observacion,
-            fk_organo=organo.id,
+            fk_organo=organo_id,
             fk_estudio=estudio_id
         )
-        session.add(observacion)
     
+    @staticmethod
+    def _diagnosis_load_options():
+        """Opciones de carga para armar un DiagnosisResponse sin lazy loads"""
+        return (
+            joinedload(Informes.paciente),
+            joinedload(Informes.veterinario),
+            selectinload(Informes.estudios).options(
+                joinedload(Estudios.tipo_estudio),
+                selectinload(Estudios.mediciones).options(
+                    joinedload(Mediciones.organo),
+                    joinedload(Mediciones.unidad)
+                ),
+                selectinload(Estudios.observaciones).joinedload(Observaciones.organo)
+            )
+        )
+
     def _map_to_diagnosis_response(self, informe) -> DiagnosisResponse:
         return DiagnosisResponse(
             id=str(informe.id),
@@ -291,9 +693,13 @@ class SQLRepository(BaseRepository):
 
     async def delete_all_data(self) -> bool:
             """Elimina todos los datos de la base SQL manteniendo las tablas"""
-            session = self.session_factory()
+            return await self._run(self._delete_all_data)
+
+    def _delete_all_data(self, session) -> bool:
             try:
                 # Orden de eliminación para respetar constraints de FK
+                session.query(Sidebar_Informes).delete()
+                session.query(Informes_Busqueda).delete()
                 session.query(Observaciones).delete()
                 session.query(Mediciones).delete()
                 session.query(Estudios).delete()
@@ -308,6 +714,4 @@ class SQLRepository(BaseRepository):
             except Exception as e:
                 session.rollback()
                 logger.error(f"Error eliminando datos SQL: {str(e)}")
-                raise e
-            finally:
-                session.close()
\ No newline at end of file
+                raise e
\ No newline at end of file
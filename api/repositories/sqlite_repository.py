@@ -0,0 +1,13 @@
+from repositories.sql_repository import SQLRepository
+
+
+class SQLiteRepository(SQLRepository):
+    """
+    Repositorio sobre SQLite embebido (DB_TYPE=SQLITE). Mismo esquema,
+    migraciones y consultas que SQLRepository (FTS5 y rangos de prefijo ya
+    tienen su rama SQLite); SQLiteConnection entrega el escritor como primario
+    y el pool de lectores como réplica. En WAL cada commit es visible para los
+    lectores en cuanto termina, así que no hace falta leer del escritor después
+    de escribir.
+    """
+    needs_read_your_writes = False
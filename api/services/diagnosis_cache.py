@@ -0,0 +1,258 @@
+from typing import Awaitable, Callable, Collection, Dict, Optional, Tuple, Type, TypeVar
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pydantic import BaseModel
+from app.config import settings
+from database.read_routing import reading_primary
+from monitoring.metrics import cache_requests_counter, cache_evictions_counter, cache_bytes_gauge
+import hashlib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+# Espacios de claves: detalle de informe y páginas del listado lateral
+DIAGNOSIS = "diagnosis"
+LISTING = "listing"
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """Respuesta serializada con su ETag (sin payload: solo valida un GET condicional)"""
+    payload: bytes
+    etag: str
+
+    @classmethod
+    def from_model(cls, model: BaseModel, etag: Optional[str] = None) -> "CacheEntry":
+        """Sin etag explícito se usa el hash del contenido"""
+        payload = model.model_dump_json().encode("utf-8")
+        return cls(payload, etag or hashlib.sha1(payload).hexdigest())
+
+
+class LocalCacheBackend:
+    """
+    LRU en proceso con TTL y límites de bytes y de entradas. Cada espacio de
+    claves tiene una generación: invalidar la incrementa (y libera sus
+    entradas), y un valor leído antes de la invalidación ya no puede guardarse.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, float, CacheEntry]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+
+    async def get(self, namespace: str, key: str) -> Tuple[Optional[CacheEntry], int]:
+        """(entrada o None, generación vigente para un set posterior)"""
+        with self._lock:
+            generation = self._generations.get(namespace, 0)
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None, generation
+            entry_generation, expires_at, value = entry
+            if entry_generation != generation or expires_at <= time.monotonic():
+                self._remove((namespace, key), "ttl")
+                return None, generation
+            self._entries.move_to_end((namespace, key))
+            return value, generation
+
+    async def set(self, namespace: str, key: str, value: CacheEntry, generation: int, ttl: float):
+        if len(value.payload) > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generations.get(namespace, 0):
+                return
+            if (namespace, key) in self._entries:
+                self._remove((namespace, key), None)
+            self._entries[(namespace, key)] = (generation, time.monotonic() + ttl, value)
+            self._bytes += len(value.payload)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)), "lru")
+            cache_bytes_gauge.set(self._bytes)
+
+    async def invalidate(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for entry_key in [k for k in self._entries if k[0] == namespace]:
+                self._remove(entry_key, "invalidation")
+            cache_bytes_gauge.set(self._bytes)
+
+    def _remove(self, entry_key: Tuple[str, str], reason: Optional[str]):
+        _, _, value = self._entries.pop(entry_key)
+        self._bytes -= len(value.payload)
+        if reason:
+            cache_evictions_counter.labels(reason=reason).inc()
+
+
+class RedisCacheBackend:
+    """
+    Backend compartido entre workers sobre un servidor compatible con Redis.
+    La generación de cada espacio es un contador (INCR al invalidar); cada
+    entrada guarda la generación con la que se escribió y se lee junto con el
+    contador en un solo MGET. El TTL y la expulsión los maneja el servidor.
+    """
+
+    def __init__(self, url: str, prefix: str = "diagnovet:cache:v2:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, namespace: str, key: str) -> Tuple[Optional[CacheEntry], int]:
+        raw_generation, raw_entry = await self.client.mget(
+            f"{self.prefix}gen:{namespace}", f"{self.prefix}{namespace}:{key}"
+        )
+        generation = int(raw_generation or 0)
+        if raw_entry is None:
+            return None, generation
+        entry_generation, etag, payload = raw_entry.split(b"|", 2)
+        if int(entry_generation) != generation:
+            return None, generation
+        return CacheEntry(payload, etag.decode()), generation
+
+    async def set(self, namespace: str, key: str, value: CacheEntry, generation: int, ttl: float):
+        header = f"{generation}|{value.etag}|".encode()
+        await self.client.set(f"{self.prefix}{namespace}:{key}", header + value.payload, ex=max(1, int(ttl)))
+
+    async def invalidate(self, namespace: str):
+        await self.client.incr(f"{self.prefix}gen:{namespace}")
+
+
+class DiagnosisCache:
+    """
+    Cache read-through de respuestas de DiagnosisService (informe por id y
+    páginas del listado). Guarda el JSON serializado: el tamaño en bytes es
+    exacto, sirve igual para el backend compartido y cada lectura devuelve un
+    objeto nuevo. Un error del backend se trata como fallo de cache.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(DiagnosisCache, cls).__new__(cls)
+            cls._instance.enabled = settings.cache_enabled
+            cls._instance.ttl = settings.cache_ttl_seconds
+            cls._instance.backend = cls._create_backend()
+        return cls._instance
+
+    @staticmethod
+    def _create_backend():
+        if settings.cache_redis_url:
+            try:
+                backend = RedisCacheBackend(settings.cache_redis_url)
+                logger.info("Cache de diagnósticos compartida (Redis)")
+                return backend
+            except ImportError as e:
+                logger.warning(f"Cliente redis no disponible ({str(e)}), se usa la cache en proceso")
+        return LocalCacheBackend(settings.cache_max_bytes, settings.cache_max_entries)
+
+    @staticmethod
+    def key_for(model: BaseModel) -> str:
+        """Clave estable para una consulta (filtros, cursor y límite)"""
+        return hashlib.sha1(model.model_dump_json().encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def etag_for(namespace: str, key: str, version: str) -> str:
+        """ETag de una respuesta según la versión de los datos con la que se cargó"""
+        return hashlib.sha1(f"{namespace}|{key}|{version}".encode("utf-8")).hexdigest()
+
+    async def get_or_load(self, namespace: str, key: str, model: Type[M],
+                          loader: Callable[[], Awaitable[Optional[M]]],
+                          version_loader: Callable[[], Awaitable[str]]) -> Optional[M]:
+        """Devolver la entrada cacheada o cargarla con loader y guardarla (los None no se guardan)"""
+        cached, generation = await self._lookup(namespace, key)
+        if cached is not None:
+            return model.model_validate_json(cached.payload)
+        value, _ = await self._fill(namespace, key, generation, loader, version_loader)
+        return value
+
+    async def get_entry(self, namespace: str, key: str,
+                        loader: Callable[[], Awaitable[Optional[BaseModel]]],
+                        version_loader: Callable[[], Awaitable[str]],
+                        if_none_match: Collection[str] = ()) -> Optional[CacheEntry]:
+        """
+        Como get_or_load pero devuelve la respuesta ya serializada con su ETag.
+        En un acierto, validar un If-None-Match no lee la base ni serializa; en
+        un fallo (o con la cache desactivada) basta leer la versión de los
+        datos: si el cliente ya tiene esa versión se devuelve una entrada sin
+        payload y no se carga la respuesta.
+        """
+        cached, generation = await self._lookup(namespace, key)
+        if cached is not None:
+            return cached
+        _, entry = await self._fill(namespace, key, generation, loader, version_loader, if_none_match)
+        return entry
+
+    async def _fill(self, namespace: str, key: str, generation: Optional[int],
+                    loader: Callable[[], Awaitable[Optional[BaseModel]]],
+                    version_loader: Callable[[], Awaitable[str]],
+                    if_none_match: Collection[str] = ()) -> Tuple[Optional[BaseModel], Optional[CacheEntry]]:
+        """
+        Cargar con la versión de los datos leída antes y después: si no cambió,
+        el ETag es el de esa versión (validable sin cargar); si hubo una
+        escritura en el medio se usa el hash del contenido.
+
+        Con la cache activa la versión se lee del primario y la carga sigue el
+        ruteo normal (réplica si la hay). Solo se guarda si la réplica ya tenía
+        la versión del primario antes de cargar; si está atrasada la respuesta
+        se sirve igual (como sin cache) pero no queda en la cache compartida.
+        """
+        with self._reading_primary():
+            version = await version_loader()
+        etag = self.etag_for(namespace, key, version)
+        if etag in if_none_match:
+            return None, CacheEntry(b"", etag)
+        replica_current = not self.enabled or await version_loader() == version
+        value = await loader()
+        if value is None:
+            return None, None
+        with self._reading_primary():
+            if not replica_current or await version_loader() != version:
+                etag = None
+        entry = CacheEntry.from_model(value, etag)
+        if generation is not None and replica_current:
+            await self._store(namespace, key, entry, generation)
+        return value, entry
+
+    def _reading_primary(self):
+        """Versión de referencia del primario: la de la réplica puede estar atrasada (solo con la cache activa)"""
+        return reading_primary() if self.enabled else nullcontext()
+
+    async def _lookup(self, namespace: str, key: str) -> Tuple[Optional[CacheEntry], Optional[int]]:
+        """(entrada o None, generación para guardar; None si la cache no está disponible)"""
+        if not self.enabled:
+            return None, None
+        try:
+            cached, generation = await self.backend.get(namespace, key)
+        except Exception as e:
+            cache_requests_counter.labels(namespace=namespace, result="error").inc()
+            logger.warning(f"Error leyendo la cache ({namespace}): {str(e)}")
+            return None, None
+        result = "hit" if cached is not None else "miss"
+        cache_requests_counter.labels(namespace=namespace, result=result).inc()
+        return cached, generation
+
+    async def _store(self, namespace: str, key: str, entry: CacheEntry, generation: int):
+        try:
+            await self.backend.set(namespace, key, entry, generation, self.ttl)
+        except Exception as e:
+            cache_requests_counter.labels(namespace=namespace, result="error").inc()
+            logger.warning(f"Error escribiendo la cache ({namespace}): {str(e)}")
+
+    async def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            try:
+                await self.backend.invalidate(namespace)
+            except Exception as e:
+                # Sin invalidación compartida las entradas vencen por TTL
+                logger.error(f"Error invalidando la cache ({namespace}): {str(e)}")
+
+
+# Instancia global de la cache
+diagnosis_cache = DiagnosisCache()
@@ -0,0 +1,58 @@
+from typing import Iterator, List
+from models.schemas import DiagnosisExportRow
+import csv
+import io
+
+# CSV en formato largo: una fila por medición u observación, con las columnas
+# del informe, paciente, veterinario y estudio repetidas (un informe sin
+# estudios, o un estudio vacío, ocupa una fila con las columnas de detalle vacías)
+CSV_COLUMNS = [
+    'informe_id', 'fecha', 'created_at', 'antecedentes', 'diagnostico', 'img_folder',
+    'paciente_id', 'paciente_nombre', 'tutor', 'edad', 'raza',
+    'veterinario_id', 'veterinario_nombre', 'veterinario_apellido', 'matricula',
+    'estudio_id', 'tipo_estudio', 'tipo_fila', 'item_id', 'organo',
+    'tipo_medicion', 'valor', 'unidad', 'observacion',
+]
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def ndjson_chunk(rows: List[DiagnosisExportRow]) -> bytes:
+    """Un informe completo (DiagnosisExportRow) por línea"""
+    return b"".join(row.model_dump_json().encode("utf-8") + b"\n" for row in rows)
+
+
+def csv_header() -> bytes:
+    return _write_csv([CSV_COLUMNS])
+
+
+def csv_chunk(rows: List[DiagnosisExportRow]) -> bytes:
+    return _write_csv(line for row in rows for line in _csv_lines(row))
+
+
+def _write_csv(lines) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(lines)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _csv_lines(row: DiagnosisExportRow) -> Iterator[list]:
+    informe = [
+        row.id, row.fecha.isoformat(), row.created_at.isoformat() if row.created_at else None,
+        row.antecedentes, row.diagnostico, row.img_folder,
+        row.paciente.id, row.paciente.nombre, row.paciente.tutor, row.paciente.edad, row.paciente.raza,
+        row.veterinario.id, row.veterinario.nombre, row.veterinario.apellido, row.veterinario.matricula,
+    ]
+    if not row.estudios:
+        yield informe + [None] * 9
+    for estudio in row.estudios:
+        prefix = informe + [estudio.id, estudio.tipo_estudio]
+        if not estudio.mediciones and not estudio.observaciones:
+            yield prefix + [None] * 7
+        for med in estudio.mediciones:
+            yield prefix + ['medicion', med.id, med.organo, med.tipo_medicion, med.valor, med.unidad, None]
+        for obs in estudio.observaciones:
+            yield prefix + ['observacion', obs.id, obs.organo, None, None, None, obs.observacion]
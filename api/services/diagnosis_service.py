@@ -1,15 +1,23 @@
-from typing import List, Optional
-from repositories.base_repository import BaseRepository
-from models.schemas import DiagnosisCreate, DiagnosisResponse, PatientResponse, SidebarDiagnosisItem
-from monitoring.metrics import diagnosis_counter, diagnosis_duration
+from typing import Any, AsyncIterator, Collection, Dict, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from repositories.base_repository import BaseRepository, PartialWriteError
+from models.schemas import (
+    DiagnosisCreate, DiagnosisResponse, DiagnosisListQuery, PatientListQuery,
+    SidebarDiagnosisPage, PatientPage, SearchQuery, SearchPage, DiagnosisExportQuery
+)
+from services.diagnosis_cache import diagnosis_cache, CacheEntry, DIAGNOSIS, LISTING
+from services.single_flight import single_flight
+from services import diagnosis_export
+from monitoring.metrics import diagnosis_counter, diagnosis_duration, export_rows_counter
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 class DiagnosisService:
-    def __init__(self, repository: BaseRepository):
+    def __init__(self, repository: BaseRepository, cache=None):
         self.repository = repository
+        self.cache = cache or diagnosis_cache
     
     async def create_diagnosis(self, diagnosis_data: DiagnosisCreate) -> str:
         """Crear un nuevo diagnóstico con validaciones de negocio"""
@@ -21,6 +29,8 @@ class DiagnosisService:
             
             # Crear diagnóstico usando el repositorio
             diagnosis_id = await self.repository.create_diagnosis(diagnosis_data)
+            # Los informes no se modifican: un informe nuevo solo cambia el listado
+            await self.cache.invalidate(LISTING)
             
             # Métricas
             diagnosis_counter.labels(operation="create", status="success").inc()
@@ -34,21 +44,92 @@ class DiagnosisService:
             logger.error(f"Error creando diagnóstico: {str(e)}")
             raise e
     
+    async def create_diagnoses_stream(self, lines: AsyncIterator[Tuple[int, Optional[bytes]]],
+                                      group_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Ingesta NDJSON: cada línea se valida al llegar y los informes válidos se
+        escriben de a group_size por escritura. Por cada grupo produce la lista
+        de resultados (uno por línea, en orden); en memoria solo queda el grupo
+        en curso.
+        """
+        pending: List[Tuple[int, Union[DiagnosisCreate, str]]] = []
+        async for line_number, line in lines:
+            pending.append((line_number, self._parse_batch_record(line)))
+            if len(pending) >= group_size:
+                yield await self._write_batch_group(pending)
+                pending = []
+        if pending:
+            yield await self._write_batch_group(pending)
+
+    def _parse_batch_record(self, line: Optional[bytes]) -> Union[DiagnosisCreate, str]:
+        """El informe validado o el mensaje de error de la línea"""
+        if line is None:
+            return "Línea demasiado larga"
+        try:
+            record = DiagnosisCreate.model_validate_json(line)
+            self._validate_diagnosis_data(record)
+            return record
+        except ValidationError as e:
+            return "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'json'}: {error['msg']}" for error in e.errors()
+            )
+        except ValueError as e:
+            return str(e)
+
+    async def _write_batch_group(self, pending: List[Tuple[int, Union[DiagnosisCreate, str]]]) -> List[Dict[str, Any]]:
+        start_time = time.time()
+        records = [record for _, record in pending if isinstance(record, DiagnosisCreate)]
+        outcomes: List[Tuple[Optional[str], Optional[str]]] = []
+        if records:
+            try:
+                outcomes = [(diagnosis_id, None) for diagnosis_id in await self.repository.create_diagnoses(records)]
+            except PartialWriteError as e:
+                # Firestore confirma el grupo en varios batches: los ya escritos no se repiten
+                committed = len(e.committed_ids)
+                logger.warning(
+                    f"Falló la escritura de un grupo de {len(records)} informes después de {committed}, "
+                    f"se reintentan de a uno los restantes: {str(e)}"
+                )
+                outcomes = [(diagnosis_id, None) for diagnosis_id in e.committed_ids]
+                outcomes += [await self._create_single(record) for record in records[committed:]]
+            except Exception as e:
+                # Nada del grupo quedó escrito: se reintenta informe por informe para aislar el que falla
+                logger.warning(f"Falló la escritura de un grupo de {len(records)} informes, se reintenta de a uno: {str(e)}")
+                outcomes = [await self._create_single(record) for record in records]
+            await self.cache.invalidate(LISTING)
+            diagnosis_duration.labels(operation="batch_create").observe(time.time() - start_time)
+
+        results = []
+        outcome_iter = iter(outcomes)
+        for line_number, record in pending:
+            if isinstance(record, DiagnosisCreate):
+                diagnosis_id, error = next(outcome_iter)
+            else:
+                diagnosis_id, error = None, record
+            if error is None:
+                diagnosis_counter.labels(operation="create", status="success").inc()
+                results.append({"line": line_number, "status": "created", "diagnosis_id": diagnosis_id})
+            else:
+                diagnosis_counter.labels(operation="create", status="error").inc()
+                results.append({"line": line_number, "status": "error", "error": error})
+        return results
+
+    async def _create_single(self, record: DiagnosisCreate) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            return await self.repository.create_diagnosis(record), None
+        except Exception as e:
+            return None, str(e)
+
     async def get_diagnosis(self, diagnosis_id: str) -> Optional[DiagnosisResponse]:
         """Obtener un diagnóstico por ID"""
         start_time = time.time()
         
         try:
-            diagnosis = await self.repository.get_diagnosis(diagnosis_id)
-            
-            if diagnosis:
-                diagnosis_counter.labels(operation="get", status="success").inc()
-                logger.info(f"Diagnóstico encontrado: {diagnosis_id}")
-            else:
-                diagnosis_counter.labels(operation="get", status="not_found").inc()
-                logger.warning(f"Diagnóstico no encontrado: {diagnosis_id}")
-            
-            diagnosis_duration.labels(operation="get").observe(time.time() - start_time)
+            diagnosis = await self.cache.get_or_load(
+                DIAGNOSIS, diagnosis_id, DiagnosisResponse, lambda: self._load_diagnosis(diagnosis_id),
+                self.repository.get_data_version
+            )
+            self._record_get(diagnosis_id, diagnosis is not None, start_time)
             return diagnosis
             
         except Exception as e:
@@ -56,18 +137,120 @@ class DiagnosisService:
             logger.error(f"Error obteniendo diagnóstico {diagnosis_id}: {str(e)}")
             raise e
 
-    async def get_all_diagnoses(self) -> List[SidebarDiagnosisItem]:
-        """Obtener todos los diagnósticos"""
+    async def get_diagnosis_entry(self, diagnosis_id: str, if_none_match: Collection[str] = ()) -> Optional[CacheEntry]:
+        """Diagnóstico ya serializado con su ETag, para responder GET condicionales (ver DiagnosisCache.get_entry)"""
+        start_time = time.time()
+        
         try:
-            return await self.repository.get_all_diagnoses()
+            entry = await self.cache.get_entry(
+                DIAGNOSIS, diagnosis_id, lambda: self._load_diagnosis(diagnosis_id),
+                self.repository.get_data_version, if_none_match
+            )
+            self._record_get(diagnosis_id, entry is not None, start_time)
+            return entry
+            
+        except Exception as e:
+            diagnosis_counter.labels(operation="get", status="error").inc()
+            logger.error(f"Error obteniendo diagnóstico {diagnosis_id}: {str(e)}")
+            raise e
+
+    def _load_diagnosis(self, diagnosis_id: str):
+        """Lectura al repositorio compartida por los requests concurrentes del mismo informe"""
+        return single_flight.do(
+            "get_diagnosis", diagnosis_id, lambda: self.repository.get_diagnosis(diagnosis_id)
+        )
+
+    def _load_diagnoses(self, key: str, query: DiagnosisListQuery):
+        """Lectura al repositorio compartida por los requests concurrentes de la misma página"""
+        return single_flight.do(
+            "get_all_diagnoses", key, lambda: self.repository.get_all_diagnoses(query)
+        )
+
+    def _record_get(self, diagnosis_id: str, found: bool, start_time: float):
+        if found:
+            diagnosis_counter.labels(operation="get", status="success").inc()
+            logger.info(f"Diagnóstico encontrado: {diagnosis_id}")
+        else:
+            diagnosis_counter.labels(operation="get", status="not_found").inc()
+            logger.warning(f"Diagnóstico no encontrado: {diagnosis_id}")
+        diagnosis_duration.labels(operation="get").observe(time.time() - start_time)
+
+    async def get_all_diagnoses(self, query: Optional[DiagnosisListQuery] = None) -> SidebarDiagnosisPage:
+        """Obtener diagnósticos paginados y filtrados"""
+        try:
+            query = query or DiagnosisListQuery()
+            key = self.cache.key_for(query)
+            return await self.cache.get_or_load(
+                LISTING, key, SidebarDiagnosisPage, lambda: self._load_diagnoses(key, query),
+                self.repository.get_data_version
+            )
         except Exception as e:
             logger.error(f"Error obteniendo diagnósticos: {str(e)}")
             raise e
 
-    async def get_patients(self) -> List[PatientResponse]:
-        """Obtener todos los pacientes"""
+    async def get_all_diagnoses_entry(self, query: Optional[DiagnosisListQuery] = None,
+                                      if_none_match: Collection[str] = ()) -> CacheEntry:
+        """Página del listado ya serializada con su ETag, para responder GET condicionales"""
+        try:
+            query = query or DiagnosisListQuery()
+            key = self.cache.key_for(query)
+            return await self.cache.get_entry(
+                LISTING, key, lambda: self._load_diagnoses(key, query),
+                self.repository.get_data_version, if_none_match
+            )
+        except Exception as e:
+            logger.error(f"Error obteniendo diagnósticos: {str(e)}")
+            raise e
+
+    async def search_diagnoses(self, query: SearchQuery) -> SearchPage:
+        """Búsqueda de texto completo rankeada"""
+        start_time = time.time()
+        
+        try:
+            page = await self.repository.search_diagnoses(query)
+            diagnosis_counter.labels(operation="search", status="success").inc()
+            diagnosis_duration.labels(operation="search").observe(time.time() - start_time)
+            return page
+        except Exception as e:
+            diagnosis_counter.labels(operation="search", status="error").inc()
+            logger.error(f"Error buscando diagnósticos '{query.q}': {str(e)}")
+            raise e
+
+    def export_diagnoses(self, query: DiagnosisExportQuery, chunk_size: int) -> AsyncIterator[bytes]:
+        """
+        Exportación completa en NDJSON o CSV. Valida el filtro antes de empezar
+        (después de enviar los headers ya no se puede responder un 400) y
+        devuelve el cuerpo como bytes por tanda de informes.
+        """
+        if query.fecha_desde and query.fecha_hasta and query.fecha_desde > query.fecha_hasta:
+            raise ValueError("fecha_desde no puede ser posterior a fecha_hasta")
+        return self._export_stream(query, chunk_size)
+
+    async def _export_stream(self, query: DiagnosisExportQuery, chunk_size: int) -> AsyncIterator[bytes]:
+        start_time = time.time()
+        encode = diagnosis_export.csv_chunk if query.format == "csv" else diagnosis_export.ndjson_chunk
+        exported = 0
+        try:
+            if query.format == "csv":
+                yield diagnosis_export.csv_header()
+            async for rows in self.repository.export_diagnoses(query, chunk_size):
+                if rows:
+                    yield encode(rows)
+                    exported += len(rows)
+                    export_rows_counter.labels(format=query.format).inc(len(rows))
+            diagnosis_counter.labels(operation="export", status="success").inc()
+            logger.info(f"Exportación {query.format} completa: {exported} informes")
+        except Exception as e:
+            diagnosis_counter.labels(operation="export", status="error").inc()
+            logger.error(f"Error exportando diagnósticos tras {exported} informes: {str(e)}")
+            raise e
+        finally:
+            diagnosis_duration.labels(operation="export").observe(time.time() - start_time)
+
+    async def get_patients(self, query: Optional[PatientListQuery] = None) -> PatientPage:
+        """Obtener pacientes paginados y filtrados"""
         try:
-            return await self.repository.get_patients()
+            return await self.repository.get_patients(query)
         except Exception as e:
             logger.error(f"Error obteniendo pacientes: {str(e)}")
             raise e
@@ -108,6 +291,7 @@ class DiagnosisService:
         
         try:
             result = await self.repository.delete_all_data()
+            await self.cache.invalidate(DIAGNOSIS, LISTING)
             
             # Métricas
             diagnosis_counter.labels(operation="delete_all", status="success").inc()
@@ -16,7 +16,7 @@ class PatientService:
         start_time = time.time()
         
         try:
-            patients = await self.repository.get_patients()
+            patients = (await self.repository.get_patients()).items
             
             # Métricas
             metrics_collector.record_diagnosis_operation(
@@ -69,24 +69,31 @@ class PatientService:
             logger.error(f"Error creando paciente: {str(e)}")
             raise e
     
-    async def search_patients_by_tutor(self, tutor_name: str) -> List[PatientResponse]:
-        """Buscar pacientes por nombre del tutor"""
+    async def search_patients(self, term: str, limit: int = 20, field: Optional[str] = None) -> List[PatientResponse]:
+        """Buscar pacientes por prefijo de nombre y/o tutor (búsqueda indexada en el repositorio)"""
+        start_time = time.time()
+        
         try:
-            all_patients = await self.repository.get_patients()
+            patients = await self.repository.search_patients(term, limit=limit, field=field)
             
-            # Filtrar por tutor (case insensitive)
-            filtered_patients = [
-                patient for patient in all_patients
-                if tutor_name.lower() in patient.tutor.lower()
-            ]
+            metrics_collector.record_diagnosis_operation(
+                "search_patients",
+                "success",
+                time.time() - start_time
+            )
             
-            logger.info(f"Encontrados {len(filtered_patients)} pacientes para tutor '{tutor_name}'")
-            return filtered_patients
+            logger.info(f"Encontrados {len(patients)} pacientes para '{term}'")
+            return patients
             
         except Exception as e:
-            logger.error(f"Error buscando pacientes por tutor '{tutor_name}': {str(e)}")
+            metrics_collector.record_diagnosis_operation("search_patients", "error")
+            logger.error(f"Error buscando pacientes '{term}': {str(e)}")
             raise e
     
+    async def search_patients_by_tutor(self, tutor_name: str, limit: int = 20) -> List[PatientResponse]:
+        """Buscar pacientes por nombre del tutor"""
+        return await self.search_patients(tutor_name, limit=limit, field="tutor")
+    
     def _validate_patient_data(self, patient_data: PatientCreate):
         """Validaciones de negocio para pacientes"""
         
@@ -0,0 +1,44 @@
+from typing import Any, Awaitable, Callable, Tuple
+from monitoring.metrics import single_flight_counter
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalescencia de lecturas idénticas concurrentes: mientras una llamada
+    (operación, clave) está en curso, las siguientes esperan su resultado (o
+    su excepción) en lugar de repetir la consulta al repositorio.
+
+    La llamada corre en su propia tarea: si el request que la inició se
+    cancela (cliente desconectado), los que esperan la siguen recibiendo.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SingleFlight, cls).__new__(cls)
+            cls._instance._calls = {}
+        return cls._instance
+
+    async def do(self, operation: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call_key = (operation, key)
+        task = self._calls.get(call_key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            single_flight_counter.labels(operation=operation, result="coalesced").inc()
+        else:
+            single_flight_counter.labels(operation=operation, result="executed").inc()
+            task = asyncio.ensure_future(fn())
+            self._calls[call_key] = task
+            task.add_done_callback(lambda t: self._forget(call_key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, call_key: Tuple[str, str], task: asyncio.Task):
+        if self._calls.get(call_key) is task:
+            del self._calls[call_key]
+        # Marcar la excepción como leída si todos los que esperaban se cancelaron
+        if not task.cancelled():
+            task.exception()
+
+
+# Instancia global
+single_flight = SingleFlight()
@@ -0,0 +1,21 @@
+"""
+Configuración común de los tests (se ejecutan desde api/: python -m pytest tests).
+
+La aplicación lee la configuración al importarse, así que la base se define
+acá, antes de importar cualquier módulo: un archivo SQLite en un directorio
+temporal (todas las conexiones del pool ven la misma base) con sesiones
+síncronas.
+"""
+import os
+import sys
+import tempfile
+
+# Se borra al terminar el proceso de pytest
+_database_dir = tempfile.TemporaryDirectory(prefix="diagnovet_tests_")
+
+os.environ.setdefault("DB_TYPE", "SQL_SERVER")
+os.environ.setdefault("SQL_URL", f"sqlite:///{os.path.join(_database_dir.name, 'diagnovet.db')}")
+os.environ.setdefault("SQL_ASYNC", "false")
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
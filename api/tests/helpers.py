@@ -0,0 +1,56 @@
+"""Datos y contadores compartidos por los tests (independientes de benchmarks/)"""
+from typing import Any, Dict
+
+ORGANOS = ["hígado", "bazo", "riñón izquierdo", "vejiga"]
+
+
+def diagnosis_payload(index: int, studies: int = 1, measurements: int = 1, observations: int = 1) -> Dict[str, Any]:
+    """DiagnosisCreate (como dict) determinístico con la cantidad de hijos pedida"""
+    return {
+        "paciente": {"nombre": f"Paciente {index}", "tutor": f"Tutor {index}", "edad": "5 años", "raza": "mestizo"},
+        "veterinario": {"nombre": f"Vet {index % 5}", "apellido": "Referente", "matricula": 1000 + index % 5},
+        "informe": {
+            "antecedentes": "Control de rutina",
+            "diagnostico": "Sin hallazgos patológicos relevantes",
+            "img_folder": f"{index}_images",
+            "fecha": f"{index % 28 + 1:02d}/{index % 12 + 1:02d}/2024",
+            "estudios": [
+                {
+                    "tipo_estudio": "ecografía abdominal",
+                    "mediciones": [
+                        {"tipo_medicion": "longitud", "valor": 10.5 + m, "unidad": "mm", "organo": ORGANOS[m % len(ORGANOS)]}
+                        for m in range(measurements)
+                    ],
+                    "observaciones": [
+                        {"organo": ORGANOS[o % len(ORGANOS)], "observacion": "Ecogenicidad conservada"}
+                        for o in range(observations)
+                    ],
+                }
+                for _ in range(studies)
+            ],
+        },
+    }
+
+
+class ReadCounter:
+    """Envuelve las primitivas de lectura de un FirestoreRepository contando RPC y rondas secuenciales"""
+
+    def __init__(self, repository):
+        self.rpcs = 0
+        self.rounds = 0
+        self._in_flight = 0
+        for name in ("_get_doc", "_get_all", "_get_docs"):
+            setattr(repository, name, self._wrap(getattr(repository, name)))
+
+    def _wrap(self, fn):
+        async def wrapper(*args, **kwargs):
+            # Una ronda empieza cuando no había ninguna lectura en vuelo
+            if self._in_flight == 0:
+                self.rounds += 1
+            self._in_flight += 1
+            self.rpcs += 1
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self._in_flight -= 1
+        return wrapper
@@ -0,0 +1,57 @@
+"""Ingesta por grupos (DiagnosisService.create_diagnoses_stream) cuando falla la escritura"""
+import asyncio
+import json
+from typing import Dict
+
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore
+
+from repositories.firestore_repository import BATCH_LIMIT, FirestoreRepository
+from services.diagnosis_service import DiagnosisService
+from tests.helpers import diagnosis_payload
+
+
+class FailingBatchRepository(FirestoreRepository):
+    """Firestore sin red: registra los informes de cada batch confirmado y rechaza el batch número fail_on"""
+
+    def __init__(self, fail_on: int):
+        super().__init__(project_id="diagnovet-test")
+        self.fail_on = fail_on
+        self.commits = 0
+        self.written = []
+
+    def _create_client(self, project_id: str):
+        return firestore.Client(project=project_id, credentials=AnonymousCredentials())
+
+    async def _commit_writes(self, writes: Dict[str, tuple]):
+        self.commits += 1
+        if self.commits == self.fail_on:
+            raise RuntimeError("batch rechazado")
+        self.written += [
+            ref.id for ref, _, _ in writes.values() if ref.parent.id == self.collections['diagnoses']
+        ]
+
+
+async def _lines(payloads):
+    """Líneas NDJSON como las entrega el endpoint: (número de línea, bytes)"""
+    for line_number, payload in enumerate(payloads, start=1):
+        yield line_number, json.dumps(payload).encode("utf-8")
+
+
+def test_failed_second_batch_does_not_duplicate_committed_reports():
+    repository = FailingBatchRepository(fail_on=2)
+    service = DiagnosisService(repository)
+    # 16 escrituras por informe: el grupo ocupa varios batches de BATCH_LIMIT
+    payloads = [diagnosis_payload(i, studies=2, measurements=3, observations=2) for i in range(100)]
+
+    async def ingest():
+        return [result async for group in service.create_diagnoses_stream(_lines(payloads), 100) for result in group]
+
+    results = asyncio.run(ingest())
+
+    assert len(payloads) * 16 > 2 * BATCH_LIMIT
+    assert [result["status"] for result in results] == ["created"] * len(payloads)
+    ids = [result["diagnosis_id"] for result in results]
+    # Cada informe quedó escrito una sola vez, con el id informado
+    assert sorted(repository.written) == sorted(ids)
+    assert len(set(ids)) == len(payloads)
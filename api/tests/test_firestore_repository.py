@@ -0,0 +1,44 @@
+"""
+Regresión de lecturas de FirestoreRepository.get_diagnosis contra el emulador
+(se omite si FIRESTORE_EMULATOR_HOST no está definido):
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m pytest tests/test_firestore_repository.py
+"""
+import asyncio
+import math
+import os
+import uuid
+
+import pytest
+
+if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+    pytest.skip("FIRESTORE_EMULATOR_HOST no está definido", allow_module_level=True)
+
+from models.schemas import DiagnosisCreate  # noqa: E402
+from repositories.firestore_repository import IN_QUERY_LIMIT, FirestoreRepository  # noqa: E402
+from tests.helpers import ReadCounter, diagnosis_payload  # noqa: E402
+
+# Diagnóstico; después paciente + veterinario (get_all), estudios y sus hijos en paralelo
+EXPECTED_ROUNDS = 2
+
+
+@pytest.fixture(scope="module")
+def repository():
+    # Proyecto propio por corrida para no mezclar datos en el emulador
+    return FirestoreRepository(project_id=f"diagnovet-test-{uuid.uuid4().hex[:8]}")
+
+
+@pytest.mark.parametrize("studies", [1, 5, 40])
+def test_get_diagnosis_read_count(repository, studies):
+    payload = diagnosis_payload(studies, studies=studies, measurements=3, observations=2)
+    diagnosis_id = asyncio.run(repository.create_diagnosis(DiagnosisCreate(**payload)))
+
+    counter = ReadCounter(repository)
+    diagnosis = asyncio.run(repository.get_diagnosis(diagnosis_id))
+
+    # Diagnóstico, paciente + veterinario (get_all), estudios y dos consultas 'in' por cada 30 estudios
+    assert counter.rpcs == 3 + 2 * math.ceil(studies / IN_QUERY_LIMIT)
+    assert counter.rounds == EXPECTED_ROUNDS
+    assert len(diagnosis.estudios) == studies
+    assert all(len(estudio.mediciones) == 3 and len(estudio.observaciones) == 2 for estudio in diagnosis.estudios)
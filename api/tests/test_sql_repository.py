@@ -0,0 +1,47 @@
+"""Regresión de la ruta de lectura de SQLRepository.get_diagnosis (cantidad de consultas)"""
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from database.sql_connection import get_sql_engine, get_sql_session
+from models.schemas import DiagnosisCreate
+from repositories.sql_repository import SQLRepository
+from tests.helpers import diagnosis_payload
+
+# Informe (con paciente y veterinario), estudios, mediciones y observaciones:
+# una consulta por nivel, sin importar el tamaño del informe
+EXPECTED_QUERIES = 4
+
+
+@pytest.fixture(scope="module")
+def repository():
+    return SQLRepository(session_factory=get_sql_session())
+
+
+@pytest.fixture
+def statements():
+    """Sentencias ejecutadas sobre el engine mientras dura el test"""
+    executed = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = get_sql_engine()
+    event.listen(engine, "before_cursor_execute", on_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", on_execute)
+
+
+@pytest.mark.parametrize("studies", [1, 20])
+def test_get_diagnosis_query_count_is_fixed(repository, statements, studies):
+    payload = diagnosis_payload(studies, studies=studies, measurements=6, observations=3)
+    diagnosis_id = asyncio.run(repository.create_diagnosis(DiagnosisCreate(**payload)))
+
+    statements.clear()
+    diagnosis = asyncio.run(repository.get_diagnosis(diagnosis_id))
+
+    assert len(statements) == EXPECTED_QUERIES, statements
+    assert len(diagnosis.estudios) == studies
+    assert all(len(estudio.mediciones) == 6 and len(estudio.observaciones) == 3 for estudio in diagnosis.estudios)
+    assert all(med.organo for estudio in diagnosis.estudios for med in estudio.mediciones)
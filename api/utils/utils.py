@@ -1,5 +1,13 @@
 import re 
 import os
+import unicodedata
+from typing import AsyncIterator, List, Optional, Tuple
+
+# Palabras vacías del español que no se indexan ni se buscan
+STOPWORDS_ES = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "o", "para", "por", "se", "sin", "su", "un", "una", "y"
+}
 
 def normalize_filename(self, filename: str) -> str:
     """
@@ -19,3 +27,64 @@ def normalize_filename(self, filename: str) -> str:
     # Convertir a minúsculas y agregar la extensión
     return normalized.lower() + ext.lower()
 
+
+
+def fold_text(text: str) -> str:
+    """
+    Plegado para búsqueda: minúsculas y sin diacríticos (á -> a, ü -> u, ñ -> n),
+    igual que el tokenizer unicode61 de FTS5 y los catálogos insensibles a acentos.
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def normalize_key(text: str) -> str:
+    """Clave normalizada para búsquedas por prefijo: plegada y con espacios simples"""
+    return " ".join(fold_text(text).split())
+
+
+def search_terms(text: str) -> List[str]:
+    """Términos de búsqueda plegados, sin palabras vacías ni duplicados (en orden)"""
+    terms = []
+    for term in re.findall(r'\w+', fold_text(text)):
+        if term not in STOPWORDS_ES and term not in terms:
+            terms.append(term)
+    return terms
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    (número de línea, línea) de un cuerpo NDJSON recibido por partes, sin
+    acumularlo: solo se guarda la línea en curso. Las líneas en blanco se
+    saltean y una línea de más de max_line_bytes se devuelve como None.
+    """
+    buffer = bytearray()
+    line_number = 0
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            line_number += 1
+            if oversized or len(buffer) + end - start > max_line_bytes:
+                yield line_number, None
+            else:
+                buffer += chunk[start:end]
+                if buffer.strip():
+                    yield line_number, bytes(buffer)
+            buffer.clear()
+            oversized = False
+            start = end + 1
+        if not oversized:
+            buffer += chunk[start:]
+            if len(buffer) > max_line_bytes:
+                oversized = True
+                buffer.clear()
+    if oversized:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, bytes(buffer)